@@ -1,12 +1,14 @@
 # BriefGenBackend/agent.py
-import os, json, uuid, re, asyncio, logging
-from typing import Dict, Any, Optional, List
-from jsonschema import validate, ValidationError
+import os, time, asyncio, logging
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 
-try:
-    from together import Together  # pip install together
-except Exception:  # library not installed
-    Together = None
+from .jsonstream import SectionStreamParser
+from .parsing import parse_draft, first_error, merge_sections, section_ok
+from . import llm
+from . import metrics
+from . import prompts
+from .cache import generation_cache, cache_key
+from .registry import registry
 
 # ---------- logging ----------
 log = logging.getLogger("briefgen.agent")
@@ -16,251 +18,247 @@ if not log.handlers:  # ensure logs appear even with uvicorn defaults
     log.addHandler(_h)
 log.setLevel(logging.INFO)
 
-# ---------- schema ----------
-FINAL_SCHEMA = {
-    "type": "object",
-    "required": ["title","parties","facts","grounds","prayer","annexures","citations","notes"],
-    "properties": {
-        "title": {"type": "string"},
-        "parties": {"type": "array", "items": {"type": "string"}},
-        "facts": {"type": "array", "items": {"type": "string"}},
-        "grounds": {"type": "array", "items": {"type": "string"}},
-        "prayer": {"type": "array", "items": {"type": "string"}},
-        "annexures": {"type": "array", "items": {"type": "string"}},
-        "citations": {"type": "array", "items": {"type": "string"}},
-        "notes": {"type": "string"}
-    }
-}
-
 # ---------- templates / questions ----------
-TEMPLATES = {
-    "Legal Notice": {
-        "fields": [
-            ("sender_name", "Your full name or firm name", "e.g., Upadhyay & Associates"),
-            ("sender_address", "Your address", "Street, city, pincode"),
-            ("recipient_name", "Recipient (individual/company) name", "e.g., Sattik Packaging Pvt Ltd"),
-            ("recipient_address", "Recipient address", "Street, city, pincode"),
-            ("amount_due", "Total amount due (INR)", "e.g., 855974"),
-            ("last_payment_date", "Date of last payment", "YYYY-MM-DD"),
-            ("invoice_refs", "Invoice numbers / references", "Comma-separated"),
-            ("deadline_days", "Demand deadline (days)", "e.g., 7 or 15"),
-            ("jurisdiction", "Jurisdiction / court", "e.g., Kolkata / Alipore"),
-            ("facts_summary", "Short factual background", "1-3 sentences")
-        ]
-    },
-    "Petition": {
-        "fields": [
-            ("petitioner", "Petitioner full name", ""),
-            ("respondent", "Respondent full name", ""),
-            ("court", "Court / forum", "e.g., Commercial Court at Alipore"),
-            ("cause_of_action", "Cause of action", ""),
-            ("reliefs", "Reliefs sought (comma-separated)", ""),
-            ("facts_summary", "Factual chronology (1-4 bullets)", ""),
-            ("annexures_list", "Annexures (comma-separated)", "")
-        ]
-    },
-    "Affidavit": {
-        "fields": [
-            ("deponent_name", "Deponent name", ""),
-            ("deponent_address", "Deponent address", ""),
-            ("court", "Court / forum", ""),
-            ("statements", "Statements to affirm (semicolon-separated)", ""),
-            ("place", "Place of verification", ""),
-            ("date", "Date of verification", "YYYY-MM-DD")
-        ]
-    }
-}
-
-SYSTEM_INSTRUCTIONS = (
-    "You are a legal drafting assistant for India-focused documents.\n"
-    "Return a SINGLE JSON object ONLY (no markdown, no commentary), matching this schema:\n"
-    "{title: string, parties: string[], facts: string[], grounds: string[], prayer: string[], annexures: string[], citations: string[], notes: string}\n"
-    "Guidelines:\n"
-    "- Use formal, precise legal drafting language suitable for a pre-litigation notice.\n"
-    "- Expand the user's facts into complete, coherent paragraphs in 'facts'.\n"
-    "- In 'grounds', articulate the legal basis in plain language (no case citations unless provided).\n"
-    "- In 'prayer', include clear numbered demands and timelines.\n"
-    "- Do not invent real case citations; if not provided, use '[citation needed]'."
-)
+# Template definitions live in template_defs/ and are compiled by the registry;
+# prompts (instructions, per-template prefix, token budgets) are built in prompts.py.
 
 # ---------- helpers ----------
-def _next_required_field(template: str, answers: Dict[str, Any]) -> Optional[Dict[str,str]]:
-    fields = TEMPLATES[template]["fields"]
-    for key, text, hint in fields:
-        if not answers.get(key):
-            return {"id": uuid.uuid4().hex, "field": key, "text": text, "hint": hint or ""}
-    return None
-
-def _extract_json(text: str) -> Optional[Dict[str, Any]]:
-    """Try to recover a JSON object from an LLM response that may include fences/prose."""
-    if not text:
-        return None
-    # strip code fences
-    text = re.sub(r"```(?:json)?", "", text)
-    text = text.replace("```", "")
-    # naive largest-braces grab
-    m = re.search(r"\{[\s\S]*\}", text)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(0))
-    except Exception:
-        return None
+def _next_required_field(template: str, answers: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return registry[template].next_question(answers)
+
+def remaining_questions(template: str, answers: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every unanswered required field of the template, in questionnaire order."""
+    return registry[template].remaining(answers)
+
+def missing_fields(template: str, answers: Dict[str, Any]) -> List[str]:
+    return registry[template].missing(answers)
+
+def unknown_fields(template: str, answers: Dict[str, Any]) -> List[str]:
+    return registry[template].unknown(answers)
+
+def invalid_fields(template: str, answers: Dict[str, Any]) -> Dict[str, str]:
+    return registry[template].invalid(answers)
 
-# ---------- richer rule-based fallback ----------
+def template_schema(template: str) -> Dict[str, Any]:
+    """The whole questionnaire for a template, so a client can render it as one form."""
+    return registry[template].schema()
+
+# ---------- rule-based fallback ----------
 def _rule_based_final(template: str, answers: Dict[str, Any]) -> Dict[str, Any]:
-    if template == "Legal Notice":
-        sender = answers.get('sender_name','[Sender]')
-        s_addr = answers.get('sender_address','[Address]')
-        recp   = answers.get('recipient_name','[Recipient]')
-        r_addr = answers.get('recipient_address','[Address]')
-        amt    = answers.get('amount_due','[Amount]')
-        last   = answers.get('last_payment_date','[Date]')
-        inv    = answers.get('invoice_refs','[Refs]')
-        days   = answers.get('deadline_days','[X]')
-        juris  = answers.get('jurisdiction','[Jurisdiction]')
-        sumry  = answers.get('facts_summary','[Summary]')
-
-        title = f"Legal Notice for Non-Payment against {recp}"
-
-        parties = [
-            f"Sender: {sender}",
-            f"Recipient: {recp}"
-        ]
-
-        facts: List[str] = [
-            f"1. That the Sender, {sender}, having its office at {s_addr}, supplied goods/services to you, {recp}, at {r_addr}.",
-            f"2. That invoices bearing references {inv} were duly raised and rendered; payments were expected within the agreed credit period.",
-            f"3. That despite repeated requests and reminders, an outstanding sum of INR {amt} remains unpaid; your last payment, if any, was on {last}.",
-            f"4. That by reason of the aforesaid default, the Sender has suffered financial prejudice and is constrained to issue this formal notice.",
-            f"5. Background: {sumry}"
-        ]
-
-        grounds = [
-            "Breach of contractual obligation to make timely payment for goods/services supplied.",
-            "Unjust retention of amounts due despite invoices and reminders.",
-            "Right to recover principal together with reasonable interest and recovery costs under applicable law and contract."
-        ]
-
-        prayer = [
-            f"1. Pay INR {amt} in full within {days} days from receipt of this notice.",
-            "2. Pay reasonable interest on the delayed amount as per the agreed terms or, in the alternative, at a reasonable commercial rate.",
-            "3. Reimburse costs and expenses incurred for issuance of this notice and recovery."
-        ]
-
-        annexures = [
-            f"Copies of invoices: {inv}",
-            "Statement of account",
-            "Proof of delivery / service completion (as applicable)"
-        ]
-
-        citations = ["[citation needed]"]  # do not fabricate case law
-
-        notes = f"Jurisdiction/venue: {juris}. This is a pre-litigation demand without prejudice to the Sender’s rights and remedies."
-
-        return {
-            "title": title, "parties": parties, "facts": facts,
-            "grounds": grounds, "prayer": prayer, "annexures": annexures,
-            "citations": citations, "notes": notes
-        }
-
-    elif template == "Petition":
-        title = f"Petition by {answers.get('petitioner','[Petitioner]')} against {answers.get('respondent','[Respondent]')}"
-        parties = [
-            f"Petitioner: {answers.get('petitioner','[Petitioner]')}",
-            f"Respondent: {answers.get('respondent','[Respondent]')}"
-        ]
-        facts = [
-            f"Chronology: {answers.get('facts_summary','[Facts]')}"
-        ]
-        grounds = [answers.get("cause_of_action","[Cause]")]
-        prayer = [s.strip() for s in (answers.get("reliefs","").split(",")) if s.strip()] or [
-            "Appropriate reliefs as this Hon’ble Court deems fit."
-        ]
-        annexures = [s.strip() for s in (answers.get("annexures_list","").split(",")) if s.strip()] or ["[Annexures]"]
-        return {
-            "title": title, "parties": parties, "facts": facts,
-            "grounds": grounds, "prayer": prayer, "annexures": annexures,
-            "citations": ["[citation needed]"], "notes": f"Court/Forum: {answers.get('court','[Court]')}"
-        }
-
-    # Affidavit
-    title = f"Affidavit of {answers.get('deponent_name','[Deponent]')}"
-    parties = [f"Deponent: {answers.get('deponent_name','[Deponent]')}"]
-    facts = [s.strip() for s in (answers.get("statements","").split(";")) if s.strip()] or ["[Statement]"]
-    return {
-        "title": title, "parties": parties, "facts": facts,
-        "grounds": [], "prayer": [], "annexures": [],
-        "citations": ["[citation needed]"],
-        "notes": f"Verification at {answers.get('place','[Place]')} on {answers.get('date','[Date]')}"
-    }
-
-# ---------- Together ----------
-async def _call_together(messages: list, model: Optional[str] = None) -> Optional[str]:
-    api_key = os.getenv("TOGETHER_API_KEY")
-    if not api_key:
-        log.warning("Together disabled: TOGETHER_API_KEY not set")
-        return None
-    if Together is None:
-        log.warning("Together SDK not available. Did you install `together`?")
-        return None
+    with metrics.stage("fallback"):
+        return registry[template].render_fallback(answers)
 
-    model_name = os.getenv("TOGETHER_MODEL") or model or "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
-    log.info("Calling Together model=%s", model_name)
+# ---------- model calls ----------
+def _model_name(model: Optional[str] = None) -> str:
+    return os.getenv("TOGETHER_MODEL") or model or llm.DEFAULT_MODEL
 
-    def _do():
-        client = Together(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0.2,
-            # If your model supports JSON mode, uncomment the next line:
-            # response_format={"type": "json_object"},
-        )
-        return resp.choices[0].message.content if resp and resp.choices else None
+def _parses(text: str) -> bool:
+    return parse_draft(text)[0] is not None
+
+async def _call_together(messages: list, model: Optional[str] = None,
+                         max_tokens: Optional[int] = None) -> Optional[str]:
+    """One completion through the provider router; a hedge answer only wins if it parses."""
+    client = llm.get_client()
+    if client is None:
+        log.warning("LLM disabled: set TOGETHER_API_KEY and/or LOCAL_LLM_BASE_URL")
+        metrics.llm_calls.inc(outcome="disabled")
+        return None
 
+    model_name = _model_name(model)
+    log.info("Calling model=%s", model_name)
     try:
-        out = await asyncio.to_thread(_do)
-        log.info("Together response length=%s", len(out) if out else 0)
+        with metrics.inflight.track(kind="llm"), metrics.stage("llm"):
+            out = await client.complete(messages, model_name, accept=_parses,
+                                        **({"max_tokens": max_tokens} if max_tokens else {}))
+        log.info("Model response length=%s", len(out) if out else 0)
+        metrics.llm_calls.inc(outcome="ok")
         return out
     except Exception as e:
-        log.exception("Together call failed: %s", e)
+        log.exception("Model call failed: %s", e)
+        metrics.llm_calls.inc(outcome="error")
         return None
 
+async def _stream_together(messages: list, model: Optional[str] = None,
+                           max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+    """Like `_call_together`, but yields content deltas as the model produces them."""
+    client = llm.get_client()
+    if client is None:
+        log.warning("LLM disabled: set TOGETHER_API_KEY and/or LOCAL_LLM_BASE_URL")
+        metrics.llm_calls.inc(outcome="disabled")
+        return
+
+    model_name = _model_name(model)
+    log.info("Streaming model=%s", model_name)
+    total = 0
+    outcome = "ok"
+    t = time.perf_counter()
+    metrics.inflight.inc(kind="llm")
+    try:
+        async for piece in client.stream(messages, model_name, **({"max_tokens": max_tokens} if max_tokens else {})):
+            total += len(piece)
+            yield piece
+    except Exception as e:
+        log.exception("Model stream failed: %s", e)
+        outcome = "error"
+    finally:
+        metrics.inflight.dec(kind="llm")
+        metrics.observe_stage("llm", time.perf_counter() - t)
+        metrics.llm_calls.inc(outcome=outcome)
+    log.info("Model stream length=%s", total)
+
 # ---------- main entry ----------
-async def get_next_question_or_final(template: str, answers: Dict[str, Any]) -> Dict[str, Any]:
-    nxt = _next_required_field(template, answers)
-    if nxt:
-        return {"type": "question", "question": nxt}
-
-    user_facts = json.dumps(answers, ensure_ascii=False, indent=2)
-    messages = [
-        {"role": "system", "content": SYSTEM_INSTRUCTIONS},
-        {"role": "user", "content": (
-            f"Template: {template}\nFacts:\n{user_facts}\n"
-            "Requirements:\n"
-            "- Output only the JSON object (no markdown code fences, no commentary).\n"
-            "- Populate each array with complete, formal sentences suitable for a legal document.\n"
-        )}
-    ]
-
-    text = await _call_together(messages)
-
-    draft_json: Optional[Dict[str, Any]] = None
+GENERATION_MODE = (os.getenv("GENERATION_MODE") or "single").lower()  # single | sections
+# fan-out for GENERATION_MODE=sections: the long sections get a call each, the short ones share a "frame" call
+SECTION_GROUPS: Tuple[Tuple[str, ...], ...] = (
+    ("facts",), ("grounds",), ("prayer",), ("title", "parties", "annexures", "citations", "notes"),
+)
+
+def _count_output(template: str, text: Optional[str]):
     if text:
-        try:
-            draft_json = json.loads(text)
-        except Exception:
-            draft_json = _extract_json(text)
+        metrics.prompt_tokens.observe(prompts.estimate_tokens(text), template=template, part="output")
 
-    if not draft_json:
+def _finalize(template: str, answers: Dict[str, Any], text: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+    """Parse and validate model output. Returns (draft, from_model); from_model is False if any section fell back."""
+    with metrics.stage("parse"):
+        draft_json, how = parse_draft(text)
+    metrics.parse_outcomes.inc(how=how)
+    if draft_json is None:
         log.info("Falling back to rule-based draft for template=%s", template)
-        draft_json = _rule_based_final(template, answers)
+        metrics.fallbacks.inc(template=template, scope="draft")
+        return _rule_based_final(template, answers), False
+    if how != "direct":
+        log.info("Recovered model output (%s) for template=%s", how, template)
 
-    try:
-        validate(instance=draft_json, schema=FINAL_SCHEMA)
-    except ValidationError as e:
-        log.warning("Draft failed schema validation; using fallback. Error: %s", e)
-        draft_json = _rule_based_final(template, answers)
+    with metrics.stage("validate"):
+        err = first_error(draft_json)
+    if err is None:
+        return draft_json, True
+    metrics.schema_failures.inc()
+    metrics.fallbacks.inc(template=template, scope="sections")
+    # keep whatever the model got right; only the bad or missing sections come from the fallback
+    draft_json, replaced = merge_sections(draft_json, _rule_based_final(template, answers))
+    log.warning("Draft failed schema validation (%s); sections from fallback: %s", err, ", ".join(replaced))
+    return draft_json, False
+
+async def _generate_group(template: str, answers: Dict[str, Any], keys: Tuple[str, ...]) -> Dict[str, Any]:
+    prompt = prompts.compile_prompt(template, answers, keys)
+    text = await _call_together(prompt.messages, max_tokens=prompt.max_tokens)
+    _count_output(template, text)
+    with metrics.stage("parse"):
+        obj, how = parse_draft(text)
+    metrics.parse_outcomes.inc(how=how)
+    if not obj:
+        return {}
+    return {k: obj[k] for k in keys if k in obj and section_ok(k, obj[k])}
+
+async def generate_sections(template: str, answers: Dict[str, Any],
+                            groups: Tuple[Tuple[str, ...], ...] = SECTION_GROUPS) -> Dict[str, Any]:
+    """One concurrent model call per group; returns only the sections that came back valid."""
+    out: Dict[str, Any] = {}
+    for part in await asyncio.gather(*(_generate_group(template, answers, g) for g in groups)):
+        out.update(part)
+    return out
+
+def _merge_fallback(template: str, answers: Dict[str, Any], sections: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    draft_json, replaced = merge_sections(sections, _rule_based_final(template, answers))
+    if replaced:
+        log.warning("Sections from fallback for template=%s: %s", template, ", ".join(replaced))
+        metrics.fallbacks.inc(template=template, scope="sections")
+    return draft_json, not replaced
+
+def _pending_groups(presets: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, ...], ...]]:
+    """Section groups still to generate, or None to use the single-call path."""
+    if llm.get_client() is None or not (presets or GENERATION_MODE == "sections"):
+        return None
+    return tuple(g for g in SECTION_GROUPS if not set(g) <= set(presets or ()))
+
+def _draft_cache_key(template: str, answers: Dict[str, Any]) -> str:
+    # any configured provider may answer, so the key names all of them, not just the requested model
+    client = llm.get_client()
+    model = client.models(_model_name()) if client is not None else _model_name()
+    return cache_key(template, answers, model, prompts.prefix(template).digest)
+
+async def get_next_question_or_final(template: str, answers: Dict[str, Any]) -> Dict[str, Any]:
+    pending = remaining_questions(template, answers)
+    if pending:
+        return {"type": "question", "question": pending[0], "questions": pending}
+    return {"type": "final", "draft": await generate_final(template, answers)}
+
+async def generate_final(template: str, answers: Dict[str, Any],
+                         presets: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Produce the final draft for a complete set of answers (cache, then model, then fallback).
+
+    `presets` are sections already generated for these answers (speculatively); only the rest are requested.
+    """
+    key = _draft_cache_key(template, answers)
+    cached = generation_cache.get(key)
+    if cached is not None:
+        log.info("Draft cache hit template=%s", template)
+        return cached
+
+    groups = _pending_groups(presets)
+    if groups is not None:
+        got = dict(presets or {})
+        got.update(await generate_sections(template, answers, groups))
+        draft_json, from_model = _merge_fallback(template, answers, got)
+    else:
+        prompt = prompts.compile_prompt(template, answers)
+        text = await _call_together(prompt.messages, max_tokens=prompt.max_tokens)
+        _count_output(template, text)
+        draft_json, from_model = _finalize(template, answers, text)
+    if from_model:
+        generation_cache.set(key, draft_json)
+    return draft_json
+
+async def stream_next_question_or_final(template: str, answers: Dict[str, Any],
+                                        presets: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming variant of `get_next_question_or_final`.
+
+    Yields `{"type": "section", "key", "value"}` events for each FINAL_SCHEMA
+    member as soon as it parses, then a terminal `{"type": "final", "draft"}`
+    event carrying exactly what the blocking path would have returned.
+    """
+    pending = remaining_questions(template, answers)
+    if pending:
+        yield {"type": "question", "question": pending[0], "questions": pending}
+        return
+
+    key = _draft_cache_key(template, answers)
+    cached = generation_cache.get(key)
+    if cached is not None:
+        log.info("Draft cache hit template=%s", template)
+        for k, v in cached.items():
+            yield {"type": "section", "key": k, "value": v}
+        yield {"type": "final", "draft": cached}
+        return
+
+    groups = _pending_groups(presets)
+    if groups is not None:
+        got: Dict[str, Any] = dict(presets or {})
+        for k, value in got.items():
+            yield {"type": "section", "key": k, "value": value}
+        # groups finish in any order; each one's sections are pushed as soon as it lands
+        tasks = [asyncio.ensure_future(_generate_group(template, answers, g)) for g in groups]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                part = await fut
+                got.update(part)
+                for k, value in part.items():
+                    yield {"type": "section", "key": k, "value": value}
+        finally:
+            for t in tasks:
+                t.cancel()
+        draft_json, from_model = _merge_fallback(template, answers, got)
+    else:
+        parser = SectionStreamParser()
+        prompt = prompts.compile_prompt(template, answers)
+        async for piece in _stream_together(prompt.messages, max_tokens=prompt.max_tokens):
+            for k, value in parser.feed(piece):
+                if section_ok(k, value):
+                    yield {"type": "section", "key": k, "value": value}
+        _count_output(template, parser.buf)
+        draft_json, from_model = _finalize(template, answers, parser.buf or None)
 
-    return {"type": "final", "draft": draft_json}
+    if from_model:
+        generation_cache.set(key, draft_json)
+    yield {"type": "final", "draft": draft_json}
@@ -0,0 +1,210 @@
+# BriefGenBackend/cache.py
+import os, json, time, sqlite3, hashlib, threading, logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from .db import DB_PATH
+
+log = logging.getLogger("briefgen.cache")
+
+
+def normalize_answers(answers: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical form of the wizard answers: sorted keys, collapsed whitespace, empty values dropped."""
+    out: Dict[str, Any] = {}
+    for k in sorted(answers):
+        v = answers[k]
+        if v is None:
+            continue
+        if isinstance(v, str):
+            v = " ".join(v.split())
+            if not v:
+                continue
+        out[k] = v
+    return out
+
+def cache_key(template: str, answers: Dict[str, Any], model: str, system: str) -> str:
+    payload = json.dumps(
+        {"t": template, "a": normalize_answers(answers), "m": model, "s": system},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache(ABC):
+    """Interface for generation caches. Values are JSON-serialisable dicts."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached value, or None; counts a hit or a miss."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"backend": type(self).__name__, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+class NullCache(GenerationCache):
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+class MemoryCache(GenerationCache):
+    """Bounded LRU with a per-entry TTL. Entries are stored serialised so callers can't mutate them.
+
+    `get_raw`/`set_raw` skip the JSON layer and accept any immutable value (e.g. rendered bytes).
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 86400.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_raw(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, raw = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return raw
+
+    def set_raw(self, key: str, raw: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), raw)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get(self, key):
+        raw = self.get_raw(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.set_raw(key, json.dumps(value, ensure_ascii=False))
+
+    def stats(self):
+        out = super().stats()
+        out["entries"] = len(self._data)
+        return out
+
+
+class SQLiteCache(GenerationCache):
+    """Persistent tier in its own SQLite file, so it survives restarts and is shared by workers."""
+
+    def __init__(self, path: str, ttl: float = 86400.0):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS gen_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("DELETE FROM gen_cache WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            self._local.conn = conn
+        return conn
+
+    def get_raw(self, key: str) -> Optional[tuple]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM gen_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row
+
+    def get(self, key):
+        row = self.get_raw(key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO gen_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl))
+            conn.commit()
+        except sqlite3.Error as e:
+            log.warning("SQLite cache write failed: %s", e)
+
+
+class TieredCache(GenerationCache):
+    """In-memory LRU in front of the SQLite tier; SQLite hits are promoted to memory."""
+
+    def __init__(self, memory: MemoryCache, disk: SQLiteCache):
+        super().__init__()
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        raw = self.memory.get_raw(key)
+        if raw is not None:
+            self.hits += 1; self.memory.hits += 1
+            return json.loads(raw)
+        self.memory.misses += 1
+        try:
+            row = self.disk.get_raw(key)
+        except sqlite3.Error as e:
+            log.warning("SQLite cache read failed: %s", e)
+            row = None
+        if row is None:
+            self.misses += 1; self.disk.misses += 1
+            return None
+        self.hits += 1; self.disk.hits += 1
+        self.memory.set_raw(key, row[0], ttl=max(0.0, row[1] - time.time()))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def stats(self):
+        out = super().stats()
+        out["tiers"] = [self.memory.stats(), self.disk.stats()]
+        return out
+
+
+def build_cache_from_env() -> GenerationCache:
+    """BRIEFGEN_CACHE=memory (default) | sqlite | off."""
+    kind = (os.getenv("BRIEFGEN_CACHE") or "memory").lower()
+    ttl = float(os.getenv("BRIEFGEN_CACHE_TTL", 86400))
+    size = int(os.getenv("BRIEFGEN_CACHE_SIZE", 512))
+    if kind in ("off", "none", "0"):
+        return NullCache()
+    memory = MemoryCache(max_entries=size, ttl=ttl)
+    if kind == "sqlite":
+        path = os.getenv("BRIEFGEN_CACHE_DB") or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "briefgen-cache.db")
+        try:
+            return TieredCache(memory, SQLiteCache(path, ttl=ttl))
+        except sqlite3.Error as e:
+            log.warning("SQLite cache unavailable (%s); using memory only", e)
+    return memory
+
+generation_cache: GenerationCache = build_cache_from_env()
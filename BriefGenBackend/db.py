@@ -1,18 +1,91 @@
 import os
-from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy import text
+from typing import Optional
+from sqlmodel import create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 DB_PATH = os.getenv("BRIEFGEN_DB") or os.path.join(os.path.dirname(__file__), "..", "briefgen.db")
-DB_URI = f"sqlite:///{os.path.abspath(DB_PATH)}"
+# DATABASE_URL takes precedence, e.g. postgresql+psycopg://user:pw@host/briefgen
+DB_URI = os.getenv("DATABASE_URL") or f"sqlite:///{os.path.abspath(DB_PATH)}"
+IS_SQLITE = make_url(DB_URI).get_backend_name() == "sqlite"
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(DB_URI, echo=False, connect_args=connect_args)
+# applied to every new SQLite connection, not just the first one
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", 64 * 1024)),  # negative = KiB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+def _set_sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cur.execute(f"PRAGMA {name}={value};")
+    cur.close()
+
+def _engine_kwargs() -> dict:
+    kw = {
+        "echo": False,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    }
+    if IS_SQLITE:
+        kw["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000}
+    else:
+        kw["pool_pre_ping"] = True
+        kw["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    return kw
+
+engine = create_engine(DB_URI, **_engine_kwargs())
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+
+# ---------- async engine (aiosqlite / asyncpg) ----------
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+_async_engine = None
+
+def async_db_uri() -> str:
+    url = make_url(os.getenv("ASYNC_DATABASE_URL") or DB_URI)
+    if url.get_driver_name() in ("aiosqlite", "asyncpg"):
+        return url.render_as_string(hide_password=False)
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if not driver:
+        raise RuntimeError(f"No async driver configured for {url.get_backend_name()}")
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_engine():
+    """Created on first use so deployments without aiosqlite/asyncpg installed still start."""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        kw = _engine_kwargs()
+        if IS_SQLITE:  # aiosqlite defaults to NullPool; keep connections (and their pragmas) around
+            kw["poolclass"] = AsyncAdaptedQueuePool
+        _async_engine = create_async_engine(async_db_uri(), **kw)
+        if IS_SQLITE:
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return _async_engine
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
-    with engine.connect() as conn:
-        conn.execute(text("PRAGMA journal_mode=WAL;"))
+    from .migrations import run_migrations
+    run_migrations(engine)  # create_all included, under a cross-process lock
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
@@ -1,38 +1,37 @@
+import os, io, json, copy, html, hashlib
+from functools import lru_cache
 from docx import Document
-from docx.shared import Pt
+from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Optional, NamedTuple, Callable
+
+from .cache import MemoryCache
+from . import metrics
+from .pdfwriter import PDFDocument
+
+# bump whenever the rendered output changes so cached exports are invalidated
+EXPORTER_VERSION = "2"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
 def _set_normal_style(doc: Document, font_name="Times New Roman", size_pt=12):
     style = doc.styles["Normal"]
     style.font.name = font_name
     style.font.size = Pt(size_pt)
+    style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
-def _heading(doc: Document, text: str, level: int = 1):
-    p = doc.add_paragraph()
-    run = p.add_run(text)
-    run.bold = True
-    if level == 1:
-        run.font.size = Pt(16)
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    else:
-        run.font.size = Pt(12)
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    return p
-
-def _para(doc: Document, text: str, bold=False, italic=False, align_center=False):
-    p = doc.add_paragraph()
-    r = p.add_run(text)
-    r.bold = bold
-    r.italic = italic
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER if align_center else WD_ALIGN_PARAGRAPH.JUSTIFY
-    return p
-
-def _numbered_list(doc: Document, items: List[str]):
-    for i, it in enumerate(items, 1):
-        _para(doc, f"{i}. {it}")
+def _set_heading_style(doc: Document, name: str, size_pt: int, align, font_name="Times New Roman"):
+    style = doc.styles[name]
+    rfonts = style.element.rPr.find(qn("w:rFonts")) if style.element.rPr is not None else None
+    if rfonts is not None:  # theme fonts would override the explicit font name
+        for attr in ("w:asciiTheme", "w:hAnsiTheme", "w:eastAsiaTheme", "w:cstheme"):
+            rfonts.attrib.pop(qn(attr), None)
+    style.font.name = font_name
+    style.font.size = Pt(size_pt)
+    style.font.bold = True
+    style.font.color.rgb = RGBColor(0, 0, 0)
+    style.paragraph_format.alignment = align
 
 def _add_page_number_footer(doc: Document):
     section = doc.sections[0]
@@ -50,21 +49,184 @@ def _add_field(run, field_code: str):
     fldChar3 = OxmlElement('w:fldChar'); fldChar3.set(qn('w:fldCharType'), 'end')
     r.append(fldChar1); r.append(instrText); r.append(fldChar2); r.append(fldChar3)
 
-def build_docx_from_draft(draft: Dict[str, Any], out_path: str, title: str = "Draft"):
+# ---------- pre-styled base document ----------
+@lru_cache(maxsize=1)
+def _base_docx() -> bytes:
+    """Styles and footer are set up once; every export starts from a copy of these bytes."""
     doc = Document()
-    _set_normal_style(doc); _add_page_number_footer(doc)
-    _heading(doc, draft.get("title") or title, level=1)
-    for label in [("Parties","parties"),("Facts","facts"),("Grounds","grounds"),("Prayer","prayer")]:
-        items = draft.get(label[1]) or []
+    _set_normal_style(doc)
+    _set_heading_style(doc, "Heading 1", 16, WD_ALIGN_PARAGRAPH.CENTER)
+    _set_heading_style(doc, "Heading 2", 12, WD_ALIGN_PARAGRAPH.LEFT)
+    _add_page_number_footer(doc)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def _proto_paragraph(style_id: str = ""):
+    p = OxmlElement("w:p")
+    if style_id:
+        pPr = OxmlElement("w:pPr"); ps = OxmlElement("w:pStyle"); ps.set(qn("w:val"), style_id)
+        pPr.append(ps); p.append(pPr)
+    r = OxmlElement("w:r"); t = OxmlElement("w:t"); t.set(qn("xml:space"), "preserve")
+    r.append(t); p.append(r)
+    return p
+
+class _Writer:
+    """Appends styled paragraphs by cloning one prototype <w:p> per style (no per-run formatting)."""
+
+    def __init__(self, doc: Document):
+        self._anchor = doc.element.body.sectPr
+        styles = doc.styles
+        self._protos = {
+            "title": _proto_paragraph(styles["Heading 1"].style_id),
+            "heading": _proto_paragraph(styles["Heading 2"].style_id),
+            "bullet": _proto_paragraph(styles["List Bullet"].style_id),
+            "body": _proto_paragraph(),
+        }
+
+    def add(self, kind: str, text: str):
+        p = copy.deepcopy(self._protos[kind])
+        p[-1][-1].text = text
+        self._anchor.addprevious(p)
+
+# ---------- intermediate document model ----------
+class Block(NamedTuple):
+    kind: str      # "title" | "heading" | "numbered" | "bullet" | "body"
+    text: str
+    n: int = 0     # item number for "numbered"
+
+def document_model(draft: Dict[str, Any], title: str = "Draft") -> List[Block]:
+    """Walk the FINAL_SCHEMA sections once; every output format serialises this list."""
+    blocks = [Block("title", draft.get("title") or title)]
+    for label, key in [("Parties","parties"),("Facts","facts"),("Grounds","grounds"),("Prayer","prayer")]:
+        items = draft.get(key) or []
         if items:
-            _heading(doc, label[0], level=2)
-            _numbered_list(doc, items)
-    for label in [("Annexures","annexures"),("Citations","citations")]:
-        items = draft.get(label[1]) or []
+            blocks.append(Block("heading", label))
+            blocks.extend(Block("numbered", it, i) for i, it in enumerate(items, 1))
+    for label, key in [("Annexures","annexures"),("Citations","citations")]:
+        items = draft.get(key) or []
         if items:
-            _heading(doc, label[0], level=2)
-            for it in items: _para(doc, f"- {it}")
+            blocks.append(Block("heading", label))
+            blocks.extend(Block("bullet", it) for it in items)
     notes = draft.get("notes") or ""
     if notes:
-        _heading(doc, "Notes", level=2); _para(doc, notes)
-    doc.save(out_path)
+        blocks += [Block("heading", "Notes"), Block("body", notes)]
+    return blocks
+
+# ---------- serialisers ----------
+def _build_document(blocks: List[Block]) -> Document:
+    doc = Document(io.BytesIO(_base_docx()))
+    w = _Writer(doc)
+    for b in blocks:
+        if b.kind == "numbered":
+            w.add("body", f"{b.n}. {b.text}")
+        else:
+            w.add(b.kind, b.text)
+    return doc
+
+def _to_docx(blocks: List[Block]) -> bytes:
+    buf = io.BytesIO()
+    _build_document(blocks).save(buf)
+    return buf.getvalue()
+
+_HTML_CSS = ("body{font-family:'Times New Roman',Times,serif;font-size:12pt;max-width:46em;margin:2em auto;line-height:1.4}"
+             "h1{font-size:16pt;text-align:center}h2{font-size:12pt}p,li{text-align:justify}")
+
+def _to_html(blocks: List[Block]) -> bytes:
+    title = next((b.text for b in blocks if b.kind == "title"), "Draft")
+    out = [f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+           f"<style>{_HTML_CSS}</style></head><body>"]
+    open_list = ""
+    for b in blocks:
+        tag = {"numbered": "ol", "bullet": "ul"}.get(b.kind, "")
+        if open_list and tag != open_list:
+            out.append(f"</{open_list}>"); open_list = ""
+        if tag and not open_list:
+            out.append(f"<{tag}>"); open_list = tag
+        text = html.escape(b.text)
+        if b.kind == "title": out.append(f"<h1>{text}</h1>")
+        elif b.kind == "heading": out.append(f"<h2>{text}</h2>")
+        elif tag: out.append(f"<li>{text}</li>")
+        else: out.append(f"<p>{text}</p>")
+    if open_list:
+        out.append(f"</{open_list}>")
+    out.append("</body></html>")
+    return "\n".join(out).encode("utf-8")
+
+def _to_markdown(blocks: List[Block]) -> bytes:
+    out: List[str] = []
+    prev = ""
+    for b in blocks:
+        text = " ".join(b.text.split())
+        if b.kind in ("title", "heading", "body") or prev in ("title", "heading", "body"):
+            if out: out.append("")
+        if b.kind == "title": out.append(f"# {text}")
+        elif b.kind == "heading": out.append(f"## {text}")
+        elif b.kind == "numbered": out.append(f"{b.n}. {text}")
+        elif b.kind == "bullet": out.append(f"- {text}")
+        else: out.append(text)
+        prev = b.kind
+    return ("\n".join(out) + "\n").encode("utf-8")
+
+def _to_pdf(blocks: List[Block]) -> bytes:
+    pdf = PDFDocument()
+    for b in blocks:
+        if b.kind == "title": pdf.text(b.text, size=16, bold=True, align="center", space_after=12)
+        elif b.kind == "heading": pdf.text(b.text, bold=True, space_before=8)
+        elif b.kind == "numbered": pdf.text(b.text, indent=22, label=f"{b.n}.")
+        elif b.kind == "bullet": pdf.text(b.text, indent=22, label="\u2022")
+        else: pdf.text(b.text)
+    return pdf.to_bytes()
+
+# ---------- registry ----------
+class Exporter(NamedTuple):
+    media_type: str
+    render: Callable[[List[Block]], bytes]
+
+EXPORTERS: Dict[str, Exporter] = {}
+
+def register_exporter(fmt: str, media_type: str, render: Callable[[List[Block]], bytes]):
+    EXPORTERS[fmt] = Exporter(media_type, render)
+
+register_exporter("docx", DOCX_MEDIA_TYPE, _to_docx)
+register_exporter("html", "text/html; charset=utf-8", _to_html)
+register_exporter("md", "text/markdown; charset=utf-8", _to_markdown)
+register_exporter("pdf", "application/pdf", _to_pdf)
+
+def render(fmt: str, draft: Dict[str, Any], title: str = "Draft") -> bytes:
+    return EXPORTERS[fmt].render(document_model(draft, title))
+
+def build_docx_from_draft(draft: Dict[str, Any], out_path: str, title: str = "Draft"):
+    _build_document(document_model(draft, title)).save(out_path)
+
+def render_docx(draft: Dict[str, Any], title: str = "Draft") -> bytes:
+    return render("docx", draft, title)
+
+# ---------- render cache ----------
+_export_cache = MemoryCache(
+    max_entries=int(os.getenv("EXPORT_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("EXPORT_CACHE_TTL", 3600)),
+)
+
+def export_etag(fmt: str, draft_id: str, draft: Dict[str, Any], title: str) -> str:
+    """Strong ETag over everything that affects the rendered bytes."""
+    h = hashlib.sha256()
+    h.update(f"{EXPORTER_VERSION}\0{fmt}\0{draft_id}\0{title}\0".encode("utf-8"))
+    h.update(json.dumps(draft, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return f'"{h.hexdigest()[:32]}"'
+
+def cached_export(etag: str) -> Optional[bytes]:
+    return _export_cache.get_raw(etag)
+
+def render_cached(fmt: str, draft_id: str, draft: Dict[str, Any], title: str = "Draft") -> Tuple[bytes, str]:
+    """Return (bytes, etag), rendering only when the draft content, format or exporter version changed."""
+    etag = export_etag(fmt, draft_id, draft, title)
+    data = _export_cache.get_raw(etag)
+    if data is None:
+        with metrics.stage("export"):
+            data = render(fmt, draft, title)
+        _export_cache.set_raw(etag, data)
+        metrics.exports.inc(fmt=fmt, cache="miss")
+    else:
+        metrics.exports.inc(fmt=fmt, cache="hit")
+    return data, etag
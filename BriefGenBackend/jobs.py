@@ -0,0 +1,383 @@
+# BriefGenBackend/jobs.py
+import os, uuid, socket, asyncio, logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import Draft, Job, Batch
+from . import agent as agent_mod
+from . import revisions
+from . import metrics
+from .registry import registry as template_registry
+
+log = logging.getLogger("briefgen.jobs")
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 16))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+BATCH_HEARTBEAT = float(os.getenv("BATCH_HEARTBEAT", 30))
+BATCH_STALE_AFTER = float(os.getenv("BATCH_STALE_AFTER", 300))  # no heartbeat for this long: the worker is gone
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_LEASE = float(os.getenv("JOB_LEASE", 120))  # seconds without a heartbeat before a running job is reclaimed
+JOB_KINDS = ("generate", "export")
+
+
+# ---------- batch generation ----------
+def batch_dict(b: Batch) -> Dict[str, Any]:
+    epoch = lambda dt: dt.replace(tzinfo=timezone.utc).timestamp() if dt else None
+    return {
+        "job_id": b.id, "status": b.status, "total": b.total,
+        "done": b.done, "failed": b.failed, "concurrency": b.concurrency,
+        "draft_ids": b.draft_ids, "errors": b.errors,
+        "created_at": epoch(b.created_at), "finished_at": epoch(b.finished_at),
+    }
+
+_tasks: set = set()
+
+def validate_batch_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Check every item against the template registry up front; returns a list of per-item errors (empty if valid)."""
+    errors: List[Dict[str, Any]] = []
+    if not items:
+        return [{"index": None, "error": "No items"}]
+    if len(items) > BATCH_MAX_ITEMS:
+        return [{"index": None, "error": f"Too many items (max {BATCH_MAX_ITEMS})"}]
+    for i, item in enumerate(items):
+        template = item.get("template")
+        answers = item.get("answers")
+        if template not in template_registry:
+            errors.append({"index": i, "error": f"Unknown template: {template!r}"})
+            continue
+        if not isinstance(answers, dict):
+            errors.append({"index": i, "error": "answers must be an object"})
+            continue
+        unknown = template_registry[template].unknown(answers)
+        if unknown:
+            errors.append({"index": i, "error": "Unknown fields", "fields": unknown})
+            continue
+        missing = agent_mod.missing_fields(template, answers)
+        if missing:
+            errors.append({"index": i, "error": "Missing fields", "fields": missing})
+            continue
+        invalid = agent_mod.invalid_fields(template, answers)
+        if invalid:
+            errors.append({"index": i, "error": "Invalid fields", "fields": invalid})
+    return errors
+
+def get_batch(batch_id: str) -> Optional[Batch]:
+    """Batch status from the database; a batch whose worker stopped heartbeating is marked failed."""
+    with Session(engine) as session:
+        b = session.get(Batch, batch_id)
+        if b and b.status in ("pending", "running") and \
+                datetime.utcnow() - b.updated_at > timedelta(seconds=BATCH_STALE_AFTER):
+            b.status = "failed"; b.finished_at = datetime.utcnow()
+            b.errors = [*b.errors, {"index": None, "error": "Interrupted: the worker running it stopped"}]
+            session.add(b); session.commit(); session.refresh(b)
+        return b
+
+def _create_batch(total: int, concurrency: int) -> Batch:
+    with Session(engine) as session:
+        b = Batch(total=total, concurrency=concurrency)
+        session.add(b); session.commit(); session.refresh(b)
+        return b
+
+async def start_batch(items: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Batch:
+    """Record a batch and schedule it on the running loop. Items must already be validated."""
+    conc = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    b = await asyncio.to_thread(_create_batch, len(items), conc)
+    task = asyncio.create_task(_run_batch(b.id, items, conc))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return b
+
+def _batch_progress(batch_id: str, draft: Optional[Draft] = None, error: Optional[Dict[str, Any]] = None,
+                    **fields) -> None:
+    """One transaction per finished item: its draft (with its first revision) and the batch counters."""
+    with Session(engine) as session:
+        b = session.get(Batch, batch_id)
+        if draft is not None:
+            session.add(draft)
+            session.add(revisions.snapshot(draft, 1, "generate"))
+            b.done += 1
+            b.draft_ids = [*b.draft_ids, draft.id]
+        if error is not None:
+            if error["index"] is not None:
+                b.done += 1; b.failed += 1
+            b.errors = [*b.errors, error]
+        for k, v in fields.items():
+            setattr(b, k, v)
+        b.updated_at = datetime.utcnow()
+        session.add(b); session.commit()
+
+async def _run_batch(batch_id: str, items: List[Dict[str, Any]], concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    write = asyncio.Lock()  # the batch row is read-modify-written; keep this process's updates in order
+
+    async def progress(**kw):
+        async with write:
+            await asyncio.to_thread(_batch_progress, batch_id, **kw)
+
+    async def one(i: int, item: Dict[str, Any]):
+        async with sem:
+            try:
+                res = await agent_mod.generate_final(item["template"], item["answers"])
+            except Exception as e:
+                log.exception("Batch %s item %s failed", batch_id, i)
+                await progress(error={"index": i, "error": str(e)})
+                return
+        await progress(draft=Draft(template=item["template"], answers_json=dict(item["answers"]),
+                                   draft_json=res, status="drafted"))
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(BATCH_HEARTBEAT)
+            await progress()
+
+    beat = None
+    try:
+        await progress(status="running")
+        beat = asyncio.create_task(heartbeat())
+        await asyncio.gather(*(one(i, it) for i, it in enumerate(items)))
+        await progress(status="completed", finished_at=datetime.utcnow())
+    except Exception as e:
+        log.exception("Batch %s failed", batch_id)
+        await progress(error={"index": None, "error": str(e)}, status="failed", finished_at=datetime.utcnow())
+    finally:
+        if beat is not None:
+            beat.cancel()
+
+
+# ---------- background job queue ----------
+def job_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "job_id": job.id, "kind": job.kind, "draft_id": job.draft_id, "status": job.status,
+        "attempts": job.attempts, "error": job.error,
+        "created_at": job.created_at.isoformat(), "updated_at": job.updated_at.isoformat(),
+    }
+
+def _update(job_id: str, draft_status: Optional[str] = None, **fields) -> Optional[Job]:
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        if not job:
+            return None
+        for k, v in fields.items():
+            setattr(job, k, v)
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        if draft_status:
+            d = session.get(Draft, job.draft_id)
+            if d:
+                d.status = draft_status; d.updated_at = job.updated_at
+                session.add(d)
+        session.commit(); session.refresh(job)
+        return job
+
+
+class JobQueue:
+    """In-process queue backed by the `Job` table.
+
+    Jobs are written to the database before they are queued, and a worker
+    claims one atomically (queued -> running, stamped with its owner id)
+    before running it, so with several processes each job runs once. The
+    owner refreshes `heartbeat_at` while it works; a running job whose
+    heartbeat is older than JOB_LEASE is put back in the queue by whichever
+    process sweeps next. Draft generation status is mirrored onto
+    `Draft.status` (queued -> generating -> drafted | failed).
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, lease: float = JOB_LEASE):
+        self.workers = workers
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._local: set = set()  # ids waiting in this process's queue
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._local = set()
+        self._put(await asyncio.to_thread(self._recover))
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _put(self, job_ids: List[str]):
+        for job_id in job_ids:
+            if job_id not in self._local:
+                self._local.add(job_id)
+                self._queue.put_nowait(job_id)
+
+    def _recover(self) -> List[str]:
+        """Requeue (or fail) running jobs whose owner stopped heartbeating, with their drafts; return every queued job id."""
+        now = datetime.utcnow()
+        expired = and_(Job.status == "running",
+                       or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < now - timedelta(seconds=self.lease)))
+        exhausted = Job.attempts >= JOB_MAX_ATTEMPTS
+        def drafts_of(*cond):
+            return Draft.id.in_(select(Job.draft_id).where(expired, Job.kind == "generate", *cond))
+        with Session(engine) as session:
+            # drafts first, while the expired jobs still match; same transaction as the jobs, like _update
+            for cond, draft_status in ((exhausted, "failed"), (~exhausted, "queued")):
+                session.execute(update(Draft).where(drafts_of(cond), Draft.status == "generating").values(
+                    status=draft_status, updated_at=now))
+            dead = session.execute(update(Job).where(expired, exhausted).values(
+                status="failed", owner=None, error="Worker stopped while running it", updated_at=now)).rowcount
+            stale = session.execute(update(Job).where(expired).values(
+                status="queued", owner=None, updated_at=now)).rowcount
+            ids = session.exec(select(Job.id).where(Job.status == "queued").order_by(Job.created_at)).all()
+            session.commit()
+        if stale or dead:
+            log.warning("Reclaimed %s job(s) from stopped workers (%s out of attempts)", stale + dead, dead)
+        return list(ids)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.lease / 2)
+            try:
+                self._put(await asyncio.to_thread(self._recover))
+            except Exception as e:
+                log.warning("Job recovery sweep failed: %s", e)
+
+    def _create(self, kind: str, draft_id: str) -> Job:
+        with Session(engine) as session:
+            job = Job(kind=kind, draft_id=draft_id)
+            session.add(job)
+            if kind == "generate":
+                d = session.get(Draft, draft_id)
+                if d:
+                    d.status = "queued"; d.updated_at = datetime.utcnow()
+                    session.add(d)
+            session.commit(); session.refresh(job)
+            return job
+
+    async def enqueue(self, kind: str, draft_id: str) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job queue not started")
+        job = await asyncio.to_thread(self._create, kind, draft_id)
+        self._put([job.id])
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with Session(engine) as session:
+            return session.get(Job, job_id)
+
+    def claim(self, job_id: str) -> Optional[Job]:
+        """queued -> running for this owner, atomically; None if another worker got it first."""
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            claimed = session.execute(update(Job).where(Job.id == job_id, Job.status == "queued").values(
+                status="running", owner=self.owner, heartbeat_at=now, updated_at=now,
+                attempts=Job.attempts + 1)).rowcount
+            if claimed != 1:
+                session.rollback()
+                return None
+            job = session.get(Job, job_id)
+            if job.kind == "generate":
+                d = session.get(Draft, job.draft_id)
+                if d:
+                    d.status = "generating"; d.updated_at = now
+                    session.add(d)
+            session.commit(); session.refresh(job)
+            return job
+
+    def _touch(self, job_id: str):
+        with Session(engine) as session:
+            session.execute(update(Job).where(Job.id == job_id, Job.owner == self.owner, Job.status == "running")
+                            .values(heartbeat_at=datetime.utcnow()))
+            session.commit()
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 4)
+            try:
+                await asyncio.to_thread(self._touch, job_id)
+            except Exception as e:
+                log.warning("Heartbeat for job %s failed: %s", job_id, e)
+
+    async def _worker(self, n: int):
+        while True:
+            job_id = await self._queue.get()
+            self._local.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Job worker %s crashed on %s", n, job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.claim, job_id)
+        if job is None:
+            return  # done, failed, or claimed by another worker
+        beat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            with metrics.inflight.track(kind=f"job_{job.kind}"):
+                if job.kind == "generate":
+                    await self._generate(job)
+                else:
+                    await self._export(job)
+        except Exception as e:
+            log.exception("Job %s (%s) failed", job_id, job.kind)
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                await asyncio.to_thread(_update, job_id, "queued" if job.kind == "generate" else None,
+                                        status="queued", owner=None, error=str(e))
+                self._put([job_id])
+            else:
+                await asyncio.to_thread(_update, job_id, "failed" if job.kind == "generate" else None,
+                                        status="failed", error=str(e))
+        finally:
+            beat.cancel()
+
+    async def _generate(self, job: Job):
+        def load():
+            with Session(engine) as session:
+                d = session.get(Draft, job.draft_id)
+                return (d.template, dict(d.answers_json or {})) if d else None
+        loaded = await asyncio.to_thread(load)
+        if loaded is None:
+            raise LookupError("Draft not found")
+        draft_json = await agent_mod.generate_final(*loaded)
+
+        def save():
+            with Session(engine) as session:
+                d = session.get(Draft, job.draft_id)
+                d.draft_json = draft_json; d.status = "drafted"; d.updated_at = datetime.utcnow()
+                revisions.record(session, d, "generate")
+                j = session.get(Job, job.id)
+                j.status = "done"; j.error = None; j.updated_at = d.updated_at
+                session.add(d); session.add(j); session.commit()
+        await asyncio.to_thread(save)
+
+    async def _export(self, job: Job):
+        from .exporter import render_cached
+
+        def run():
+            with Session(engine) as session:
+                d = session.get(Draft, job.draft_id)
+                if not d:
+                    raise LookupError("Draft not found")
+                if not d.draft_json:
+                    raise ValueError("Draft not ready")
+                # warms the export cache; the result endpoint serves from it
+                render_cached("docx", d.id, d.draft_json, d.template)
+        await asyncio.to_thread(run)
+        await asyncio.to_thread(_update, job.id, None, status="done", error=None)
+
+queue = JobQueue()
@@ -0,0 +1,79 @@
+# BriefGenBackend/jsonstream.py
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class SectionStreamParser:
+    """Incremental parser for a single top-level JSON object arriving in chunks.
+
+    Each top-level member ("title": ..., "facts": [...]) is emitted as soon as
+    its value is complete, so callers can render sections while the model is
+    still producing the rest. Leading prose / code fences before the first
+    '{' are ignored.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self._pos = 0            # next index of self.buf to scan
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._started = False
+        self._member_start: Optional[int] = None
+        self.done = False
+        self.sections: dict = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        out: List[Tuple[str, Any]] = []
+        if self.done or not chunk:
+            return out
+        self.buf += chunk
+        buf = self.buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = i + 1
+                i += 1
+                continue
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                i += 1
+                continue
+            if ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:i], out)
+                    self.done = True
+                    i += 1
+                    break
+            elif ch == "," and self._depth == 1:
+                self._emit(buf[self._member_start:i], out)
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return out
+
+    def _emit(self, member: str, out: List[Tuple[str, Any]]):
+        if not member.strip():
+            return
+        try:
+            obj = json.loads("{" + member + "}")
+        except Exception:
+            return  # malformed member; the whole-text path will deal with it
+        for k, v in obj.items():
+            self.sections[k] = v
+            out.append((k, v))
@@ -0,0 +1,478 @@
+# BriefGenBackend/llm.py
+"""Model access: a pooled client per OpenAI-compatible endpoint, and a router over them.
+
+Providers are Together (TOGETHER_API_KEY) and/or any OpenAI-compatible server
+(LOCAL_LLM_BASE_URL, e.g. vLLM, llama.cpp, Ollama). The router sends each call to
+the provider with the lowest observed median latency whose circuit breaker is
+closed, hedges with a second request once the call outlives that provider's
+recent p95, takes the first usable answer and cancels the other.
+"""
+import os, json, time, random, asyncio, logging
+from collections import deque
+from contextlib import aclosing
+from typing import Optional, AsyncIterator, Dict, Any, List, Callable, Iterable
+
+import httpx
+
+from . import metrics
+
+log = logging.getLogger("briefgen.llm")
+
+DEFAULT_MODEL = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
+RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def _client_kwargs() -> Dict[str, Any]:
+    return dict(
+        max_concurrency=_env_int("LLM_MAX_CONCURRENCY", 8),
+        timeout=_env_float("LLM_TIMEOUT", 60.0),
+        connect_timeout=_env_float("LLM_CONNECT_TIMEOUT", 10.0),
+        max_retries=_env_int("LLM_MAX_RETRIES", 2),
+        backoff=_env_float("LLM_RETRY_BACKOFF", 0.5),
+        pool_size=_env_int("LLM_POOL_SIZE", 20),
+        keepalive_expiry=_env_float("LLM_KEEPALIVE", 30.0),
+    )
+
+
+class LLMClient:
+    """Long-lived chat-completions client for an OpenAI-compatible endpoint (Together by default).
+
+    One pooled `httpx.AsyncClient` is shared by every request, so connections
+    (and their TLS sessions) are kept alive between drafts. A semaphore caps
+    the number of in-flight upstream calls; each call has its own timeout and
+    is retried a bounded number of times with exponential backoff.
+    """
+
+    def __init__(self, base_url: str, api_key: str, *, max_concurrency: int = 8,
+                 timeout: float = 60.0, connect_timeout: float = 10.0,
+                 max_retries: int = 2, backoff: float = 0.5,
+                 pool_size: int = 20, keepalive_expiry: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=pool_size,
+                                max_keepalive_connections=pool_size,
+                                keepalive_expiry=keepalive_expiry),
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMClient"]:
+        api_key = os.getenv("TOGETHER_API_KEY")
+        if not api_key:
+            return None
+        return cls(os.getenv("TOGETHER_BASE_URL", "https://api.together.xyz/v1"), api_key, **_client_kwargs())
+
+    @classmethod
+    def local_from_env(cls) -> Optional["LLMClient"]:
+        base_url = os.getenv("LOCAL_LLM_BASE_URL")
+        if not base_url:
+            return None
+        return cls(base_url, os.getenv("LOCAL_LLM_API_KEY") or "local", **_client_kwargs())
+
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    def _payload(self, messages: list, model: str, stream: bool, **extra) -> Dict[str, Any]:
+        body = {"model": model, "messages": messages, "temperature": 0.2, "stream": stream}
+        body.update(extra)
+        return body
+
+    def _delay(self, attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        if resp is not None:
+            ra = resp.headers.get("retry-after")
+            if ra and ra.replace(".", "", 1).isdigit():
+                return min(float(ra), 30.0)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def complete(self, messages: list, model: str = DEFAULT_MODEL, **extra) -> Optional[str]:
+        body = self._payload(messages, model, False, **extra)
+        async with self._sem:
+            for attempt in range(self.max_retries + 1):
+                resp = None
+                try:
+                    resp = await self._http.post("/chat/completions", json=body)
+                    if resp.status_code not in RETRY_STATUS:
+                        resp.raise_for_status()
+                        data = resp.json()
+                        choices = data.get("choices") or []
+                        return choices[0]["message"]["content"] if choices else None
+                    log.warning("LLM upstream status=%s (attempt %s)", resp.status_code, attempt + 1)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    log.warning("LLM request error %s (attempt %s)", type(e).__name__, attempt + 1)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._delay(attempt, resp))
+        log.error("LLM call gave up after %s attempts", self.max_retries + 1)
+        return None
+
+    async def stream(self, messages: list, model: str = DEFAULT_MODEL, **extra) -> AsyncIterator[str]:
+        """Yield content deltas. Retries only happen before the first delta is produced."""
+        body = self._payload(messages, model, True, **extra)
+        async with self._sem:
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    async with self._http.stream("POST", "/chat/completions", json=body) as resp:
+                        if resp.status_code in RETRY_STATUS:
+                            log.warning("LLM upstream status=%s (attempt %s)", resp.status_code, attempt + 1)
+                        else:
+                            resp.raise_for_status()
+                            async for line in resp.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                try:
+                                    chunk = json.loads(data)
+                                except ValueError:
+                                    continue
+                                choices = chunk.get("choices") or []
+                                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                                if delta:
+                                    started = True
+                                    yield delta
+                            return
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if started:
+                        log.warning("LLM stream interrupted: %s", type(e).__name__)
+                        return
+                    log.warning("LLM stream error %s (attempt %s)", type(e).__name__, attempt + 1)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._delay(attempt))
+        log.error("LLM stream gave up after %s attempts", self.max_retries + 1)
+
+
+# ---------- routing: providers, circuit breakers, hedging ----------
+LLM_MIN_SAMPLES = _env_int("LLM_MIN_SAMPLES", 20)  # latencies needed before p50/p95 replace the defaults
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open (one trial call) after `cooldown`."""
+
+    def __init__(self, failures: int = 5, cooldown: float = 30.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def available(self) -> bool:
+        """Would `allow` let a call through right now? Claims nothing."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial)
+
+    def allow(self) -> bool:
+        """May a call go out now? Claims the trial slot when half-open: call it right before the request,
+        and end that request with `success`, `failure` or `release`."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def success(self):
+        self.consecutive, self.opened_at, self.trial = 0, None, False
+
+    def failure(self) -> bool:
+        """Record a failure; True if this one opened the circuit."""
+        self.consecutive += 1
+        self.trial = False
+        opened = self.opened_at is None and self.consecutive >= self.failures
+        if opened or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+        return opened
+
+    def release(self):
+        """A call ended without a verdict (cancelled): free the trial slot."""
+        self.trial = False
+
+
+class Provider:
+    """One upstream endpoint: its client, an optional model override, recent latencies and a breaker."""
+
+    def __init__(self, name: str, client: LLMClient, model: Optional[str] = None,
+                 breaker: Optional[CircuitBreaker] = None, window: int = 200):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: deque = deque(maxlen=window)  # seconds, successful calls only
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < LLM_MIN_SAMPLES:
+            return None
+        xs = sorted(self.latencies)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    def _done(self, ok: bool, started: float):
+        if ok:
+            self.breaker.success()
+            self.latencies.append(time.monotonic() - started)
+        elif self.breaker.failure():
+            log.warning("%s: circuit opened after %s consecutive failures", self.name, self.breaker.consecutive)
+        metrics.provider_calls.inc(provider=self.name, outcome="ok" if ok else "error")
+
+    def _rejected(self) -> bool:
+        if self.breaker.allow():
+            return False
+        metrics.provider_calls.inc(provider=self.name, outcome="rejected")
+        return True
+
+    def _abandoned(self):
+        """The call ended without a verdict (cancelled, or the consumer went away)."""
+        self.breaker.release()
+        metrics.provider_calls.inc(provider=self.name, outcome="cancelled")
+
+    async def complete(self, messages: list, model: str, **extra) -> Optional[str]:
+        if self._rejected():
+            return None
+        t = time.monotonic()
+        settled = False
+        try:
+            try:
+                out = await self.client.complete(messages, self.model or model, **extra)
+            except Exception as e:
+                log.warning("%s: call failed: %s", self.name, e)
+                out = None
+            self._done(out is not None, t)
+            settled = True
+            return out
+        finally:
+            if not settled:
+                self._abandoned()
+
+    async def stream(self, messages: list, model: str, **extra) -> AsyncIterator[str]:
+        if self._rejected():
+            return
+        t = time.monotonic()
+        started = settled = False
+        try:
+            try:
+                async for piece in self.client.stream(messages, self.model or model, **extra):
+                    started = True
+                    yield piece
+            except Exception as e:
+                log.warning("%s: stream failed: %s", self.name, e)
+            self._done(started, t)
+            settled = True
+        finally:
+            if not settled:
+                self._abandoned()
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {"name": self.name, "model": self.model, "state": self.breaker.state, "samples": len(self.latencies),
+                "p50": round(p50, 3) if p50 is not None else None, "p95": round(p95, 3) if p95 is not None else None}
+
+
+class Router:
+    """Chat completions over several providers. Same `complete`/`stream` interface as `LLMClient`.
+
+    Providers are ranked by median latency (breaker-open ones last, untried ones
+    at `hedge_delay`). A call that hasn't produced a usable answer after the
+    primary's p95 (clamped to `hedge_min`, `hedge_delay` until there are enough
+    samples) gets one hedge request to the next provider, or to the same one if
+    it is the only one; hedges are capped at `hedge_budget` of calls. A failed or
+    unusable answer fails over immediately. Nothing waits past `deadline`.
+    """
+
+    def __init__(self, providers: List[Provider], *, hedge: bool = True, hedge_delay: float = 10.0,
+                 hedge_min: float = 0.5, hedge_budget: float = 0.1, deadline: float = 90.0, explore: float = 0.02):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min = hedge_min
+        self.hedge_budget = hedge_budget
+        self.deadline = deadline
+        self.explore = explore
+        self.counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "deadline": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["Router"]:
+        factories = {"together": (LLMClient.from_env, None), "local": (LLMClient.local_from_env, "LOCAL_LLM_MODEL")}
+        # LLM_PROVIDERS=local,together picks and orders them (the order breaks latency ties)
+        order = [n.strip() for n in (os.getenv("LLM_PROVIDERS") or "together,local").split(",") if n.strip()]
+        providers = []
+        for name in order:
+            make, model_env = factories.get(name, (lambda: None, None))
+            client = make()
+            if client is not None:
+                providers.append(Provider(name, client, os.getenv(model_env) if model_env else None,
+                                          CircuitBreaker(_env_int("LLM_BREAKER_FAILURES", 5),
+                                                         _env_float("LLM_BREAKER_COOLDOWN", 30.0))))
+        if not providers:
+            return None
+        return cls(providers,
+                   hedge=os.getenv("LLM_HEDGE", "1").lower() in ("1", "true", "yes", "on"),
+                   hedge_delay=_env_float("LLM_HEDGE_DELAY", 10.0),
+                   hedge_min=_env_float("LLM_HEDGE_MIN", 0.5),
+                   hedge_budget=_env_float("LLM_HEDGE_BUDGET", 0.1),
+                   deadline=_env_float("LLM_DEADLINE", 90.0),
+                   explore=_env_float("LLM_EXPLORE", 0.02))
+
+    async def aclose(self):
+        for p in self.providers:
+            await p.client.aclose()
+
+    # ----- routing -----
+    def ranked(self) -> List[Provider]:
+        def key(p: Provider):
+            p50 = p.quantile(0.5)
+            return (p.breaker.state == "open", p50 if p50 is not None else self.hedge_delay, self.providers.index(p))
+        out = sorted(self.providers, key=key)
+        if len(out) > 1 and out[1].breaker.state != "open" and random.random() < self.explore:
+            out[0], out[1] = out[1], out[0]  # keep some samples flowing to the runner-up
+        return out
+
+    def _pick(self, ranked: List[Provider], used: Iterable[Provider]) -> Optional[Provider]:
+        """Best provider not in `used` whose breaker would let a call through, else a used one (a same-provider
+        hedge). Only looks: the provider claims its half-open trial slot itself when the request goes out."""
+        used = list(used)
+        for p in [p for p in ranked if p not in used] + [p for p in ranked if p in used]:
+            if p.breaker.available():
+                return p
+        return None
+
+    def _hedge_after(self, p: Provider) -> float:
+        p95 = p.quantile(0.95)
+        return max(self.hedge_min, p95 if p95 is not None else self.hedge_delay)
+
+    def _may_hedge(self) -> bool:
+        return self.hedge and self.counts["hedged"] < self.hedge_budget * self.counts["calls"] + 1
+
+    async def complete(self, messages: list, model: str = DEFAULT_MODEL,
+                       accept: Optional[Callable[[str], bool]] = None, **extra) -> Optional[str]:
+        """First answer `accept` approves (any non-empty answer without it). If none is approved, the first
+        non-empty answer is returned so the caller can still salvage it; None when nothing came back in time."""
+        self.counts["calls"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        ranked = self.ranked()
+        first = self._pick(ranked, ())
+        if first is None:
+            self.counts["rejected"] += 1
+            log.warning("All LLM providers are open-circuited; skipping the call")
+            return None
+        tasks = {asyncio.ensure_future(first.complete(messages, model, **extra)): first}
+        used = [first]
+        hedge_task = None
+        hedge_at = loop.time() + self._hedge_after(first) if self.hedge else None
+        unusable: Optional[str] = None
+        try:
+            while tasks:
+                wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, wake - loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    tasks.pop(t)
+                    out = t.result()
+                    if out and (accept is None or accept(out)):
+                        if t is hedge_task:
+                            self.counts["hedge_wins"] += 1
+                            metrics.hedges.inc(outcome="won")
+                        return out
+                    unusable = unusable or out
+                if loop.time() >= deadline:
+                    self.counts["deadline"] += 1
+                    log.warning("LLM call hit the %.0fs deadline", self.deadline)
+                    break
+                if len(used) > 1:
+                    continue
+                if not tasks:  # the only request failed or came back unusable: fail over now
+                    nxt = self._pick(ranked, used)
+                    if nxt is None:
+                        break
+                    self.counts["failovers"] += 1
+                    metrics.hedges.inc(outcome="failover")
+                elif hedge_at is not None and loop.time() >= hedge_at:
+                    if not self._may_hedge() or (nxt := self._pick(ranked, used)) is None:
+                        hedge_at = None
+                        continue
+                    self.counts["hedged"] += 1
+                    metrics.hedges.inc(outcome="fired")
+                    log.info("Hedging LLM call to %s after %.1fs", nxt.name, self._hedge_after(first))
+                else:
+                    continue
+                hedge_at = None
+                used.append(nxt)
+                t = asyncio.ensure_future(nxt.complete(messages, model, **extra))
+                tasks[t] = nxt
+                hedge_task = t if len(tasks) > 1 else None
+        finally:
+            for t in tasks:
+                t.cancel()
+        return unusable
+
+    async def stream(self, messages: list, model: str = DEFAULT_MODEL, **extra) -> AsyncIterator[str]:
+        """Streams aren't hedged (deltas can't be merged); a provider that yields nothing is failed over once."""
+        self.counts["calls"] += 1
+        ranked = self.ranked()
+        used: List[Provider] = []
+        for _ in range(2):
+            p = self._pick(ranked, used)
+            if p is None or p in used:
+                return
+            if used:
+                self.counts["failovers"] += 1
+                metrics.hedges.inc(outcome="failover")
+            used.append(p)
+            started = False
+            async with aclosing(p.stream(messages, model, **extra)) as pieces:  # settles the breaker if we stop early
+                async for piece in pieces:
+                    started = True
+                    yield piece
+            if started:
+                return
+
+    def models(self, model: str) -> str:
+        """Every "provider:model" that may answer a request for `model`; generation cache keys include it."""
+        return ",".join(sorted({f"{p.name}:{p.model or model}" for p in self.providers}))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counts, "providers": [p.stats() for p in self.providers]}
+
+
+# ---------- app-scoped singleton ----------
+_client: Optional[Router] = None
+
+def startup() -> Optional[Router]:
+    global _client
+    if _client is None:
+        _client = Router.from_env()
+    return _client
+
+async def shutdown():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client() -> Optional[Router]:
+    """Return the shared router, creating it lazily (e.g. for scripts outside the app lifespan)."""
+    return _client or startup()
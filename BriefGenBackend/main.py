@@ -1,24 +1,42 @@
 import os
+import io
+import csv
+import base64
 import json
 import time
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Depends, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, Response, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 
-from itsdangerous import URLSafeSerializer, BadSignature
 from pydantic import BaseModel
-from sqlmodel import select, Session
-
-from .db import init_db, get_session
-from .models import Draft, User
-from .schemas import AgentQuestionResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+
+from .db import init_db, get_async_session, get_async_engine, engine, dispose_async_engine
+from .models import Draft, User, Job, DraftRevision
+from .schemas import AgentQuestionResponse, JobIn, ZipExportIn, DraftPage, TemplateSchema, ReviseIn
 from . import agent as agent_mod
-from passlib.context import CryptContext
+from .registry import registry as template_registry
+from . import llm
+from . import jobs
+from . import zipexport
+from . import search
+from . import ratelimit
+from . import revisions
+from . import metrics
+from . import sessions
+from .cache import generation_cache
+from .speculative import speculator
 
 APP_NAME = "BriefGen"
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -54,6 +72,14 @@ class DraftCreateIn(BaseModel):
 class DraftCreateOut(BaseModel):
     draft_id: str
 
+class BatchItemIn(BaseModel):
+    template: str
+    answers: Dict[str, Any]
+
+class BatchIn(BaseModel):
+    items: List[BatchItemIn]
+    concurrency: Optional[int] = None
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")],
@@ -66,63 +92,89 @@ if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
-serializer = URLSafeSerializer(APP_SECRET, salt="briefgen-auth")
-
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
-def hash_pw(p: str) -> str: return pwd_ctx.hash(p)
-def verify_pw(p: str, h: str) -> bool: return pwd_ctx.verify(p, h)
-
-def _get_session_token(user: str = "admin") -> str:
-    return serializer.dumps({"user": user, "ts": int(time.time())})
+session_store = sessions.SessionStore(APP_SECRET)
 
 def _set_session_cookie(response: JSONResponse | RedirectResponse, user: str = "admin"):
-    token = _get_session_token(user)
-    # same cookie name/shape as your HTML login
-    response.set_cookie("briefgen_session", token, httponly=True, samesite="lax", secure=False, path="/")
+    sessions.set_cookie(response, session_store.issue(user))
 
-def _check_session_token(token: str) -> bool:
-    try:
-        data = serializer.loads(token)
-        return isinstance(data, dict) and isinstance(data.get("user"), str) and bool(data.get("user"))
-    except BadSignature:
-        return False
+def _session(request: Request) -> Optional[sessions.SessionInfo]:
+    return session_store.verify(request.cookies.get(sessions.COOKIE))
 
 def _is_auth(request: Request) -> bool:
-    token = request.cookies.get("briefgen_session")
-    return bool(token and _check_session_token(token))
+    return _session(request) is not None
 
 def _require_auth(request: Request):
     if not _is_auth(request):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-RATE_LIMIT_RPS = 1.0
-RATE_LIMIT_BURST = 5
-_bucket: Dict[str, Dict[str, Any]] = {}
+async def _hash(fn, *args):
+    try:
+        return await fn(*args)
+    except sessions.HashBusy:
+        raise HTTPException(status_code=503, detail="Too many logins in progress, try again shortly",
+                            headers={"Retry-After": "2"})
+
+rate_limiter = ratelimit.build_from_env()
+
+def _session_user(request: Request) -> Optional[str]:
+    info = _session(request)
+    return info.user if info is not None else None
 
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
+    if rate_limiter is None:
+        return await call_next(request)
     client_ip = request.client.host if request.client else "local"
-    now = time.time()
-    bucket = _bucket.get(client_ip) or {"tokens": RATE_LIMIT_BURST, "ts": now}
-    elapsed = now - bucket["ts"]
-    bucket["tokens"] = min(RATE_LIMIT_BURST, bucket["tokens"] + elapsed * RATE_LIMIT_RPS)
-    bucket["ts"] = now
-    if bucket["tokens"] < 1.0:
-        _bucket[client_ip] = bucket
-        return JSONResponse({"detail": "Too Many Requests"}, status_code=429)
-    bucket["tokens"] -= 1.0
-    _bucket[client_ip] = bucket
+    decision = await rate_limiter.hit(request.method, request.url.path, client_ip, _session_user(request))
+    if decision is not None and not decision.allowed:
+        return JSONResponse({"detail": "Too Many Requests"}, status_code=429,
+                            headers={"Retry-After": str(max(1, int(decision.retry_after + 0.999)))})
     response = await call_next(request)
     return response
 
+# registered after the rate limiter so it wraps it: 429s are counted and timed too
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    token = metrics.start_request()
+    t = time.perf_counter()
+    status_code = 500
+    try:
+        with metrics.inflight.track(kind="http"):
+            response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - t
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"  # templated path keeps label cardinality bounded
+        metrics.http_requests.inc(method=request.method, route=path, status=status_code)
+        metrics.http_latency.observe(elapsed, method=request.method, route=path)
+        timing = metrics.server_timing(token)
+    if timing:
+        response.headers["Server-Timing"] = f"{timing}, total;dur={elapsed * 1000:.1f}"
+    return response
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    search.init_search(engine)
+    llm.startup()
+    await session_store.start()
+    await jobs.queue.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    speculator.shutdown()
+    await jobs.queue.stop()
+    await llm.shutdown()
+    zipexport.shutdown_pool()
+    sessions.shutdown_pool()
+    await session_store.stop()
+    await dispose_async_engine()
 
 @app.post("/api/signup", response_model=MeOut)
-def api_signup(body: SignupIn, request: Request, session: Session = Depends(get_session)):
+async def api_signup(body: SignupIn, request: Request, session: AsyncSession = Depends(get_async_session)):
     # allow signup only if there are no users yet
-    exists = session.exec(select(User.id).limit(1)).first()
+    exists = (await session.exec(select(User.id).limit(1))).first()
     if exists is not None:
         raise HTTPException(status_code=403, detail="Sign-ups disabled")
 
@@ -131,10 +183,9 @@ def api_signup(body: SignupIn, request: Request, session: Session = Depends(get_
         raise HTTPException(400, "Email and password required")
 
     # create user
-    user = User(email=email, password_hash=hash_pw(body.password))
+    user = User(email=email, password_hash=await _hash(sessions.hash_password, body.password))
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
 
     # set cookie
     resp = JSONResponse({"email": user.email})
@@ -142,10 +193,10 @@ def api_signup(body: SignupIn, request: Request, session: Session = Depends(get_
     return resp
 
 @app.post("/api/login", response_model=MeOut)
-def api_login(body: LoginIn, request: Request, session: Session = Depends(get_session)):
+async def api_login(body: LoginIn, request: Request, session: AsyncSession = Depends(get_async_session)):
     email = body.email.strip().lower()
-    user = session.exec(select(User).where(User.email == email)).first()
-    if not user or not verify_pw(body.password, user.password_hash):
+    user = (await session.exec(select(User).where(User.email == email))).first()
+    if not user or not await _hash(sessions.verify_password, body.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     resp = JSONResponse({"email": user.email})
@@ -153,15 +204,20 @@ def api_login(body: LoginIn, request: Request, session: Session = Depends(get_se
     return resp
 
 @app.get("/api/me", response_model=MeOut)
-def api_me(request: Request, session: Session = Depends(get_session)):
-    token = request.cookies.get("briefgen_session")
-    if not token:
-        raise HTTPException(401, "Unauthorized")
-    try:
-        data = serializer.loads(token)
-        return {"email": data.get("user")}
-    except BadSignature:
+def api_me(request: Request):
+    info = _session(request)
+    if info is None:
         raise HTTPException(401, "Unauthorized")
+    return {"email": info.user}
+
+@app.post("/api/logout")
+async def api_logout(request: Request):
+    info = _session(request)
+    if info is not None:
+        await session_store.revoke(info)
+    resp = JSONResponse({"ok": True})
+    resp.delete_cookie(sessions.COOKIE, path="/")
+    return resp
 
 @app.post("/api/auth")
 def api_auth(body: ApiAuthIn):
@@ -171,20 +227,136 @@ def api_auth(body: ApiAuthIn):
     _set_session_cookie(resp)
     return resp
 
+def _etag_json(request: Request, etag: str, payload: Dict[str, Any]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
 @app.get("/api/templates", response_model=TemplatesOut)
-def api_templates():
-    # Drives the template picker
-    return {"templates": list(agent_mod.TEMPLATES.keys())}
+def api_templates(request: Request):
+    # Drives the template picker; the ETag changes whenever a definition file does
+    names = template_registry.names()
+    return _etag_json(request, template_registry.etag, {"templates": names})
+
+@app.get("/api/templates/{name}/schema", response_model=TemplateSchema)
+def api_template_schema(name: str, request: Request):
+    tpl = template_registry.get(name)
+    if tpl is None:
+        raise HTTPException(404, "Unknown template")
+    return _etag_json(request, f'"{tpl.digest[:32]}"', tpl.schema())
 
 @app.post("/api/drafts", response_model=DraftCreateOut)
-def api_create_draft(body: DraftCreateIn, request: Request, session: Session = Depends(get_session)):
+async def api_create_draft(body: DraftCreateIn, request: Request, session: AsyncSession = Depends(get_async_session)):
     _require_auth(request)
-    if body.template not in agent_mod.TEMPLATES:
+    if body.template not in template_registry:
         raise HTTPException(status_code=400, detail="Unknown template")
     d = Draft(template=body.template)
-    session.add(d); session.commit(); session.refresh(d)
+    session.add(d); await session.commit()
     return {"draft_id": d.id}
 
+def _batch_items_from_csv(raw: bytes, template: Optional[str]) -> List[Dict[str, Any]]:
+    """One row per draft; a `template` column wins over the form-level template. Raises ValueError on a bad file."""
+    try:
+        reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+        items = []
+        for row in reader:
+            if None in row:
+                raise ValueError(f"CSV line {reader.line_num} has more columns than the header")
+            row = {(k or "").strip(): (v or "").strip() for k, v in row.items()}
+            tpl = row.pop("template", "") or template
+            items.append({"template": tpl, "answers": {k: v for k, v in row.items() if k and v}})
+    except UnicodeDecodeError:
+        raise ValueError("CSV must be UTF-8 encoded")
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV: {e}")
+    return items
+
+@app.post("/api/drafts/batch", status_code=202)
+async def api_batch_drafts(request: Request):
+    """Generate many drafts in one job. Accepts JSON `{items, concurrency}` or a multipart CSV upload (`file`)."""
+    _require_auth(request)
+    ctype = request.headers.get("content-type", "")
+    concurrency: Optional[int] = None
+    if ctype.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(400, "CSV file required")
+        try:
+            items = _batch_items_from_csv(await upload.read(), form.get("template") or None)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if form.get("concurrency"):
+            try:
+                concurrency = int(form.get("concurrency"))
+            except ValueError:
+                raise HTTPException(400, "concurrency must be an integer")
+    else:
+        try:
+            body = BatchIn.model_validate(await request.json())
+        except Exception as e:
+            raise HTTPException(400, f"Invalid batch body: {e}")
+        items = [it.model_dump() for it in body.items]
+        concurrency = body.concurrency
+    errors = jobs.validate_batch_items(items)
+    if errors:
+        raise HTTPException(status_code=400, detail={"errors": errors})
+    batch = await jobs.start_batch(items, concurrency)
+    return {"job_id": batch.id, "total": batch.total, "status": batch.status}
+
+@app.get("/api/drafts/batch/{job_id}")
+def api_batch_status(job_id: str, request: Request):
+    _require_auth(request)
+    batch = jobs.get_batch(job_id)
+    if not batch: raise HTTPException(404, "Job not found")
+    return jobs.batch_dict(batch)
+
+@app.get("/api/cache/stats")
+def api_cache_stats(request: Request):
+    _require_auth(request)
+    return generation_cache.stats()
+
+@app.get("/api/llm/stats")
+def api_llm_stats(request: Request):
+    _require_auth(request)
+    client = llm.get_client()
+    return client.stats() if client is not None else {"providers": []}
+
+@app.get("/api/speculation/stats")
+def api_speculation_stats(request: Request):
+    _require_auth(request)
+    return speculator.stats()
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@metrics.on_collect
+def _collect_state():
+    for k, v in generation_cache.stats().items():
+        if isinstance(v, (int, float)):
+            metrics.collected.set(v, name=f"generation_cache_{k}")
+    for k, v in speculator.stats().items():
+        if isinstance(v, (int, float)):
+            metrics.collected.set(v, name=f"speculation_{k}")
+    metrics.collected.set(jobs.queue.depth(), name="job_queue_depth")
+    for k, v in session_store.stats().items():
+        metrics.collected.set(v, name=f"sessions_{k}")
+    client = llm.get_client()
+    for p in client.providers if client is not None else ():
+        metrics.collected.set(p.breaker.state != "closed", name=f"llm_breaker_open_{p.name}")
+        for q in ("p50", "p95"):
+            v = p.stats()[q]
+            if v is not None:
+                metrics.collected.set(v, name=f"llm_{q}_seconds_{p.name}")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(request: Request):
+    """Prometheus text exposition. Protected by a bearer token when METRICS_TOKEN is set."""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/healthz")
 def healthz():
     return {"ok": True, "app": APP_NAME}
@@ -203,79 +375,375 @@ def auth_page(request: Request):
 def auth_login(request: Request, password: str = Form(...)):
     if password != ADMIN_PASS:
         return HTMLResponse("<h3>Invalid password</h3><a href='/auth'>Try again</a>", status_code=401)
-    token = _get_session_token()
     resp = RedirectResponse(url="/", status_code=302)
-    resp.set_cookie("briefgen_session", token, httponly=True, samesite="lax", secure=False)
+    _set_session_cookie(resp)
     return resp
 
 @app.get("/logout")
-def logout():
+async def logout(request: Request):
+    info = _session(request)
+    if info is not None:
+        await session_store.revoke(info)
     resp = RedirectResponse(url="/auth", status_code=302)
-    resp.delete_cookie("briefgen_session")
+    resp.delete_cookie(sessions.COOKIE, path="/")
     return resp
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
     if not _is_auth(request):
         return RedirectResponse(url="/auth", status_code=302)
-    templates_list = list(agent_mod.TEMPLATES.keys())
+    templates_list = template_registry.names()
     return templates.TemplateResponse("home.html", {"request": request, "templates": templates_list, "app_name": APP_NAME})
 
 @app.post("/drafts")
-def create_draft(request: Request, template: str = Form(...), session: Session = Depends(get_session)):
+async def create_draft(request: Request, template: str = Form(...), session: AsyncSession = Depends(get_async_session)):
     _require_auth(request)
-    if template not in agent_mod.TEMPLATES:
+    if template not in template_registry:
         raise HTTPException(400, "Unknown template")
     d = Draft(template=template)
-    session.add(d); session.commit(); session.refresh(d)
+    session.add(d); await session.commit()
     return RedirectResponse(url=f"/drafts/{d.id}", status_code=302)
 
+def _draft_filters(template: Optional[str] = None, status: Optional[str] = None,
+                   date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> list:
+    clauses = []
+    if template: clauses.append(Draft.template == template)
+    if status: clauses.append(Draft.status == status)
+    if date_from: clauses.append(Draft.created_at >= date_from)
+    if date_to: clauses.append(Draft.created_at < date_to)
+    return clauses
+
+DRAFTS_PAGE_SIZE = 50
+DRAFTS_PAGE_MAX = 200
+
+def _encode_cursor(d: Draft) -> str:
+    return base64.urlsafe_b64encode(f"{d.created_at.isoformat()}|{d.id}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, draft_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), draft_id
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+async def _draft_page(session: AsyncSession, cursor: Optional[str], limit: int, template: Optional[str], status: Optional[str]):
+    """Keyset page of drafts, newest first, without loading the JSON blobs."""
+    limit = max(1, min(limit, DRAFTS_PAGE_MAX))
+    q = (select(Draft)
+         .options(load_only(Draft.id, Draft.template, Draft.status, Draft.created_at, Draft.updated_at))
+         .where(*_draft_filters(template, status)))
+    if cursor:
+        ts, draft_id = _decode_cursor(cursor)
+        q = q.where(or_(Draft.created_at < ts, and_(Draft.created_at == ts, Draft.id < draft_id)))
+    rows = (await session.exec(q.order_by(Draft.created_at.desc(), Draft.id.desc()).limit(limit + 1))).all()
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+@app.get("/api/drafts/search")
+async def api_search_drafts(request: Request, q: str, limit: int = 20, template: Optional[str] = None,
+                            session: AsyncSession = Depends(get_async_session)):
+    """Ranked full-text search over answers and generated sections, with <mark> highlights."""
+    _require_auth(request)
+    if not search.enabled:
+        raise HTTPException(501, "Full-text search is not available on this database")
+    hits = await session.run_sync(lambda s: search.search(s.connection(), q, max(1, min(limit, 100)), template))
+    return {"q": q, "hits": hits}
+
 @app.get("/drafts", response_class=HTMLResponse)
-def list_drafts(request: Request, session: Session = Depends(get_session)):
+async def list_drafts(request: Request, cursor: Optional[str] = None, template: Optional[str] = None,
+                      status: Optional[str] = None, limit: int = DRAFTS_PAGE_SIZE,
+                      session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    drafts, next_cursor = await _draft_page(session, cursor, limit, template or None, status or None)
+    return templates.TemplateResponse("drafts.html", {
+        "request": request, "drafts": drafts, "app_name": APP_NAME, "next_cursor": next_cursor,
+        "template": template or "", "status": status or "", "templates": template_registry.names(),
+    })
+
+@app.get("/api/drafts", response_model=DraftPage)
+async def api_list_drafts(request: Request, cursor: Optional[str] = None, template: Optional[str] = None,
+                          status: Optional[str] = None, limit: int = DRAFTS_PAGE_SIZE,
+                          session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    drafts, next_cursor = await _draft_page(session, cursor, limit, template, status)
+    return {"items": drafts, "next_cursor": next_cursor}
+
+@app.post("/api/drafts/{draft_id}/revise")
+async def api_revise_draft(draft_id: str, body: ReviseIn, request: Request, session: AsyncSession = Depends(get_async_session)):
+    """Edit answers of a generated draft; only the sections those fields feed are regenerated."""
+    _require_auth(request)
+    d = await session.get(Draft, draft_id)
+    if not d: raise HTTPException(404, "Draft not found")
+    if not d.draft_json: raise HTTPException(409, "Draft has not been generated yet")
+    unknown = agent_mod.unknown_fields(d.template, body.answers)
+    if unknown:
+        raise HTTPException(400, f"Unknown field(s) for {d.template}: {', '.join(unknown)}")
+    invalid = agent_mod.invalid_fields(d.template, body.answers)
+    if invalid:
+        raise HTTPException(400, "Invalid answer(s): " + "; ".join(f"{k}: {v}" for k, v in invalid.items()))
+    answers = {**(d.answers_json or {}), **body.answers}
+    missing = agent_mod.missing_fields(d.template, answers)
+    if missing:
+        raise HTTPException(400, f"Required field(s) left empty: {', '.join(missing)}")
+    latest = (await session.exec(revisions.latest_q(d.id))).one() or 0
+    changed = revisions.changed_fields(d.template, d.answers_json or {}, answers)
+    if not changed:
+        return {"draft_id": d.id, "revision": latest or None, "changed": [], "regenerated": [], "fallback": [], "draft": d.draft_json}
+
+    # drafts generated before revisions existed get their current state recorded first
+    baseline = revisions.snapshot(d, 1, "baseline")
+    seen = d.updated_at
+    sections = revisions.affected_sections(d.template, changed)
+    await session.close()  # no connection held while the model runs
+    draft, fell_back = await revisions.regenerate(d.template, answers, d.draft_json, sections)
+    revisions.apply(d, answers, draft)
+    # write only if nobody else changed the draft meanwhile; the update also serialises the numbering below
+    saved = await session.execute(update(Draft).where(Draft.id == d.id, Draft.updated_at == seen).values(
+        answers_json=d.answers_json, draft_json=d.draft_json, status=d.status, updated_at=d.updated_at))
+    if saved.rowcount != 1:
+        await session.rollback()
+        raise HTTPException(409, "Draft changed while it was being revised; reload and try again")
+    latest = (await session.exec(revisions.latest_q(d.id))).one() or 0
+    if not latest:
+        session.add(baseline)
+    number = latest + 1 if latest else 2
+    session.add(revisions.snapshot(d, number, "revise", changed, sections))
+    await _commit_revision(session)
+    return {"draft_id": d.id, "revision": number, "changed": changed, "regenerated": list(sections),
+            "fallback": fell_back, "draft": draft}
+
+async def _commit_revision(session: AsyncSession):
+    try:
+        await session.commit()
+    except IntegrityError:  # another request took the same revision number
+        await session.rollback()
+        raise HTTPException(409, "Draft changed concurrently; reload and try again")
+
+@app.get("/api/drafts/{draft_id}/revisions")
+async def api_list_revisions(draft_id: str, request: Request, limit: int = 50,
+                             session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    q = (select(DraftRevision).where(DraftRevision.draft_id == draft_id)
+         .order_by(DraftRevision.number.desc()).limit(max(1, min(limit, 200))))
+    return {"draft_id": draft_id, "items": [revisions.summary(r) for r in (await session.exec(q)).all()]}
+
+async def _get_revision(session: AsyncSession, draft_id: str, number: int) -> DraftRevision:
+    rev = (await session.exec(select(DraftRevision).where(
+        DraftRevision.draft_id == draft_id, DraftRevision.number == number))).first()
+    if not rev: raise HTTPException(404, "Revision not found")
+    return rev
+
+@app.get("/api/drafts/{draft_id}/revisions/{number}")
+async def api_get_revision(draft_id: str, number: int, request: Request, session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    rev = await _get_revision(session, draft_id, number)
+    return {**revisions.summary(rev), "answers": rev.answers_json, "draft": rev.draft_json}
+
+@app.post("/api/drafts/{draft_id}/revisions/{number}/restore")
+async def api_restore_revision(draft_id: str, number: int, request: Request, session: AsyncSession = Depends(get_async_session)):
     _require_auth(request)
-    drafts = session.exec(select(Draft).order_by(Draft.created_at.desc())).all()
-    return templates.TemplateResponse("drafts.html", {"request": request, "drafts": drafts, "app_name": APP_NAME})
+    d = await session.get(Draft, draft_id)
+    if not d: raise HTTPException(404, "Draft not found")
+    rev = await _get_revision(session, draft_id, number)
+    if not rev.draft_json: raise HTTPException(409, "Revision has no generated draft")
+    latest = (await session.exec(revisions.latest_q(d.id))).one() or 0
+    revisions.apply(d, dict(rev.answers_json or {}), rev.draft_json)
+    session.add(d); session.add(revisions.snapshot(d, latest + 1, "restore", restored_from=number))
+    await _commit_revision(session)
+    return {"draft_id": d.id, "revision": latest + 1, "restored_from": number, "draft": d.draft_json}
 
 @app.get("/drafts/{draft_id}", response_class=HTMLResponse)
-def draft_detail(draft_id: str, request: Request, session: Session = Depends(get_session)):
+async def draft_detail(draft_id: str, request: Request, session: AsyncSession = Depends(get_async_session)):
     _require_auth(request)
-    d = session.get(Draft, draft_id)
+    d = await session.get(Draft, draft_id)
     if not d: raise HTTPException(404, "Not found")
     return templates.TemplateResponse("draft_detail.html", {"request": request, "draft": d, "app_name": APP_NAME})
 
 class AgentNextIn(BaseModel):
     draft_id: str
     last_answer: Optional[Dict[str, Any]] = None
+    answers: Optional[Dict[str, Any]] = None  # several fields at once, e.g. a whole form submission
+    background: bool = False  # queue the final generation instead of awaiting it
+
+def _merge_answers(d: Draft, body: AgentNextIn) -> bool:
+    """Fold `answers` and `last_answer` into the draft in memory (nothing is written); True if it changed."""
+    incoming: Dict[str, Any] = dict(body.answers or {})
+    if incoming:
+        unknown = agent_mod.unknown_fields(d.template, incoming)
+        if unknown:
+            raise HTTPException(400, f"Unknown field(s) for {d.template}: {', '.join(unknown)}")
+    if body.last_answer and body.last_answer.get("field"):
+        incoming[body.last_answer["field"]] = body.last_answer.get("text")
+    if not incoming:
+        return False
+    invalid = agent_mod.invalid_fields(d.template, incoming)
+    if invalid:
+        raise HTTPException(400, "Invalid answer(s): " + "; ".join(f"{k}: {v}" for k, v in invalid.items()))
+    merged = {**(d.answers_json or {}), **incoming}
+    if merged == (d.answers_json or {}):
+        return False
+    d.answers_json = merged
+    d.status = "collecting"; d.updated_at = datetime.utcnow()
+    return True
+
+def _stored_final(d: Draft, changed: bool, pending: list) -> Optional[Dict[str, Any]]:
+    """The saved draft if it was generated from exactly these answers: reloading a drafted page replays it."""
+    return d.draft_json if d.status == "drafted" and d.draft_json and not changed and not pending else None
 
 @app.post("/agent/next", response_model=AgentQuestionResponse)
-async def agent_next(body: AgentNextIn, request: Request, session: Session = Depends(get_session)):
+async def agent_next(body: AgentNextIn, request: Request, session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    d = await session.get(Draft, body.draft_id)
+    if not d: raise HTTPException(404, "Draft not found")
+    changed = _merge_answers(d, body)
+    answers = dict(d.answers_json or {})
+    pending = agent_mod.remaining_questions(d.template, answers)
+    stored = _stored_final(d, changed, pending)
+    if stored is not None:
+        return {"type": "final", "draft": stored}
+    if pending or body.background:
+        if changed:
+            await session.commit()
+        if pending:
+            speculator.maybe_start(d.id, d.template, answers)
+            return {"type": "question", "question": pending[0], "questions": pending}
+        speculator.discard(d.id)
+        job = await jobs.queue.enqueue("generate", d.id)
+        return {"type": "queued", "job_id": job.id}
+    # answers are complete: save them first, so a failed or abandoned generation doesn't lose
+    # the last one, and give the connection back while the model runs
+    if changed:
+        await session.commit()
+    await session.close()
+    presets = await speculator.take(d.id, d.template, answers)
+    draft = await agent_mod.generate_final(d.template, answers, presets)
+    d.draft_json = draft; d.status = "drafted"; d.updated_at = datetime.utcnow()
+    rev = revisions.next_snapshot((await session.exec(revisions.latest_rev_q(d.id))).first(), d, "generate")
+    session.add(d)
+    if rev is not None:
+        session.add(rev)
+    await session.commit()
+    return {"type": "final", "draft": draft}
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.post("/agent/next/stream")
+async def agent_next_stream(body: AgentNextIn, request: Request, session: AsyncSession = Depends(get_async_session)):
+    """Server-Sent Events variant of /agent/next: draft sections are pushed as they are generated."""
     _require_auth(request)
-    d = session.get(Draft, body.draft_id)
+    d = await session.get(Draft, body.draft_id)
     if not d: raise HTTPException(404, "Draft not found")
-    if body.last_answer:
-        field = body.last_answer.get("field"); text = body.last_answer.get("text")
-        if field:
-            answers = dict(d.answers_json or {}); answers[field] = text
-            d.answers_json = answers; d.status = "collecting"
-            session.add(d); session.commit(); session.refresh(d)
-    result = await agent_mod.get_next_question_or_final(d.template, d.answers_json or {})
-    if result.get("type") == "final":
-        d.draft_json = result.get("draft"); d.status = "drafted"
-        session.add(d); session.commit(); session.refresh(d)
-    return result
-
-@app.get("/export/{draft_id}.docx")
-def export_docx(draft_id: str, request: Request, session: Session = Depends(get_session)):
+    changed = _merge_answers(d, body)
+    draft_id, template, answers = d.id, d.template, dict(d.answers_json or {})
+    pending = agent_mod.remaining_questions(template, answers)
+    stored = _stored_final(d, changed, pending)
+    if changed:
+        await session.commit()  # before generating: a dropped stream must not lose the last answer
+    if pending:
+        speculator.maybe_start(draft_id, template, answers)
+
+    async def events():
+        if stored is not None:
+            for k, v in stored.items():
+                yield _sse({"type": "section", "key": k, "value": v})
+            yield _sse({"type": "final", "draft": stored})
+            return
+        # only the final step consumes a speculation; a question step leaves it running
+        presets = None if pending else await speculator.take(draft_id, template, answers)
+        async for ev in agent_mod.stream_next_question_or_final(template, answers, presets):
+            if ev.get("type") == "final":
+                # the request-scoped session is gone by now; persist on our own
+                async with AsyncSession(get_async_engine(), expire_on_commit=False) as s:
+                    row = await s.get(Draft, draft_id)
+                    if row:
+                        row.draft_json = ev.get("draft"); row.status = "drafted"; row.updated_at = datetime.utcnow()
+                        rev = revisions.next_snapshot((await s.exec(revisions.latest_rev_q(row.id))).first(), row, "generate")
+                        s.add(row)
+                        if rev is not None:
+                            s.add(rev)
+                        await s.commit()
+            yield _sse(ev)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _export_response(d: Draft, request: Request, fmt: str = "docx") -> Response:
+    from .exporter import render_cached, EXPORTERS
+    # rendering is CPU-bound; keep it off the event loop
+    data, etag = await run_in_threadpool(render_cached, fmt, d.id, d.draft_json, title=d.template)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+    fname = f"{d.template.replace(' ','_')}-{d.id}.{fmt}"
+    headers["Content-Disposition"] = f'attachment; filename="{fname}"'
+    return Response(content=data, media_type=EXPORTERS[fmt].media_type, headers=headers)
+
+@app.get("/export/{draft_id}.{fmt}")
+async def export_draft(draft_id: str, fmt: str, request: Request, session: AsyncSession = Depends(get_async_session)):
+    from .exporter import EXPORTERS
     _require_auth(request)
-    d = session.get(Draft, draft_id)
+    if fmt not in EXPORTERS: raise HTTPException(404, "Unknown export format")
+    d = await session.get(Draft, draft_id)
     if not d: raise HTTPException(404, "Not found")
     if not d.draft_json: raise HTTPException(400, "Draft not ready")
-    from .exporter import build_docx_from_draft
-    out_dir = BASE_DIR / "exports"; out_dir.mkdir(exist_ok=True)
-    fname = f"{d.template.replace(' ','_')}-{d.id}.docx"
-    path = out_dir / fname
-    build_docx_from_draft(d.draft_json, str(path), title=d.template)
-    return FileResponse(str(path), media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", filename=fname)
+    return await _export_response(d, request, fmt)
+
+@app.post("/api/exports/zip")
+async def api_export_zip(body: ZipExportIn, request: Request, session: AsyncSession = Depends(get_async_session)):
+    """Stream a ZIP of many drafts, selected by id list and/or template/status/date filters."""
+    from .exporter import EXPORTERS
+    _require_auth(request)
+    if body.fmt not in EXPORTERS: raise HTTPException(400, "Unknown export format")
+    q = select(Draft.id).where(Draft.draft_json.is_not(None), *_draft_filters(body.template, body.status, body.date_from, body.date_to))
+    if body.draft_ids is not None:
+        q = q.where(Draft.id.in_(body.draft_ids))
+    elif not any([body.template, body.status, body.date_from, body.date_to]):
+        raise HTTPException(400, "Provide draft_ids or at least one filter")
+    ids = (await session.exec(q.order_by(Draft.created_at).limit(zipexport.ZIP_MAX_DRAFTS + 1))).all()
+    if not ids: raise HTTPException(404, "No exportable drafts match")
+    if len(ids) > zipexport.ZIP_MAX_DRAFTS:
+        raise HTTPException(413, f"Too many drafts (max {zipexport.ZIP_MAX_DRAFTS}); narrow the filter")
+    fname = f"briefgen-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"
+    return StreamingResponse(zipexport.stream_zip(list(ids), body.fmt), media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="{fname}"'})
+
+@app.post("/api/jobs", status_code=202)
+async def api_enqueue_job(body: JobIn, request: Request, session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    if body.kind not in jobs.JOB_KINDS:
+        raise HTTPException(400, "Unknown job kind")
+    d = await session.get(Draft, body.draft_id)
+    if not d: raise HTTPException(404, "Draft not found")
+    if body.kind == "generate" and agent_mod.missing_fields(d.template, d.answers_json or {}):
+        raise HTTPException(400, "Draft has unanswered fields")
+    if body.kind == "export" and not d.draft_json:
+        raise HTTPException(400, "Draft not ready")
+    job = await jobs.queue.enqueue(body.kind, d.id)
+    return jobs.job_dict(job)
+
+@app.get("/api/jobs/{job_id}")
+def api_job_status(job_id: str, request: Request):
+    _require_auth(request)
+    job = jobs.queue.get(job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    return jobs.job_dict(job)
+
+@app.get("/api/jobs/{job_id}/result")
+async def api_job_result(job_id: str, request: Request, session: AsyncSession = Depends(get_async_session)):
+    _require_auth(request)
+    job = await session.get(Job, job_id)
+    if not job: raise HTTPException(404, "Job not found")
+    if job.status != "done":
+        raise HTTPException(409, f"Job is {job.status}")
+    d = await session.get(Draft, job.draft_id)
+    if not d: raise HTTPException(404, "Draft not found")
+    if job.kind == "export":
+        if not d.draft_json: raise HTTPException(400, "Draft not ready")
+        return await _export_response(d, request)
+    return {"type": "final", "draft": d.draft_json}
 
 @app.get("/legal/{page}", response_class=HTMLResponse)
 def legal_page(page: str, request: Request):
@@ -0,0 +1,224 @@
+# BriefGenBackend/metrics.py
+"""In-process metrics (counters, gauges, histograms) in Prometheus text format.
+
+Values are per process: with several uvicorn workers each one serves its own
+numbers on /metrics. `stage(name)` times a block into the stage histogram and,
+when SERVER_TIMING is on, into the current request's Server-Timing header.
+"""
+import os, time, math, threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes", "on")
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], None]] = []
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("briefgen_timings", default=None)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    v = float(v)
+    return str(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = ['%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+             for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines for the current values, without the HELP/TYPE header."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # per-bucket counts + [sum, count]
+
+    def observe(self, value: float, **labels):
+        k = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(k)
+            if row is None:
+                row = self._values[k] = [0.0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(self._key(labels))
+        return int(row[-1]) if row else 0
+
+    def _samples(self):
+        out: List[str] = []
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for k, row in items:
+            acc = 0.0
+            for b, n in zip(self.buckets, row):
+                acc += n
+                le = 'le="%s"' % _fmt(b)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {_fmt(acc)}")
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {_fmt(row[-1])}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {row[-2]!r}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {_fmt(row[-1])}")
+        return out
+
+
+# ---------- application metrics ----------
+http_requests = Counter("briefgen_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("briefgen_http_request_seconds", "HTTP request latency by route.", ("method", "route"))
+stage_latency = Histogram("briefgen_stage_seconds", "Time spent per processing stage.", ("stage",))
+inflight = Gauge("briefgen_inflight", "Work currently in progress, by kind.", ("kind",))
+llm_calls = Counter("briefgen_llm_calls_total", "Model calls by outcome.", ("outcome",))
+provider_calls = Counter("briefgen_llm_provider_calls_total", "Upstream requests per provider (hedges included).", ("provider", "outcome"))
+hedges = Counter("briefgen_llm_hedges_total", "Hedge requests fired and won, and failovers.", ("outcome",))
+parse_outcomes = Counter("briefgen_parse_total", "Model output parse results (direct/extracted/repaired/failed).", ("how",))
+schema_failures = Counter("briefgen_schema_failures_total", "Recovered drafts that failed schema validation.")
+fallbacks = Counter("briefgen_fallbacks_total", "Rule-based fallbacks, whole draft or per section.", ("template", "scope"))
+prompt_tokens = Histogram("briefgen_llm_tokens", "Estimated tokens per model call: prompt input and completion output.",
+                          ("template", "part"), buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+prompt_truncations = Counter("briefgen_prompt_truncations_total", "Prompts whose answers were shortened to fit the input budget.", ("template",))
+exports = Counter("briefgen_exports_total", "Document renders by format and cache result.", ("fmt", "cache"))
+db_statements = Counter("briefgen_db_statements_total", "SQL statements executed.")
+collected = Gauge("briefgen_state", "Point-in-time values read at scrape time (caches, speculation).", ("name",))
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into briefgen_stage_seconds{stage=name} (and Server-Timing when enabled)."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t)
+
+def observe_stage(name: str, seconds: float):
+    stage_latency.observe(seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+def start_request() -> Optional[object]:
+    """Begin collecting Server-Timing entries for the current request context; returns a reset token."""
+    return _timings.set([]) if SERVER_TIMING else None
+
+def server_timing(token) -> Optional[str]:
+    if token is None:
+        return None
+    timings = _timings.get() or []
+    _timings.reset(token)
+    totals: Dict[str, List[float]] = {}
+    for name, s in timings:
+        row = totals.setdefault(name, [0.0, 0])
+        row[0] += s; row[1] += 1
+    return ", ".join(f'{name};dur={row[0] * 1000:.1f};desc="{row[1]}x"' for name, row in totals.items()) or None
+
+def on_collect(fn: Callable[[], None]):
+    """Register a callback run on every scrape, e.g. to copy cache stats into gauges."""
+    _collectors.append(fn)
+    return fn
+
+def render() -> str:
+    for fn in _collectors:
+        try:
+            fn()
+        except Exception:
+            pass
+    lines: List[str] = []
+    for m in _metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- DB time: every statement on every engine (sync, and async via its sync_engine) ----------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("briefgen_t", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("briefgen_t")
+    if stack:
+        observe_stage("db", time.perf_counter() - stack.pop())
+        db_statements.inc()
+
+@event.listens_for(Engine, "handle_error")
+def _on_error(ctx):
+    stack = ctx.connection.info.get("briefgen_t") if ctx.connection is not None else None
+    if stack:
+        stack.pop()
@@ -0,0 +1,93 @@
+# BriefGenBackend/migrations.py
+"""Ordered schema migrations, recorded in a `schema_migrations` table.
+
+`create_all` builds any missing tables; migrations cover what it cannot:
+indexes and columns added to tables that already exist. Append new steps
+to MIGRATIONS with the next version number; never edit an applied one.
+
+Workers start together, so every schema change runs under `schema_lock`: a
+file lock next to the SQLite database, or an advisory lock on Postgres.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev setups only
+    fcntl = None
+
+import sqlalchemy as sa
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.types import TypeEngine
+from sqlmodel import SQLModel
+
+log = logging.getLogger("briefgen.migrations")
+
+SCHEMA_LOCK_KEY = 0x42726965  # Postgres advisory lock id
+
+
+@contextmanager
+def schema_lock(engine: Engine):
+    """Exclusive across processes for the duration of the block. Not reentrant."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": SCHEMA_LOCK_KEY}); conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": SCHEMA_LOCK_KEY}); conn.commit()
+        return
+    path = engine.url.database if engine.dialect.name == "sqlite" else None
+    if not path or path == ":memory:" or fcntl is None:
+        yield
+        return
+    with open(f"{path}.schema-lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _create_missing_indexes(conn: Connection):
+    for table in SQLModel.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=conn, checkfirst=True)
+
+def _add_columns(table: str, columns: List[Tuple[str, TypeEngine]]) -> Callable[[Connection], None]:
+    """Nullable columns; types are compiled for the connection's dialect (DATETIME on SQLite, TIMESTAMP on Postgres)."""
+    def run(conn: Connection):
+        have = {c["name"] for c in inspect(conn).get_columns(table)}
+        for name, type_ in columns:
+            if name not in have:  # create_all already made it on a fresh database
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {type_.compile(dialect=conn.dialect)}"))
+    return run
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "draft listing indexes", _create_missing_indexes),
+    (2, "job ownership lease", _add_columns("job", [("owner", sa.String()), ("heartbeat_at", sa.DateTime())])),
+]
+
+
+def run_migrations(engine: Engine):
+    """Create missing tables and apply pending migrations. Safe to call from several workers at once."""
+    with schema_lock(engine):
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations "
+                "(version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at VARCHAR(40) NOT NULL)"
+            ))
+            # read under the lock: a worker that waited sees what the first one applied
+            applied = {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+        for version, name, fn in MIGRATIONS:
+            if version in applied:
+                continue
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                             {"v": version, "n": name, "t": datetime.utcnow().isoformat()})
+            log.info("Applied migration %s: %s", version, name)
@@ -1,7 +1,7 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 from sqlalchemy import JSON as SAJSON
 import uuid
 
@@ -15,10 +15,60 @@ class User(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Draft(SQLModel, table=True):
+    __table_args__ = (Index("ix_draft_created_at_id", "created_at", "id"),)  # keyset pagination
+
     id: str = Field(default_factory=gen_id, primary_key=True)
-    template: str
-    status: str = Field(default="collecting")
+    template: str = Field(index=True)
+    status: str = Field(default="collecting", index=True)  # collecting | queued | generating | drafted | failed
     answers_json: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(SAJSON))
     draft_json: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(SAJSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Job(SQLModel, table=True):
+    id: str = Field(default_factory=gen_id, primary_key=True)
+    kind: str  # "generate" | "export"
+    draft_id: str = Field(index=True)
+    status: str = Field(default="queued", index=True)  # queued | running | done | failed
+    attempts: int = Field(default=0)
+    error: Optional[str] = None
+    owner: Optional[str] = None  # worker that claimed it while running
+    heartbeat_at: Optional[datetime] = None  # refreshed by the owner; a stale one means the owner is gone
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Batch(SQLModel, table=True):
+    """A bulk generation request. Progress is written per item, so any worker can report it."""
+    id: str = Field(default_factory=gen_id, primary_key=True)
+    status: str = Field(default="pending", index=True)  # pending | running | completed | failed
+    total: int
+    concurrency: int
+    done: int = Field(default=0)
+    failed: int = Field(default=0)
+    draft_ids: List[str] = Field(default_factory=list, sa_column=Column(SAJSON))
+    errors: List[Dict[str, Any]] = Field(default_factory=list, sa_column=Column(SAJSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)  # heartbeat while running
+    finished_at: Optional[datetime] = None
+
+class DraftRevision(SQLModel, table=True):
+    """Snapshot of a draft's answers and generated text, numbered per draft."""
+    __table_args__ = (Index("ix_draftrevision_draft_id_number", "draft_id", "number", unique=True),)
+
+    id: str = Field(default_factory=gen_id, primary_key=True)
+    draft_id: str
+    number: int
+    source: str  # generate | baseline | revise | restore
+    answers_json: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(SAJSON))
+    draft_json: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(SAJSON))
+    changed_fields: List[str] = Field(default_factory=list, sa_column=Column(SAJSON))
+    regenerated: List[str] = Field(default_factory=list, sa_column=Column(SAJSON))
+    restored_from: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RevokedSession(SQLModel, table=True):
+    """A logged-out session id; kept until the token would have expired anyway."""
+    sid: str = Field(primary_key=True)
+    user: str
+    revoked_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    expires_at: datetime = Field(index=True)
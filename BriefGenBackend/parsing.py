@@ -0,0 +1,185 @@
+# BriefGenBackend/parsing.py
+"""Recover the draft object from raw model output and validate it.
+
+`parse_draft` tries, in order: the whole text as JSON; each top-level `{...}`
+found by a single string-aware brace scan (so prose, code fences or stray
+braces around the object don't matter); and finally a repair pass for
+trailing commas and output truncated mid-array/mid-string.
+"""
+import json
+from typing import Dict, Any, Optional, List, Tuple
+
+from jsonschema import Draft7Validator
+
+FINAL_SCHEMA = {
+    "type": "object",
+    "required": ["title","parties","facts","grounds","prayer","annexures","citations","notes"],
+    "properties": {
+        "title": {"type": "string"},
+        "parties": {"type": "array", "items": {"type": "string"}},
+        "facts": {"type": "array", "items": {"type": "string"}},
+        "grounds": {"type": "array", "items": {"type": "string"}},
+        "prayer": {"type": "array", "items": {"type": "string"}},
+        "annexures": {"type": "array", "items": {"type": "string"}},
+        "citations": {"type": "array", "items": {"type": "string"}},
+        "notes": {"type": "string"}
+    }
+}
+SECTIONS = tuple(FINAL_SCHEMA["required"])
+
+# built once; jsonschema.validate() would re-check the schema and rebuild a validator per call
+_validator = Draft7Validator(FINAL_SCHEMA)
+_section_validators = {k: Draft7Validator(v) for k, v in FINAL_SCHEMA["properties"].items()}
+
+_CLOSE = {"{": "}", "[": "]"}
+_MAX_CUTS = 4  # how many trailing elements repair may drop from truncated output
+
+
+# ---------- validation ----------
+def first_error(obj: Any) -> Optional[str]:
+    err = next(_validator.iter_errors(obj), None)
+    return err.message if err is not None else None
+
+def section_ok(key: str, value: Any) -> bool:
+    v = _section_validators.get(key)
+    return v is not None and v.is_valid(value)
+
+def merge_sections(draft: Dict[str, Any], fallback: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Keep every valid section of `draft`; take the rest from `fallback`. Returns (merged, replaced keys)."""
+    merged: Dict[str, Any] = {}
+    replaced: List[str] = []
+    for k in SECTIONS:
+        if k in draft and section_ok(k, draft[k]):
+            merged[k] = draft[k]
+        else:
+            merged[k] = fallback[k]
+            replaced.append(k)
+    return merged, replaced
+
+
+# ---------- scanning ----------
+def _scan(text: str) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    """One pass over `text`: spans of complete top-level objects, and the start of a trailing unclosed one."""
+    spans: List[Tuple[int, int]] = []
+    depth = 0
+    begin = -1
+    in_str = esc = False
+    for i, c in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            if depth:
+                in_str = True
+        elif c == "{":
+            if depth == 0:
+                begin = i
+            depth += 1
+        elif c == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                spans.append((begin, i + 1))
+    return spans, (begin if depth else None)
+
+def _score(obj: Dict[str, Any]) -> int:
+    return sum(1 for k in SECTIONS if k in obj)
+
+def _loads_dict(s: str) -> Optional[Dict[str, Any]]:
+    try:
+        obj = json.loads(s)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+# ---------- repair ----------
+def repair(fragment: str) -> Optional[Dict[str, Any]]:
+    """Best-effort fix of one object: drops trailing commas and closes truncated strings/arrays/objects.
+
+    When the text stops mid-element, the incomplete element is dropped (cut back to the previous comma)
+    rather than kept half-written.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []  # (len(out) at a comma, open containers there)
+    in_str = esc = False
+    for c in fragment:
+        if in_str:
+            out.append(c)
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+            continue
+        if c == '"':
+            in_str = True
+        elif c in "{[":
+            stack.append(c)
+        elif c in "}]":
+            if not stack:
+                break
+            # drop a trailing comma before the closer
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+            stack.pop()
+            out.append(c)
+            if not stack:
+                return _loads_dict("".join(out))
+            continue
+        elif c == ",":
+            cuts.append((len(out), tuple(stack)))
+        out.append(c)
+
+    # truncated: first try closing as-is (only if we're not mid-string), then cut back element by element
+    attempts: List[Tuple[int, Tuple[str, ...]]] = []
+    if not in_str:
+        attempts.append((len(out), tuple(stack)))
+    attempts.extend(reversed(cuts[-_MAX_CUTS:]))
+    for end, open_ in attempts:
+        body = "".join(out[:end]).rstrip()
+        if body.endswith(","):
+            body = body[:-1]
+        obj = _loads_dict(body + "".join(_CLOSE[b] for b in reversed(open_)))
+        if obj is not None:
+            return obj
+    return None
+
+
+# ---------- entry point ----------
+def parse_draft(text: Optional[str]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Returns (object or None, how): how is "direct", "extracted", "repaired" or "failed"."""
+    if not text:
+        return None, "failed"
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        obj = _loads_dict(stripped)
+        if obj is not None:
+            return obj, "direct"
+    spans, tail = _scan(text)
+    # the wanted object is the candidate carrying the most draft sections (prose may hold examples)
+    best, best_score, how = None, 0, "failed"
+    broken: List[str] = []
+    for a, b in spans:
+        obj = _loads_dict(text[a:b])
+        if obj is None:
+            broken.append(text[a:b])
+        elif _score(obj) > best_score:
+            best, best_score, how = obj, _score(obj), "extracted"
+    if best_score == len(SECTIONS):
+        return best, how
+    if tail is not None:
+        broken.append(text[tail:])
+    for frag in broken:
+        obj = repair(frag)
+        if obj is not None and _score(obj) > best_score:
+            best, best_score, how = obj, _score(obj), "repaired"
+    return best, how
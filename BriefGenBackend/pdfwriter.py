@@ -0,0 +1,138 @@
+# BriefGenBackend/pdfwriter.py
+"""Minimal pure-Python PDF writer for draft exports.
+
+Uses the standard Times-Roman / Times-Bold fonts (no embedding) with
+WinAnsi encoding, greedy word wrapping from the AFM glyph widths, and a
+"Page x of y" footer. Characters outside cp1252 are substituted.
+"""
+import zlib
+from typing import List, Tuple
+
+PAGE_W, PAGE_H = 595.0, 842.0  # A4 in points
+MARGIN = 72.0
+FOOTER_Y = 36.0
+
+# AFM advance widths (1/1000 em) for WinAnsi codes 32..126
+_TIMES_ROMAN = [
+    250, 333, 408, 500, 500, 833, 778, 180, 333, 333, 500, 564, 250, 333, 250, 278,
+    500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 278, 278, 564, 564, 564, 444,
+    921, 722, 667, 667, 722, 611, 556, 722, 722, 333, 389, 722, 611, 889, 722, 722,
+    556, 722, 667, 556, 611, 722, 722, 944, 722, 722, 611, 333, 278, 333, 469, 500,
+    333, 444, 500, 444, 500, 444, 333, 500, 500, 278, 278, 500, 278, 778, 500, 500,
+    500, 500, 333, 389, 278, 500, 500, 722, 500, 500, 444, 480, 200, 480, 541,
+]
+_TIMES_BOLD = [
+    250, 333, 555, 500, 500, 1000, 833, 278, 333, 333, 500, 570, 250, 333, 250, 278,
+    500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 333, 333, 570, 570, 570, 500,
+    930, 722, 667, 722, 722, 667, 611, 778, 778, 389, 500, 778, 667, 944, 722, 778,
+    611, 778, 722, 556, 667, 722, 722, 1000, 722, 722, 667, 333, 278, 333, 581, 500,
+    333, 500, 556, 444, 556, 444, 333, 500, 556, 278, 333, 556, 278, 833, 556, 500,
+    556, 556, 444, 389, 333, 556, 500, 722, 500, 500, 444, 394, 220, 394, 520,
+]
+_WIDTHS = {"F1": _TIMES_ROMAN, "F2": _TIMES_BOLD}
+_SUBST = {"₹": "Rs.", "−": "-", " ": " "}
+
+
+def _encode(text: str) -> bytes:
+    for k, v in _SUBST.items():
+        if k in text:
+            text = text.replace(k, v)
+    return text.encode("cp1252", errors="replace")
+
+def _width(data: bytes, font: str, size: float) -> float:
+    table = _WIDTHS[font]
+    return sum(table[b - 32] if 32 <= b <= 126 else 500 for b in data) * size / 1000.0
+
+def _wrap(text: str, font: str, size: float, max_w: float) -> List[bytes]:
+    lines: List[bytes] = []
+    space = _width(b" ", font, size)
+    cur: List[bytes] = []
+    cur_w = 0.0
+    for word in _encode(text).split():
+        w = _width(word, font, size)
+        while w > max_w:  # hard-break words longer than the line
+            if cur:
+                lines.append(b" ".join(cur)); cur, cur_w = [], 0.0
+            cut = len(word)
+            while cut > 1 and _width(word[:cut], font, size) > max_w:
+                cut -= 1
+            lines.append(word[:cut]); word = word[cut:]; w = _width(word, font, size)
+        if cur and cur_w + space + w > max_w:
+            lines.append(b" ".join(cur)); cur, cur_w = [], 0.0
+        cur_w = w if not cur else cur_w + space + w
+        cur.append(word)
+    if cur:
+        lines.append(b" ".join(cur))
+    return lines or [b""]
+
+def _esc(data: bytes) -> bytes:
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class PDFDocument:
+    """Flow layout of headings / paragraphs / list items onto A4 pages."""
+
+    def __init__(self):
+        self.pages: List[List[bytes]] = [[]]
+        self.y = PAGE_H - MARGIN
+
+    def _need(self, height: float):
+        if self.y - height < MARGIN:
+            self.pages.append([])
+            self.y = PAGE_H - MARGIN
+
+    def _line(self, x: float, data: bytes, font: str, size: float):
+        self.pages[-1].append(b"BT /%s %.1f Tf %.2f %.2f Td (%s) Tj ET" % (font.encode(), size, x, self.y, _esc(data)))
+
+    def text(self, text: str, *, size: float = 12, bold: bool = False, align: str = "left",
+             indent: float = 0.0, label: str = "", space_before: float = 0.0, space_after: float = 6.0):
+        font = "F2" if bold else "F1"
+        leading = size * 1.25
+        left = MARGIN + indent
+        max_w = PAGE_W - MARGIN - left
+        lines = _wrap(text, font, size, max_w)
+        self.y -= space_before
+        for i, data in enumerate(lines):
+            self._need(leading)
+            self.y -= size
+            if align == "center":
+                x = (PAGE_W - _width(data, font, size)) / 2
+            else:
+                x = left
+            if i == 0 and label:
+                lab = _encode(label)
+                self._line(left - _width(lab, font, size) - 4, lab, font, size)
+            self._line(x, data, font, size)
+            self.y -= leading - size
+        self.y -= space_after
+
+    def to_bytes(self) -> bytes:
+        n = len(self.pages)
+        objs: List[bytes] = []
+        # 1 catalog, 2 pages, 3/4 fonts, then (page, content) pairs
+        kids = " ".join(f"{5 + 2 * i} 0 R" for i in range(n)).encode()
+        objs.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+        objs.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n))
+        objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Times-Roman /Encoding /WinAnsiEncoding >>")
+        objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Times-Bold /Encoding /WinAnsiEncoding >>")
+        for i, ops in enumerate(self.pages):
+            footer = _encode(f"Page {i + 1} of {n}")
+            fx = (PAGE_W - _width(footer, "F1", 10)) / 2
+            ops = ops + [b"BT /F1 10 Tf %.2f %.2f Td (%s) Tj ET" % (fx, FOOTER_Y, _esc(footer))]
+            stream = zlib.compress(b"\n".join(ops))
+            objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                        b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                        % (PAGE_W, PAGE_H, 6 + 2 * i))
+            objs.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets: List[int] = []
+        for num, body in enumerate(objs, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+        for off in offsets:
+            out += b"%010d 00000 n \n" % off
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+        return bytes(out)
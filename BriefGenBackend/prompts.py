@@ -0,0 +1,161 @@
+# BriefGenBackend/prompts.py
+"""Prompt compilation: a static per-template prefix, compact answers, a token budget.
+
+Everything that doesn't depend on the answers (instructions, output shape, the
+template's own rules) is built once per template version
+into the system message, so every request for a template starts with the same
+bytes and providers with prefix caching can reuse it. The answers follow as one
+`field: value` line each, in questionnaire order. Token counts are estimates (no
+tokenizer dependency); when the input would exceed the template's budget the
+longest answers are shortened, and the output budget is sent as `max_tokens`.
+"""
+import os, json, hashlib, logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, List
+
+from .parsing import FINAL_SCHEMA
+from .registry import registry, CompiledTemplate
+from . import metrics
+
+log = logging.getLogger("briefgen.prompts")
+
+MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", 3000))
+MAX_OUTPUT_TOKENS = int(os.getenv("PROMPT_MAX_OUTPUT_TOKENS", 2048))
+MIN_SECTION_OUTPUT_TOKENS = 256
+MIN_ANSWER_CHARS = 40       # answers are never cut shorter than this, even over budget
+MESSAGE_OVERHEAD = 4        # role/separator tokens per chat message
+
+SYSTEM_INSTRUCTIONS = (
+    "You are a legal drafting assistant for India-focused documents.\n"
+    "Return a SINGLE JSON object ONLY (no markdown, no commentary), matching this schema:\n"
+    "{title: string, parties: string[], facts: string[], grounds: string[], prayer: string[], annexures: string[], citations: string[], notes: string}\n"
+    "Guidelines:\n"
+    "- Use formal, precise legal drafting language suitable for a pre-litigation notice.\n"
+    "- Expand the user's facts into complete, coherent paragraphs in 'facts'.\n"
+    "- In 'grounds', articulate the legal basis in plain language (no case citations unless provided).\n"
+    "- In 'prayer', include clear numbered demands and timelines.\n"
+    "- Do not invent real case citations; if not provided, use '[citation needed]'."
+)
+
+# share of the output budget a section-mode call gets, by the sections it drafts
+_SECTION_WEIGHT = {"facts": 4, "grounds": 3, "prayer": 2}  # the short sections count 0.5
+_TOTAL_WEIGHT = sum(_SECTION_WEIGHT.get(k, 0.5) for k in FINAL_SCHEMA["properties"])
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 UTF-8 bytes per token: close for English BPE vocabularies, errs high for Indic scripts."""
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+@dataclass(frozen=True)
+class Prefix:
+    template: str
+    source_digest: str   # template definition it was built from
+    system: str
+    digest: str          # of everything that shapes the output: system text and budgets
+    tokens: int
+    max_input: int
+    max_output: int
+
+
+@dataclass(frozen=True)
+class Prompt:
+    messages: list
+    input_tokens: int
+    prefix_tokens: int
+    max_tokens: int
+    truncated: Tuple[str, ...]   # fields whose answers were shortened to fit
+
+
+_prefixes: Dict[str, Prefix] = {}
+
+def _build_prefix(tpl: CompiledTemplate) -> Prefix:
+    system = (
+        f"{SYSTEM_INSTRUCTIONS}\n"
+        "Requirements:\n"
+        "- Output only the JSON object (no markdown code fences, no commentary).\n"
+        "- Populate each array with complete, formal sentences suitable for a legal document.\n"
+        + (f"- {tpl.prompt}\n" if tpl.prompt else "")
+        + f"Template: {tpl.name}\n"
+        "The facts follow as one 'field: answer' line per answered field."
+    )
+    max_input = tpl.budget.get("input", MAX_INPUT_TOKENS)
+    max_output = tpl.budget.get("output", MAX_OUTPUT_TOKENS)
+    digest = hashlib.sha256(f"{system}\x00{max_input}\x00{max_output}".encode("utf-8")).hexdigest()
+    return Prefix(tpl.name, tpl.digest, system, digest, estimate_tokens(system) + MESSAGE_OVERHEAD,
+                  max_input, max_output)
+
+def prefix(template: str) -> Prefix:
+    """The template's static system prompt; rebuilt only when its definition changes."""
+    tpl = registry[template]
+    p = _prefixes.get(template)
+    if p is None or p.source_digest != tpl.digest:
+        p = _prefixes[template] = _build_prefix(tpl)
+    return p
+
+
+# ---------- answers ----------
+def _flat(v: Any) -> str:
+    if isinstance(v, (list, tuple)):
+        v = "; ".join(str(x) for x in v)
+    elif isinstance(v, dict):
+        v = json.dumps(v, ensure_ascii=False, separators=(",", ":"))
+    return " ".join(str(v).split())
+
+def serialize_answers(template: str, answers: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(field, value) pairs in questionnaire order, whitespace collapsed, empty answers dropped."""
+    tpl = registry[template]
+    keys = [f.key for f in tpl.fields if f.key in answers] + [k for k in answers if k not in tpl.by_key]
+    out = []
+    for k in keys:
+        v = _flat(answers[k]) if answers[k] is not None else ""
+        if v:
+            out.append((k, v))
+    return out
+
+def _lines_tokens(lines: List[Tuple[str, str]]) -> int:
+    return sum(estimate_tokens(f"{k}: {v}\n") for k, v in lines)
+
+def _fit(lines: List[Tuple[str, str]], budget: int) -> Tuple[List[Tuple[str, str]], Tuple[str, ...]]:
+    """Cap every answer at the longest length that fits `budget` tokens (short answers stay whole)."""
+    if not lines or _lines_tokens(lines) <= budget:
+        return lines, ()
+    cut = lambda cap: [(k, v if len(v) <= cap else v[:cap].rstrip() + "…") for k, v in lines]
+    lo, hi = MIN_ANSWER_CHARS, max(len(v) for _, v in lines)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _lines_tokens(cut(mid)) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return cut(lo), tuple(k for k, v in lines if len(v) > lo)
+
+
+# ---------- compile ----------
+def section_shape(keys) -> str:
+    props = FINAL_SCHEMA["properties"]
+    return "{" + ", ".join(f"{k}: {'string' if props[k]['type'] == 'string' else 'string[]'}" for k in keys) + "}"
+
+def compile_prompt(template: str, answers: Dict[str, Any], keys: Optional[Tuple[str, ...]] = None) -> Prompt:
+    """Messages for the whole draft, or (with `keys`) only those sections; the system message is the same."""
+    p = prefix(template)
+    tail = (f"\nReturn ONLY a JSON object of the form {section_shape(keys)}; "
+            "the other sections are drafted separately.") if keys else ""
+    fixed = p.tokens + MESSAGE_OVERHEAD + estimate_tokens("Facts:\n" + tail)
+    lines, truncated = _fit(serialize_answers(template, answers), p.max_input - fixed)
+    user = "Facts:\n" + "\n".join(f"{k}: {v}" for k, v in lines) + tail
+    input_tokens = fixed + _lines_tokens(lines)
+
+    max_tokens = p.max_output
+    if keys:
+        share = sum(_SECTION_WEIGHT.get(k, 0.5) for k in keys) / _TOTAL_WEIGHT
+        max_tokens = max(MIN_SECTION_OUTPUT_TOKENS, int(p.max_output * share))
+
+    metrics.prompt_tokens.observe(input_tokens, template=template, part="input")
+    if truncated:
+        metrics.prompt_truncations.inc(template=template)
+        log.warning("Prompt for %s over its %s-token budget; shortened: %s", template, p.max_input, ", ".join(truncated))
+    log.info("Prompt %s%s: ~%s input tokens (%s prefix), max_tokens=%s", template,
+             f" [{','.join(keys)}]" if keys else "", input_tokens, p.tokens, max_tokens)
+    return Prompt([{"role": "system", "content": p.system}, {"role": "user", "content": user}],
+                  input_tokens, p.tokens, max_tokens, truncated)
@@ -0,0 +1,228 @@
+# BriefGenBackend/ratelimit.py
+import os, json, time, sqlite3, asyncio, threading, logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .db import DB_PATH
+
+log = logging.getLogger("briefgen.ratelimit")
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    rate: float        # tokens refilled per second
+    burst: int         # bucket capacity
+    per_user: bool = True  # key on the signed-in user when there is one, else on client IP
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    policy: Policy
+    remaining: float
+    retry_after: float
+
+
+def _refill(tokens: float, ts: float, now: float, p: Policy) -> Tuple[bool, float, float]:
+    tokens = min(float(p.burst), tokens + max(0.0, now - ts) * p.rate)
+    if tokens >= 1.0:
+        return True, tokens - 1.0, 0.0
+    return False, tokens, (1.0 - tokens) / p.rate if p.rate > 0 else 60.0
+
+
+# ---------- backends ----------
+class MemoryBackend:
+    """Per-process token buckets with bounded size: LRU eviction plus expiry of idle buckets."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 10000, idle_ttl: float = 600.0):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, p: Policy, now: float) -> Tuple[bool, float, float]:
+        with self._lock:
+            tokens, ts = self._buckets.pop(key, (float(p.burst), now))
+            allowed, tokens, retry = _refill(tokens, ts, now, p)
+            self._buckets[key] = (tokens, now)
+            self._evict(now)
+            return allowed, tokens, retry
+
+    def _evict(self, now: float):
+        b = self._buckets
+        while b:
+            oldest_key = next(iter(b))
+            if len(b) > self.max_keys or now - b[oldest_key][1] > self.idle_ttl:
+                b.popitem(last=False)
+            else:
+                break
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBackend:
+    """Buckets in a shared SQLite file so every worker process enforces the same limit.
+
+    Point it at a tmpfs path (the default uses /dev/shm when present) to keep it in shared memory.
+    """
+
+    blocking = True
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, idle_ttl: float = 600.0):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=OFF;")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, p: Policy, now: float) -> Tuple[bool, float, float]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, ts FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, ts = row if row else (float(p.burst), now)
+            allowed, tokens, retry = _refill(tokens, ts, now, p)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, ts) VALUES (?, ?, ?)", (key, tokens, now))
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE ts < ?", (now - self.idle_ttl,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens, retry
+
+
+# ---------- limiter ----------
+class RateLimiter:
+    """Matches a request to a policy (first rule whose method/path-prefix matches) and charges its bucket.
+
+    A rule with policy None exempts the route entirely (health checks, static files).
+    """
+
+    def __init__(self, backend, rules: List[Tuple[Optional[str], str, Optional[Policy]]], default: Policy):
+        self.backend = backend
+        self.rules = rules
+        self.default = default
+
+    def policy_for(self, method: str, path: str) -> Optional[Policy]:
+        for rule_method, prefix, policy in self.rules:
+            if (rule_method is None or rule_method == method) and path.startswith(prefix):
+                return policy
+        return self.default
+
+    async def hit(self, method: str, path: str, client_ip: str, user: Optional[str]) -> Optional[Decision]:
+        p = self.policy_for(method, path)
+        if p is None:
+            return None
+        who = f"u:{user}" if (p.per_user and user) else f"ip:{client_ip}"
+        key = f"{p.name}|{who}"
+        now = time.time()
+        try:
+            if self.backend.blocking:
+                allowed, remaining, retry = await asyncio.to_thread(self.backend.take, key, p, now)
+            else:
+                allowed, remaining, retry = self.backend.take(key, p, now)
+        except Exception as e:  # fail open: a broken limiter store must not take the app down
+            log.warning("Rate limiter backend error: %s", e)
+            return None
+        return Decision(allowed, p, remaining, retry)
+
+
+def _default_rules() -> List[Tuple[Optional[str], str, Optional[Policy]]]:
+    auth = Policy("auth", 0.2, 5, per_user=False)
+    agent = Policy("agent", 1.0, 10)
+    export = Policy("export", 2.0, 20)
+    return [
+        (None, "/healthz", None),
+        (None, "/metrics", None),
+        (None, "/static/", None),
+        ("POST", "/api/login", auth),
+        ("POST", "/api/signup", auth),
+        ("POST", "/api/auth", auth),
+        ("POST", "/auth", auth),
+        (None, "/agent/next", agent),
+        (None, "/export/", export),
+        (None, "/api/exports/", export),
+    ]
+
+def _parse_override(name: str, value) -> Optional[Tuple[float, int]]:
+    try:
+        rate, burst = (value["rps"], value["burst"]) if isinstance(value, dict) else value
+        rate, burst = float(rate), int(burst)
+    except (KeyError, TypeError, ValueError):
+        log.warning("Ignoring RATE_LIMIT_POLICIES entry %r: expected [rate, burst] or {\"rps\": .., \"burst\": ..}, got %r", name, value)
+        return None
+    if not (0 <= rate < float("inf")) or burst < 1:
+        log.warning("Ignoring RATE_LIMIT_POLICIES entry %r: need rate >= 0 and burst >= 1, got %r", name, value)
+        return None
+    return rate, burst
+
+def _apply_overrides(rules, default: Policy, raw: str):
+    """RATE_LIMIT_POLICIES='{"agent": [0.5, 5], "default": {"rps": 2, "burst": 10}}' overrides rate/burst by policy name.
+
+    A malformed value or entry is logged and skipped; it never stops the app from starting.
+    """
+    try:
+        overrides = json.loads(raw)
+    except ValueError:
+        overrides = None
+    if not isinstance(overrides, dict):
+        log.warning("Ignoring malformed RATE_LIMIT_POLICIES (expected a JSON object)")
+        return rules, default
+    known = {p.name for _, _, p in rules if p is not None} | {default.name}
+    parsed: Dict[str, Tuple[float, int]] = {}
+    for name, value in overrides.items():
+        if name not in known:
+            log.warning("Ignoring RATE_LIMIT_POLICIES entry %r: no such policy (known: %s)", name, ", ".join(sorted(known)))
+            continue
+        got = _parse_override(name, value)
+        if got is not None:
+            parsed[name] = got
+
+    def patch(p: Optional[Policy]) -> Optional[Policy]:
+        if p is None or p.name not in parsed:
+            return p
+        rate, burst = parsed[p.name]
+        return Policy(p.name, rate, burst, p.per_user)
+
+    return [(m, prefix, patch(p)) for m, prefix, p in rules], patch(default)
+
+def build_from_env() -> Optional[RateLimiter]:
+    """RATE_LIMIT_BACKEND=memory (default) | sqlite | off."""
+    kind = (os.getenv("RATE_LIMIT_BACKEND") or "memory").lower()
+    if kind in ("off", "none", "0"):
+        return None
+    default = Policy("default", float(os.getenv("RATE_LIMIT_RPS", 1.0)), int(os.getenv("RATE_LIMIT_BURST", 5)))
+    rules = _default_rules()
+    if os.getenv("RATE_LIMIT_POLICIES"):
+        rules, default = _apply_overrides(rules, default, os.environ["RATE_LIMIT_POLICIES"])
+    idle_ttl = float(os.getenv("RATE_LIMIT_IDLE_TTL", 600))
+    backend = None
+    if kind == "sqlite":
+        shm = "/dev/shm"
+        default_path = os.path.join(shm if os.path.isdir(shm) else os.path.dirname(os.path.abspath(DB_PATH)),
+                                    "briefgen-ratelimit.db")
+        try:
+            backend = SQLiteBackend(os.getenv("RATE_LIMIT_DB") or default_path, idle_ttl=idle_ttl)
+        except sqlite3.Error as e:
+            log.warning("SQLite rate limiter unavailable (%s); using per-process buckets", e)
+    if backend is None:
+        backend = MemoryBackend(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", 10000)), idle_ttl=idle_ttl)
+    return RateLimiter(backend, rules, default)
@@ -0,0 +1,331 @@
+# BriefGenBackend/registry.py
+"""Template registry: questionnaire definitions loaded from a directory of JSON/YAML files.
+
+One file per template: ordered fields (question text, hint, placeholder, validators,
+the draft sections each field feeds), an optional prompt fragment, an optional token
+budget ({"input": n, "output": n}) and a rule-based fallback spec. Files are compiled once and recompiled when their mtime changes.
+"""
+import os, re, json, time, string, hashlib, threading, logging
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, Callable, FrozenSet, Mapping
+
+try:  # optional: YAML definitions are only picked up when PyYAML is installed
+    import yaml
+except ImportError:
+    yaml = None
+
+log = logging.getLogger("briefgen.registry")
+
+TEMPLATE_DIR = os.getenv("BRIEFGEN_TEMPLATE_DIR") or str(Path(__file__).resolve().parent / "template_defs")
+RELOAD_INTERVAL = float(os.getenv("TEMPLATE_RELOAD_INTERVAL", 2.0))  # seconds between mtime checks; 0 = never reload
+SECTIONS = ("title", "parties", "facts", "grounds", "prayer", "annexures", "citations", "notes")
+_TEXT_SECTIONS = {"title", "notes"}
+
+Check = Callable[[Any], Optional[str]]
+
+
+class TemplateError(ValueError):
+    pass
+
+
+# ---------- validators ----------
+def _is_date(v: Any) -> bool:
+    try:
+        date.fromisoformat(str(v).strip())
+        return True
+    except ValueError:
+        return False
+
+def _is_number(v: Any) -> bool:
+    try:
+        float(str(v).replace(",", "").strip())
+        return True
+    except ValueError:
+        return False
+
+def _compile_checks(key: str, spec: Dict[str, Any]) -> Tuple[Check, ...]:
+    checks: List[Check] = []
+    kind = spec.get("type")
+    if kind == "date":
+        checks.append(lambda v: None if _is_date(v) else "expected a date as YYYY-MM-DD")
+    elif kind == "integer":
+        checks.append(lambda v: None if re.fullmatch(r"\s*-?\d+\s*", str(v)) else "expected a whole number")
+    elif kind == "number":
+        checks.append(lambda v: None if _is_number(v) else "expected a number")
+    elif kind is not None:
+        raise TemplateError(f"field {key}: unknown validator type {kind!r}")
+    if "pattern" in spec:
+        rx = re.compile(spec["pattern"])
+        msg = spec.get("message") or f"does not match {spec['pattern']}"
+        checks.append(lambda v: None if rx.fullmatch(str(v)) else msg)
+    if "choices" in spec:
+        choices = frozenset(str(c) for c in spec["choices"])
+        checks.append(lambda v: None if str(v) in choices else "expected one of: " + ", ".join(sorted(choices)))
+    if "max_length" in spec:
+        n = int(spec["max_length"])
+        checks.append(lambda v: None if len(str(v)) <= n else f"longer than {n} characters")
+    return tuple(checks)
+
+
+# ---------- fallback renderer ----------
+class _Answers(dict):
+    """format_map source: unanswered fields render as their placeholder."""
+
+    def __init__(self, answers: Mapping[str, Any], placeholders: Mapping[str, str]):
+        super().__init__(answers)
+        self.placeholders = placeholders
+
+    def __missing__(self, key):
+        return self.placeholders.get(key, f"[{key}]")
+
+def _refs(s: str, keys: FrozenSet[str], where: str) -> List[str]:
+    names = [name for _, name, _, _ in string.Formatter().parse(s) if name is not None]
+    for name in names:
+        if name not in keys:
+            raise TemplateError(f"fallback {where}: unknown field {{{name}}}")
+    return names
+
+def _compile_section(section: str, spec: Any, keys: FrozenSet[str], uses: Dict[str, set]):
+    """Returns a function (answers-view) -> section value."""
+    def note(names):
+        for name in names:
+            uses.setdefault(name, set()).add(section)
+
+    if spec is None:
+        empty = "" if section in _TEXT_SECTIONS else []
+        return lambda a: type(empty)(empty)
+    if isinstance(spec, str):
+        note(_refs(spec, keys, section))
+        return spec.format_map if section in _TEXT_SECTIONS else (lambda a: [spec.format_map(a)])
+    if isinstance(spec, list):
+        for s in spec:
+            note(_refs(s, keys, section))
+        return lambda a: [s.format_map(a) for s in spec]
+    if isinstance(spec, dict) and "split" in spec:
+        src, sep, default = spec["split"], spec.get("sep", ","), list(spec.get("default", []))
+        if src not in keys:
+            raise TemplateError(f"fallback {section}: unknown field {src}")
+        note([src])
+        return lambda a: [p.strip() for p in str(a.get(src) or "").split(sep) if p.strip()] or list(default)
+    raise TemplateError(f"fallback {section}: expected a string, a list or a split spec")
+
+
+# ---------- compiled templates ----------
+@dataclass(frozen=True)
+class Field:
+    key: str
+    text: str
+    hint: str
+    placeholder: str
+    required: bool
+    sections: FrozenSet[str]      # draft sections this answer feeds
+    checks: Tuple[Check, ...]
+    question: Dict[str, Any]      # precomputed wizard question (shared: do not mutate)
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    name: str
+    order: int
+    fields: Tuple[Field, ...]
+    by_key: Dict[str, Field]
+    prompt: str
+    budget: Mapping[str, int]     # "input" / "output" token caps; missing keys use the prompts defaults
+    source: str
+    digest: str
+    render_fallback: Callable[[Mapping[str, Any]], Dict[str, Any]]
+
+    def next_question(self, answers: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        for f in self.fields:
+            if f.required and not answers.get(f.key):
+                return f.question
+        return None
+
+    def remaining(self, answers: Mapping[str, Any]) -> List[Dict[str, Any]]:
+        return [f.question for f in self.fields if f.required and not answers.get(f.key)]
+
+    def missing(self, answers: Mapping[str, Any]) -> List[str]:
+        return [f.key for f in self.fields if f.required and not answers.get(f.key)]
+
+    def unknown(self, answers: Mapping[str, Any]) -> List[str]:
+        return [k for k in answers if k not in self.by_key]
+
+    def invalid(self, answers: Mapping[str, Any]) -> Dict[str, str]:
+        """field -> first failed check, for answered fields only."""
+        errors: Dict[str, str] = {}
+        for k, v in answers.items():
+            f = self.by_key.get(k)
+            if f is None or v in (None, ""):
+                continue
+            for check in f.checks:
+                err = check(v)
+                if err:
+                    errors[k] = err
+                    break
+        return errors
+
+    def sections_for(self, keys) -> FrozenSet[str]:
+        out: set = set()
+        for k in keys:
+            f = self.by_key.get(k)
+            out |= f.sections if f else set(SECTIONS)
+        return frozenset(out)
+
+    def schema(self) -> Dict[str, Any]:
+        return {
+            "template": self.name,
+            "fields": [{"field": f.key, "text": f.text, "hint": f.hint, "required": f.required, "order": i}
+                       for i, f in enumerate(self.fields)],
+        }
+
+
+def compile_template(raw: Dict[str, Any], source: str = "") -> CompiledTemplate:
+    name = raw.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise TemplateError("missing template name")
+    raw_fields = raw.get("fields") or []
+    if not raw_fields:
+        raise TemplateError(f"{name}: no fields")
+    keys = frozenset(f.get("key") for f in raw_fields)
+    if len(keys) != len(raw_fields) or None in keys:
+        raise TemplateError(f"{name}: field keys must be present and unique")
+
+    uses: Dict[str, set] = {}
+    spec = raw.get("fallback") or {}
+    unknown_sections = set(spec) - set(SECTIONS)
+    if unknown_sections:
+        raise TemplateError(f"{name}: unknown fallback section(s) {sorted(unknown_sections)}")
+    renderers = {s: _compile_section(s, spec.get(s), keys, uses) for s in SECTIONS}
+    placeholders = {f["key"]: f["placeholder"] for f in raw_fields if f.get("placeholder")}
+
+    def render_fallback(answers: Mapping[str, Any]) -> Dict[str, Any]:
+        view = _Answers(answers, placeholders)
+        return {s: fn(view) for s, fn in renderers.items()}
+
+    fields: List[Field] = []
+    for f in raw_fields:
+        key = f["key"]
+        # explicit `sections` wins; otherwise whatever the fallback uses it for; unused fields may feed anything
+        sections = frozenset(f.get("sections") or uses.get(key) or SECTIONS)
+        if not sections <= set(SECTIONS):
+            raise TemplateError(f"{name}: field {key} names unknown section(s)")
+        qid = hashlib.blake2b(f"{name}\x00{key}".encode("utf-8"), digest_size=8).hexdigest()
+        required = bool(f.get("required", True))
+        fields.append(Field(
+            key=key, text=f.get("text") or key, hint=f.get("hint") or "", placeholder=f.get("placeholder") or f"[{key}]",
+            required=required, sections=sections, checks=_compile_checks(key, f.get("validate") or {}),
+            question={"id": qid, "field": key, "text": f.get("text") or key, "hint": f.get("hint") or "", "required": required},
+        ))
+    budget = raw.get("budget") or {}
+    if not isinstance(budget, dict) or set(budget) - {"input", "output"} or \
+            not all(isinstance(v, int) and v > 0 for v in budget.values()):
+        raise TemplateError(f"{name}: budget must be {{\"input\": n, \"output\": n}} with positive integers")
+    digest = hashlib.sha256(json.dumps(raw, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return CompiledTemplate(name=name, order=int(raw.get("order", 1000)), fields=tuple(fields),
+                            by_key={f.key: f for f in fields}, prompt=(raw.get("prompt") or "").strip(),
+                            budget=dict(budget), source=source, digest=digest, render_fallback=render_fallback)
+
+
+# ---------- registry ----------
+class TemplateRegistry:
+    """Compiled templates by name. Lookups poll the directory's mtimes at most every `reload_interval` seconds
+    and recompile on change; a file that fails to compile keeps its last good version."""
+
+    def __init__(self, directory: str, reload_interval: float = RELOAD_INTERVAL):
+        self.directory = Path(directory)
+        self.reload_interval = reload_interval
+        self.etag = ""
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._signature: Optional[tuple] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _files(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        exts = {".json"} | ({".yaml", ".yml"} if yaml is not None else set())
+        return sorted(p for p in self.directory.iterdir() if p.suffix.lower() in exts and not p.name.startswith("."))
+
+    def _scan(self) -> tuple:
+        out = []
+        for p in self._files():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            out.append((p.name, st.st_mtime_ns, st.st_size))
+        return tuple(out)
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, Any]:
+        with open(path, encoding="utf-8") as fh:
+            if path.suffix.lower() == ".json":
+                return json.load(fh)
+            return yaml.safe_load(fh)
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        signature = self._scan()
+        previous: Dict[str, List[CompiledTemplate]] = {}
+        for t in self._templates.values():
+            previous.setdefault(t.source, []).append(t)
+        loaded: Dict[str, CompiledTemplate] = {}
+        for path in self._files():
+            try:
+                t = compile_template(self._read(path), source=path.name)
+                if t.name in loaded:
+                    raise TemplateError(f"duplicate template name {t.name!r} (also in {loaded[t.name].source})")
+                loaded[t.name] = t
+            except Exception as e:
+                log.error("Template %s not loaded: %s", path.name, e)
+                for old in previous.get(path.name, []):
+                    loaded.setdefault(old.name, old)
+        ordered = dict(sorted(loaded.items(), key=lambda kv: (kv[1].order, kv[0])))
+        changed = [n for n, t in ordered.items() if n not in self._templates or self._templates[n].digest != t.digest]
+        removed = [n for n in self._templates if n not in ordered]
+        self._templates = ordered
+        self._signature = signature
+        self.etag = '"%s"' % hashlib.sha256(
+            "\n".join(f"{n}:{t.digest}" for n, t in ordered.items()).encode("utf-8")).hexdigest()[:32]
+        if changed or removed:
+            log.info("Templates loaded from %s: %s changed, %s removed (%s total)",
+                     self.directory, len(changed), len(removed), len(ordered))
+
+    def maybe_reload(self):
+        if self._signature is not None and self.reload_interval <= 0:
+            return
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            if self._signature is not None and now - self._checked < self.reload_interval:
+                return
+            self._checked = now
+            if self._scan() != self._signature:
+                self._load()
+
+    def get(self, name: str) -> Optional[CompiledTemplate]:
+        self.maybe_reload()
+        return self._templates.get(name)
+
+    def __getitem__(self, name: str) -> CompiledTemplate:
+        t = self.get(name)
+        if t is None:
+            raise KeyError(name)
+        return t
+
+    def __contains__(self, name) -> bool:
+        return self.get(name) is not None
+
+    def names(self) -> List[str]:
+        self.maybe_reload()
+        return list(self._templates)
+
+
+registry = TemplateRegistry(TEMPLATE_DIR)
+registry.load()
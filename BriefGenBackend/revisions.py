@@ -0,0 +1,88 @@
+# BriefGenBackend/revisions.py
+"""Draft revision history, and regeneration of only the sections an answer edit affects."""
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .models import Draft, DraftRevision
+from .cache import normalize_answers
+from .parsing import SECTIONS
+from .registry import registry
+from . import agent as agent_mod
+from . import metrics
+
+log = logging.getLogger("briefgen.revisions")
+
+
+def latest_q(draft_id: str):
+    """Highest revision number of a draft (None when it has no history); exec with a sync or async session."""
+    return select(func.max(DraftRevision.number)).where(DraftRevision.draft_id == draft_id)
+
+def snapshot(d: Draft, number: int, source: str, changed: List[str] = (), regenerated: List[str] = (),
+             restored_from: Optional[int] = None) -> DraftRevision:
+    return DraftRevision(draft_id=d.id, number=number, source=source,
+                         answers_json=dict(d.answers_json or {}), draft_json=d.draft_json,
+                         changed_fields=list(changed), regenerated=list(regenerated), restored_from=restored_from)
+
+def latest_rev_q(draft_id: str):
+    """The newest revision row of a draft; exec with a sync or async session and take `.first()`."""
+    return select(DraftRevision).where(DraftRevision.draft_id == draft_id).order_by(DraftRevision.number.desc()).limit(1)
+
+def differs(rev: Optional[DraftRevision], d: Draft) -> bool:
+    """True unless `rev` already holds the draft's current answers and text."""
+    return rev is None or rev.answers_json != (d.answers_json or {}) or rev.draft_json != d.draft_json
+
+def next_snapshot(rev: Optional[DraftRevision], d: Draft, source: str, **kw) -> Optional[DraftRevision]:
+    """Snapshot following `rev` (the latest revision), or None when nothing changed since it."""
+    return snapshot(d, (rev.number if rev else 0) + 1, source, **kw) if differs(rev, d) else None
+
+def record(session: Session, d: Draft, source: str, **kw) -> Optional[DraftRevision]:
+    rev = next_snapshot(session.exec(latest_rev_q(d.id)).first(), d, source, **kw)
+    if rev is not None:
+        session.add(rev)
+    return rev
+
+def summary(rev: DraftRevision) -> Dict[str, Any]:
+    return {"number": rev.number, "source": rev.source, "changed_fields": rev.changed_fields,
+            "regenerated": rev.regenerated, "restored_from": rev.restored_from, "created_at": rev.created_at}
+
+
+# ---------- incremental regeneration ----------
+def changed_fields(template: str, old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Fields whose answer differs, ignoring whitespace-only edits; in questionnaire order."""
+    a, b = normalize_answers(old), normalize_answers(new)
+    order = {f.key: i for i, f in enumerate(registry[template].fields)}
+    return sorted((k for k in a.keys() | b.keys() if a.get(k) != b.get(k)), key=lambda k: (order.get(k, len(order)), k))
+
+def affected_sections(template: str, changed: List[str]) -> Tuple[str, ...]:
+    hit = registry[template].sections_for(changed)
+    return tuple(k for k in SECTIONS if k in hit)
+
+async def regenerate(template: str, answers: Dict[str, Any], draft: Dict[str, Any],
+                     sections: Tuple[str, ...]) -> Tuple[Dict[str, Any], List[str]]:
+    """Copy of `draft` with only `sections` regenerated from `answers`. Returns (draft, sections that fell back)."""
+    got: Dict[str, Any] = {}
+    if sections and agent_mod.llm.get_client() is not None:
+        # same grouping as the parallel mode, restricted to what changed
+        groups = tuple(tuple(k for k in g if k in sections) for g in agent_mod.SECTION_GROUPS if set(g) & set(sections))
+        got = await agent_mod.generate_sections(template, answers, groups)
+    out = dict(draft)
+    fell_back: List[str] = []
+    fallback = None
+    for k in sections:
+        if k in got:
+            out[k] = got[k]
+        else:
+            fallback = fallback or agent_mod._rule_based_final(template, answers)
+            out[k] = fallback[k]
+            fell_back.append(k)
+    if fell_back:
+        log.warning("Revision of %s: sections from fallback: %s", template, ", ".join(fell_back))
+        metrics.fallbacks.inc(template=template, scope="sections")
+    return out, fell_back
+
+def apply(d: Draft, answers: Dict[str, Any], draft: Dict[str, Any]):
+    d.answers_json = answers; d.draft_json = draft; d.status = "drafted"; d.updated_at = datetime.utcnow()
@@ -1,4 +1,5 @@
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 from pydantic import BaseModel
 
 class AgentQuestion(BaseModel):
@@ -9,6 +10,45 @@ class AgentQuestion(BaseModel):
     required: bool = True
 
 class AgentQuestionResponse(BaseModel):
-    type: str  # "question" | "final"
+    type: str  # "question" | "final" | "queued"
     question: Optional[AgentQuestion] = None
+    questions: Optional[List[AgentQuestion]] = None  # every unanswered question, first one == `question`
     draft: Optional[Dict[str, Any]] = None
+    job_id: Optional[str] = None
+
+class TemplateField(BaseModel):
+    field: str
+    text: str
+    hint: str = ""
+    required: bool = True
+    order: int
+
+class TemplateSchema(BaseModel):
+    template: str
+    fields: List[TemplateField]
+
+class ReviseIn(BaseModel):
+    answers: Dict[str, Any]  # only the fields being changed
+
+class JobIn(BaseModel):
+    kind: str  # "generate" | "export"
+    draft_id: str
+
+class ZipExportIn(BaseModel):
+    draft_ids: Optional[List[str]] = None
+    template: Optional[str] = None
+    status: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    fmt: str = "docx"
+
+class DraftSummary(BaseModel):
+    id: str
+    template: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
+
+class DraftPage(BaseModel):
+    items: List[DraftSummary]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,131 @@
+# BriefGenBackend/search.py
+import re, html, json, hashlib, logging
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from .models import Draft
+from .migrations import schema_lock
+
+log = logging.getLogger("briefgen.search")
+
+# draft_id is carried alongside the indexed text; the FTS rowid is derived from it
+# so updates/deletes are a rowid lookup rather than a scan of the index.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS draft_fts USING fts5("
+    "draft_id UNINDEXED, template, answers, content, tokenize='unicode61 remove_diacritics 2')"
+)
+_DRAFT_SECTIONS = ("title", "parties", "facts", "grounds", "prayer", "annexures", "citations", "notes")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# snippet() wraps matches in these; the stored text is escaped before they become <mark> tags
+_HL_OPEN, _HL_CLOSE = "\x02", "\x03"
+
+enabled = False
+
+
+def _fts_rowid(draft_id: str) -> int:
+    return int(hashlib.blake2b(draft_id.encode("utf-8"), digest_size=7).hexdigest(), 16)
+
+def flatten_answers(answers: Optional[Dict[str, Any]]) -> str:
+    return "\n".join(f"{k}: {v}" for k, v in (answers or {}).items() if v not in (None, ""))
+
+def flatten_draft(draft: Optional[Dict[str, Any]]) -> str:
+    if not draft:
+        return ""
+    parts: List[str] = []
+    for key in _DRAFT_SECTIONS:
+        v = draft.get(key)
+        if isinstance(v, list):
+            parts.extend(str(x) for x in v)
+        elif v:
+            parts.append(str(v))
+    return "\n".join(parts)
+
+def _clean(s: str) -> str:
+    return s.replace(_HL_OPEN, "").replace(_HL_CLOSE, "")  # so stored text can't fake a highlight
+
+def _index(conn, d: Draft):
+    rowid = _fts_rowid(d.id)
+    conn.execute(text("DELETE FROM draft_fts WHERE rowid = :r"), {"r": rowid})
+    conn.execute(
+        text("INSERT INTO draft_fts (rowid, draft_id, template, answers, content) VALUES (:r, :id, :t, :a, :c)"),
+        {"r": rowid, "id": d.id, "t": d.template, "a": _clean(flatten_answers(d.answers_json)),
+         "c": _clean(flatten_draft(d.draft_json))},
+    )
+
+# ---------- keep the index in step with Draft writes (same transaction) ----------
+@event.listens_for(Draft, "after_insert")
+@event.listens_for(Draft, "after_update")
+def _on_draft_write(mapper, connection, target: Draft):
+    if enabled:
+        _index(connection, target)
+
+@event.listens_for(Draft, "after_delete")
+def _on_draft_delete(mapper, connection, target: Draft):
+    if enabled:
+        connection.execute(text("DELETE FROM draft_fts WHERE rowid = :r"), {"r": _fts_rowid(target.id)})
+
+
+def init_search(engine):
+    """Create the FTS5 table (SQLite only) and index any drafts written before it existed."""
+    global enabled
+    if engine.dialect.name != "sqlite":
+        log.info("Full-text search disabled: dialect %s", engine.dialect.name)
+        return
+    try:
+        with schema_lock(engine), engine.begin() as conn:  # workers starting together rebuild it once
+            conn.execute(text(FTS_DDL))
+            indexed = conn.execute(text("SELECT count(*) FROM draft_fts")).scalar()
+            total = conn.execute(text("SELECT count(*) FROM draft")).scalar()
+            if indexed != total:
+                conn.execute(text("DELETE FROM draft_fts"))
+                rows = conn.execute(text("SELECT id, template, answers_json, draft_json FROM draft")).mappings()
+                for r in rows:
+                    d = Draft(id=r["id"], template=r["template"],
+                              answers_json=json.loads(r["answers_json"]) if r["answers_json"] else {},
+                              draft_json=json.loads(r["draft_json"]) if r["draft_json"] else None)
+                    _index(conn, d)
+                log.info("Rebuilt search index for %s draft(s)", total)
+        enabled = True
+    except OperationalError as e:
+        log.warning("Full-text search unavailable (FTS5 missing?): %s", e)
+
+def to_match_query(q: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    terms = _TOKEN.findall(q)
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search(conn, q: str, limit: int = 20, template: Optional[str] = None) -> List[Dict[str, Any]]:
+    match = to_match_query(q)
+    if not match:
+        return []
+    sql = (
+        "SELECT f.draft_id AS id, d.template AS template, d.status AS status, d.created_at AS created_at, "
+        "bm25(draft_fts, 0.0, 0.5, 2.0, 1.0) AS rank, "
+        "snippet(draft_fts, 2, :hl_open, :hl_close, '…', 12) AS answers_hl, "
+        "snippet(draft_fts, 3, :hl_open, :hl_close, '…', 16) AS content_hl "
+        "FROM draft_fts f JOIN draft d ON d.id = f.draft_id "
+        "WHERE draft_fts MATCH :q"
+    )
+    params: Dict[str, Any] = {"q": match, "limit": limit, "hl_open": _HL_OPEN, "hl_close": _HL_CLOSE}
+    if template:
+        sql += " AND d.template = :template"
+        params["template"] = template
+    sql += " ORDER BY rank LIMIT :limit"
+    hits = []
+    for r in conn.execute(text(sql), params).mappings():
+        hit = dict(r)
+        hit["answers_hl"], hit["content_hl"] = highlight(hit["answers_hl"]), highlight(hit["content_hl"])
+        hits.append(hit)
+    return hits
+
+def highlight(snippet: Optional[str]) -> Optional[str]:
+    """HTML-escape a snippet of user text, then turn the match markers into <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_HL_OPEN, "<mark>").replace(_HL_CLOSE, "</mark>")
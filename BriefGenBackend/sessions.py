@@ -0,0 +1,187 @@
+# BriefGenBackend/sessions.py
+"""Session tokens and password hashing.
+
+A session cookie is a signed, timestamped {user, sid}: it expires after
+SESSION_TTL and is revoked (logout) by recording its sid in RevokedSession.
+Each worker keeps the revoked sids in memory and picks up other workers'
+revocations every SESSION_REVOCATION_POLL seconds, so checking a request never
+touches the database; tokens that already verified are kept in an LRU so
+repeat requests skip the signature check too.
+
+bcrypt runs on its own small thread pool (PASSWORD_HASH_WORKERS) behind a
+bounded queue (PASSWORD_HASH_QUEUE): a burst of logins waits there, and past
+PASSWORD_HASH_WAIT seconds is turned away with 503, instead of filling the
+shared threadpool that normal requests use.
+"""
+import os, time, uuid, asyncio, logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from passlib.context import CryptContext
+from sqlmodel import Session, select, delete
+
+from .cache import MemoryCache
+from .db import engine
+from .models import RevokedSession
+from . import metrics
+
+log = logging.getLogger("briefgen.sessions")
+
+COOKIE = "briefgen_session"
+SESSION_TTL = int(os.getenv("SESSION_TTL", 12 * 3600))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 4096))
+SESSION_REVOCATION_POLL = float(os.getenv("SESSION_REVOCATION_POLL", 5))
+SECURE_COOKIES = os.getenv("SECURE_COOKIES", "0").lower() in ("1", "true", "yes", "on")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 32))
+PASSWORD_HASH_WAIT = float(os.getenv("PASSWORD_HASH_WAIT", 10))
+
+
+@dataclass(frozen=True)
+class SessionInfo:
+    user: str
+    sid: str
+    expires: float  # epoch seconds
+
+
+class SessionStore:
+    def __init__(self, secret: str, ttl: int = SESSION_TTL, cache_size: int = SESSION_CACHE_SIZE,
+                 poll: float = SESSION_REVOCATION_POLL):
+        self.ttl = ttl
+        self.poll = poll
+        self._signer = URLSafeTimedSerializer(secret, salt="briefgen-session")
+        self._verified = MemoryCache(max_entries=cache_size, ttl=ttl)
+        self._revoked: Dict[str, float] = {}  # sid -> token expiry (epoch); dropped once past it
+        self._synced: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"issued": 0, "cache_hits": 0, "verified": 0, "expired": 0, "invalid": 0, "revoked": 0}
+
+    # ----- tokens -----
+    def issue(self, user: str) -> str:
+        self.counts["issued"] += 1
+        return self._signer.dumps({"user": user, "sid": uuid.uuid4().hex})
+
+    def verify(self, token: Optional[str]) -> Optional[SessionInfo]:
+        if not token:
+            return None
+        info = self._verified.get_raw(token)
+        if info is not None:
+            self.counts["cache_hits"] += 1
+        else:
+            try:
+                data, signed_at = self._signer.loads(token, max_age=self.ttl, return_timestamp=True)
+            except SignatureExpired:
+                self.counts["expired"] += 1
+                return None
+            except BadSignature:
+                self.counts["invalid"] += 1
+                return None
+            if not (isinstance(data, dict) and isinstance(data.get("user"), str) and data["user"]
+                    and isinstance(data.get("sid"), str)):
+                self.counts["invalid"] += 1
+                return None
+            info = SessionInfo(data["user"], data["sid"], signed_at.timestamp() + self.ttl)
+            self.counts["verified"] += 1
+            self._verified.set_raw(token, info, ttl=max(0.0, info.expires - time.time()))
+        if info.expires <= time.time() or info.sid in self._revoked:
+            return None
+        return info
+
+    async def revoke(self, info: SessionInfo):
+        self._revoked[info.sid] = info.expires
+        self.counts["revoked"] += 1
+        await asyncio.to_thread(self._persist, info)
+
+    def _persist(self, info: SessionInfo):
+        with Session(engine) as session:
+            if session.get(RevokedSession, info.sid) is None:
+                session.add(RevokedSession(sid=info.sid, user=info.user,
+                                           expires_at=datetime.utcfromtimestamp(info.expires)))
+                session.commit()
+
+    # ----- revocations from other workers -----
+    def _load(self):
+        now = datetime.utcnow()
+        q = select(RevokedSession.sid, RevokedSession.expires_at).where(RevokedSession.expires_at > now)
+        if self._synced is not None:
+            q = q.where(RevokedSession.revoked_at >= self._synced - timedelta(seconds=1))  # clock slop between workers
+        with Session(engine) as session:
+            rows = session.exec(q).all()
+            if self._synced is None:
+                session.exec(delete(RevokedSession).where(RevokedSession.expires_at <= now))
+                session.commit()
+        epoch = datetime(1970, 1, 1)
+        for sid, expires_at in rows:
+            self._revoked[sid] = (expires_at - epoch).total_seconds()
+        cutoff = time.time()
+        for sid in [s for s, exp in self._revoked.items() if exp <= cutoff]:
+            del self._revoked[sid]
+        self._synced = now
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                await asyncio.to_thread(self._load)
+            except Exception as e:
+                log.warning("Could not refresh revoked sessions: %s", e)
+
+    async def start(self):
+        if self._task is None:
+            await asyncio.to_thread(self._load)
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {**self.counts, "cached": self._verified.stats()["entries"], "revoked_sids": len(self._revoked)}
+
+
+def set_cookie(response, token: str):
+    response.set_cookie(COOKIE, token, max_age=SESSION_TTL, httponly=True, samesite="lax",
+                        secure=SECURE_COOKIES, path="/")
+
+
+# ---------- password hashing ----------
+class HashBusy(Exception):
+    """Too many password hashes already queued."""
+
+
+pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_slots: Optional[asyncio.Semaphore] = None  # admitted hashes: running + queued
+
+async def _run_hash(fn, *args):
+    global _hash_pool, _hash_slots
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="briefgen-bcrypt")
+        _hash_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+    slots = _hash_slots
+    try:
+        await asyncio.wait_for(slots.acquire(), PASSWORD_HASH_WAIT)
+    except asyncio.TimeoutError:
+        raise HashBusy() from None
+    try:
+        with metrics.inflight.track(kind="password_hash"), metrics.stage("password_hash"):
+            return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        slots.release()
+
+async def hash_password(password: str) -> str:
+    return await _run_hash(pwd_ctx.hash, password)
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    return await _run_hash(pwd_ctx.verify, password, password_hash)
+
+def shutdown_pool():
+    global _hash_pool, _hash_slots
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = _hash_slots = None
@@ -0,0 +1,143 @@
+# BriefGenBackend/speculative.py
+"""Speculative pre-generation of the expensive draft sections.
+
+Once a draft is within SPECULATIVE_MAX_REMAINING answers of complete and the
+unanswered fields only feed cheap sections (per the template's field -> sections
+mapping), the section groups they can't affect are generated in the background.
+When the last answer arrives the speculation is reconciled: if no answer that
+feeds a speculated section changed since it started, its sections are reused and
+only the remaining groups are generated; otherwise it is cancelled.
+
+State is per process: with several workers a final request landing on another
+worker simply finds nothing to reuse.
+"""
+import os, time, asyncio, logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+
+from . import agent as agent_mod
+from .registry import registry
+
+log = logging.getLogger("briefgen.speculative")
+
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "0").lower() in ("1", "true", "yes", "on")
+SPECULATIVE_MAX_REMAINING = int(os.getenv("SPECULATIVE_MAX_REMAINING", 2))
+SPECULATIVE_MAX_INFLIGHT = int(os.getenv("SPECULATIVE_MAX_INFLIGHT", 16))
+SPECULATIVE_TTL = float(os.getenv("SPECULATIVE_TTL", 900))  # abandoned wizards
+
+
+@dataclass
+class Speculation:
+    template: str
+    basis: Dict[str, Any]          # answers the sections were generated from
+    sections: Tuple[str, ...]
+    task: asyncio.Task
+    started: float
+
+
+def _changed(a: Dict[str, Any], b: Dict[str, Any]):
+    return [k for k in a.keys() | b.keys() if a.get(k) != b.get(k)]
+
+
+class Speculator:
+    def __init__(self, enabled: bool = SPECULATIVE_GENERATION, max_remaining: int = SPECULATIVE_MAX_REMAINING,
+                 max_inflight: int = SPECULATIVE_MAX_INFLIGHT, ttl: float = SPECULATIVE_TTL):
+        self.enabled = enabled
+        self.max_remaining = max_remaining
+        self.max_inflight = max_inflight
+        self.ttl = ttl
+        self._specs: Dict[str, Speculation] = {}
+        self.counts = {"started": 0, "hits": 0, "hits_ready": 0, "misses": 0, "cancelled": 0, "expired": 0}
+
+    def _cancel(self, draft_id: str, reason: str):
+        spec = self._specs.pop(draft_id, None)
+        if spec is not None:
+            spec.task.cancel()
+            self.counts[reason] += 1
+
+    def _expire(self, now: float):
+        for draft_id in [d for d, s in self._specs.items() if now - s.started > self.ttl]:
+            self._cancel(draft_id, "expired")
+
+    def plan(self, template: str, answers: Dict[str, Any]) -> Tuple[Tuple[str, ...], ...]:
+        """Section groups that the still-unanswered fields cannot affect (empty: don't speculate)."""
+        tpl = registry.get(template)
+        if tpl is None:
+            return ()
+        remaining = tpl.missing(answers)
+        if not remaining or len(remaining) > self.max_remaining:
+            return ()
+        affected = tpl.sections_for(remaining)
+        return tuple(g for g in agent_mod.SECTION_GROUPS if not affected & set(g))
+
+    def maybe_start(self, draft_id: str, template: str, answers: Dict[str, Any]) -> bool:
+        if not self.enabled or agent_mod.llm.get_client() is None:
+            return False
+        now = time.monotonic()
+        self._expire(now)
+        groups = self.plan(template, answers)
+        if not groups:
+            self._cancel(draft_id, "cancelled")
+            return False
+        sections = tuple(k for g in groups for k in g)
+        current = self._specs.get(draft_id)
+        if current is not None:
+            stale = registry[template].sections_for(_changed(current.basis, answers)) & set(current.sections)
+            if current.sections == sections and not stale:
+                return True
+            self._cancel(draft_id, "cancelled")
+        if len(self._specs) >= self.max_inflight:
+            return False
+        basis = dict(answers)
+        task = asyncio.ensure_future(agent_mod.generate_sections(template, basis, groups))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # don't log "exception never retrieved"
+        self._specs[draft_id] = Speculation(template, basis, sections, task, now)
+        self.counts["started"] += 1
+        log.info("Speculating %s for draft %s", ", ".join(sections), draft_id)
+        return True
+
+    async def take(self, draft_id: str, template: str, answers: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Sections from a speculation that is still valid for `answers` (awaiting it if unfinished), else None.
+
+        Call it only when `answers` are complete and the result is about to be used: it ends the speculation
+        and counts it as a hit or a miss.
+        """
+        spec = self._specs.pop(draft_id, None)
+        if spec is None:
+            return None
+        tpl = registry.get(template)
+        if tpl is None or spec.template != template or \
+                tpl.sections_for(_changed(spec.basis, answers)) & set(spec.sections):
+            spec.task.cancel()
+            self.counts["misses"] += 1
+            return None
+        ready = spec.task.done()
+        try:
+            got = await spec.task
+        except Exception as e:
+            log.warning("Speculative generation for draft %s failed: %s", draft_id, e)
+            self.counts["misses"] += 1
+            return None
+        presets = {k: v for k, v in got.items() if k in spec.sections}
+        if not presets:  # every speculated section came back invalid
+            self.counts["misses"] += 1
+            return None
+        self.counts["hits"] += 1
+        self.counts["hits_ready"] += ready
+        return presets
+
+    def discard(self, draft_id: str):
+        self._cancel(draft_id, "cancelled")
+
+    def stats(self) -> Dict[str, Any]:
+        c = self.counts
+        resolved = c["hits"] + c["misses"]
+        return {**c, "enabled": self.enabled, "inflight": len(self._specs),
+                "hit_rate": round(c["hits"] / resolved, 4) if resolved else 0.0}
+
+    def shutdown(self):
+        for draft_id in list(self._specs):
+            self._cancel(draft_id, "cancelled")
+
+
+speculator = Speculator()
@@ -0,0 +1,138 @@
+# BriefGenBackend/zipexport.py
+import os, asyncio, zipfile, logging, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import Draft
+from . import exporter
+
+log = logging.getLogger("briefgen.zipexport")
+
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", max(1, (os.cpu_count() or 2) - 1)))
+ZIP_MAX_DRAFTS = int(os.getenv("ZIP_MAX_DRAFTS", 5000))
+_LOAD_CHUNK = 100
+_STORED = {"docx", "pdf"}  # already compressed
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    """The shared render pool; replaced if a worker died (OOM, kill), which breaks the whole executor."""
+    global _pool
+    if _pool is not None and getattr(_pool, "_broken", False):
+        log.warning("Export process pool is broken; starting a new one")
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and DB connections is not safe
+        _pool = ProcessPoolExecutor(max_workers=EXPORT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class _Sink:
+    """Write-only, non-seekable file object; zipfile then emits data descriptors instead of seeking back."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _load(ids: List[str]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    with Session(engine) as session:
+        rows = session.exec(select(Draft.id, Draft.template, Draft.draft_json).where(Draft.id.in_(ids))).all()
+        return [(r[0], r[1], r[2]) for r in rows if r[2]]
+
+def _entry_name(draft_id: str, template: str, fmt: str) -> str:
+    return f"{template.replace(' ','_')}-{draft_id}.{fmt}"
+
+async def stream_zip(ids: List[str], fmt: str = "docx") -> AsyncIterator[bytes]:
+    """Yield a ZIP archive of the given drafts, rendering in the process pool and writing entries as they finish."""
+    loop = asyncio.get_running_loop()
+    window = max(2, EXPORT_PROCESSES * 2)  # bounds memory held in rendered-but-unwritten entries
+    sink = _Sink()
+    compression = zipfile.ZIP_STORED if fmt in _STORED else zipfile.ZIP_DEFLATED
+    zf = zipfile.ZipFile(sink, mode="w", compression=compression)
+    pending: Dict[asyncio.Future, Tuple[str, str, Dict[str, Any]]] = {}
+    queue: List[Tuple[str, str, Dict[str, Any]]] = []
+    next_chunk = 0
+    written = 0
+    retried: set = set()  # drafts already resubmitted after the pool broke under them
+
+    def submit(row: Tuple[str, str, Dict[str, Any]]):
+        _, template, draft = row
+        try:
+            fut = loop.run_in_executor(get_pool(), exporter.render, fmt, draft, template)
+        except BrokenProcessPool:
+            fut = loop.run_in_executor(get_pool(), exporter.render, fmt, draft, template)
+        pending[fut] = row
+
+    def write(name: str, data: bytes):
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = compression
+        zf.writestr(info, data)
+
+    try:
+        while next_chunk < len(ids) or queue or pending:
+            if not queue and next_chunk < len(ids):
+                queue = await asyncio.to_thread(_load, ids[next_chunk:next_chunk + _LOAD_CHUNK])
+                next_chunk += _LOAD_CHUNK
+            while queue and len(pending) < window:
+                row = queue.pop(0)
+                draft_id, template, draft = row
+                etag = exporter.export_etag(fmt, draft_id, draft, template)
+                cached = exporter.cached_export(etag)
+                if cached is not None:
+                    write(_entry_name(draft_id, template, fmt), cached); written += 1
+                    continue
+                submit(row)
+            out = sink.drain()
+            if out:
+                yield out
+            if not pending:
+                continue
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                row = pending.pop(fut)
+                draft_id, template, _ = row
+                try:
+                    write(_entry_name(draft_id, template, fmt), fut.result()); written += 1
+                except BrokenProcessPool as e:
+                    if draft_id not in retried:
+                        retried.add(draft_id)
+                        submit(row)  # get_pool() replaces the broken pool
+                        continue
+                    log.error("Render failed for draft %s: %s", draft_id, e)
+                    write(f"errors/{draft_id}.txt", f"Export failed: {e}\n".encode("utf-8"))
+                except Exception as e:
+                    log.exception("Render failed for draft %s", draft_id)
+                    write(f"errors/{draft_id}.txt", f"Export failed: {e}\n".encode("utf-8"))
+            out = sink.drain()
+            if out:
+                yield out
+        zf.close()
+        yield sink.drain()
+        log.info("Streamed ZIP with %s %s export(s)", written, fmt)
+    finally:
+        for fut in pending:
+            fut.cancel()
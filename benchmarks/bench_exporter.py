@@ -0,0 +1,90 @@
+"""DOCX export benchmark: legacy per-run builder vs. the pre-styled base document builder.
+
+    python -m benchmarks.bench_exporter [--repeat 5] [--sizes 10,100,1000]
+
+For each draft size (number of items spread over the list sections) it reports
+the mean wall time per document and the tracemalloc peak for one render.
+"""
+import io, time, argparse, statistics, tracemalloc
+
+from docx import Document
+from docx.shared import Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from BriefGenBackend import exporter
+
+
+# ---------- legacy builder (pre-base-document), kept here for comparison ----------
+def _legacy_heading(doc, text, level=1):
+    p = doc.add_paragraph(); run = p.add_run(text); run.bold = True
+    if level == 1:
+        run.font.size = Pt(16); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    else:
+        run.font.size = Pt(12); p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+
+def _legacy_para(doc, text):
+    p = doc.add_paragraph(); r = p.add_run(text); r.bold = False; r.italic = False
+    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+def legacy_render(draft, title="Draft") -> bytes:
+    doc = Document()
+    style = doc.styles["Normal"]; style.font.name = "Times New Roman"; style.font.size = Pt(12)
+    footer = doc.sections[0].footer
+    p = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("Page "); exporter._add_field(run, "PAGE")
+    run = p.add_run(" of "); exporter._add_field(run, "NUMPAGES")
+    _legacy_heading(doc, draft.get("title") or title, 1)
+    for label, key in [("Parties","parties"),("Facts","facts"),("Grounds","grounds"),("Prayer","prayer")]:
+        items = draft.get(key) or []
+        if items:
+            _legacy_heading(doc, label, 2)
+            for i, it in enumerate(items, 1): _legacy_para(doc, f"{i}. {it}")
+    for label, key in [("Annexures","annexures"),("Citations","citations")]:
+        items = draft.get(key) or []
+        if items:
+            _legacy_heading(doc, label, 2)
+            for it in items: _legacy_para(doc, f"- {it}")
+    if draft.get("notes"):
+        _legacy_heading(doc, "Notes", 2); _legacy_para(doc, draft["notes"])
+    buf = io.BytesIO(); doc.save(buf)
+    return buf.getvalue()
+
+
+def make_draft(n_items: int) -> dict:
+    keys = ["parties", "facts", "grounds", "prayer", "annexures", "citations"]
+    draft = {k: [] for k in keys}
+    sentence = "That the Respondent failed to remit the sums due under the invoices despite repeated reminders."
+    for i in range(n_items):
+        draft[keys[i % len(keys)]].append(f"{sentence} ({i})")
+    draft.update(title="Benchmark Notice", notes="Without prejudice.")
+    return draft
+
+
+def measure(fn, draft, repeat: int):
+    fn(draft)  # warm-up (imports, base document cache)
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(draft); times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn(draft)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.mean(times), peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--sizes", default="10,100,1000")
+    args = ap.parse_args()
+    print(f"{'items':>6} {'builder':>8} {'ms/doc':>9} {'peak KiB':>9}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        draft = make_draft(n)
+        for name, fn in (("legacy", legacy_render), ("base", exporter.render_docx)):
+            t, peak = measure(fn, draft, args.repeat)
+            print(f"{n:>6} {name:>8} {t * 1000:>9.2f} {peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
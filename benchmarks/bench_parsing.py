@@ -0,0 +1,118 @@
+"""Model-output parsing benchmark: legacy regex extraction vs. parsing.parse_draft.
+
+    python -m benchmarks.bench_parsing [--repeat 200]
+
+The corpus is built from the rule-based drafts of every registered template,
+mangled the ways model output tends to go wrong (fences, chatter around the
+object, trailing commas, truncation). For each case it reports the outcome
+("valid" = usable as-is, "partial" = some sections kept, "fallback" =
+nothing recovered) and the mean time per parse+validate.
+"""
+import re, json, time, argparse, statistics
+
+from jsonschema import validate, ValidationError
+
+from BriefGenBackend import parsing
+from BriefGenBackend.registry import registry
+
+
+# ---------- legacy path (pre-parsing module), kept here for comparison ----------
+def _legacy_extract(text):
+    text = re.sub(r"```(?:json)?", "", text)
+    text = text.replace("```", "")
+    m = re.search(r"\{[\s\S]*\}", text)
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(0))
+    except Exception:
+        return None
+
+def legacy(text) -> str:
+    try:
+        obj = json.loads(text)
+    except Exception:
+        obj = _legacy_extract(text)
+    if not obj:
+        return "fallback"
+    try:
+        validate(instance=obj, schema=parsing.FINAL_SCHEMA)
+    except ValidationError:
+        return "fallback"
+    return "valid"
+
+def current(text) -> str:
+    obj, _ = parsing.parse_draft(text)
+    if obj is None:
+        return "fallback"
+    if parsing.first_error(obj) is None:
+        return "valid"
+    kept = sum(1 for k in parsing.SECTIONS if k in obj and parsing.section_ok(k, obj[k]))
+    return "partial" if kept else "fallback"
+
+
+# ---------- corpus ----------
+def _drafts():
+    for name in registry.names():
+        t = registry[name]
+        answers = {f.key: f"{f.text} — value for {name}" for f in t.fields}
+        yield name, t.render_fallback(answers)
+
+def corpus():
+    cases = []
+    for name, draft in _drafts():
+        compact = json.dumps(draft, ensure_ascii=False)
+        pretty = json.dumps(draft, ensure_ascii=False, indent=2)
+        cases += [
+            ("clean", compact),
+            ("pretty", pretty),
+            ("fenced", f"```json\n{pretty}\n```"),
+            ("chatter", f"Sure — here is the draft you asked for:\n{pretty}\nLet me know if you need changes."),
+            ("braces in chatter", f"Using the {{template}} format:\n{compact}\nFill in {{placeholders}} before filing."),
+            ("two objects", f'Example: {{"title": "x"}}\nFinal:\n{compact}'),
+            ("trailing commas", re.sub(r"(\"|\])(\s*[\]}])", r"\1,\2", pretty)),
+            ("truncated 90%", pretty[: int(len(pretty) * 0.9)]),
+            ("truncated 60%", pretty[: int(len(pretty) * 0.6)]),
+            ("fenced + truncated", "```json\n" + pretty[: int(len(pretty) * 0.8)]),
+            ("no json", f"I cannot draft a {name} without more details."),
+        ]
+    return cases
+
+
+def measure(fn, text, repeat):
+    fn(text)
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(text); times.append(time.perf_counter() - t)
+    return statistics.mean(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+    rows = {}
+    for case, text in corpus():
+        r = rows.setdefault(case, {"n": 0, "legacy": {}, "current": {}, "t_legacy": [], "t_current": []})
+        r["n"] += 1
+        for label, fn in (("legacy", legacy), ("current", current)):
+            outcome = fn(text)
+            r[label][outcome] = r[label].get(outcome, 0) + 1
+            r["t_" + label].append(measure(fn, text, args.repeat))
+
+    def fmt(counts):
+        return ",".join(f"{k}:{v}" for k, v in sorted(counts.items()))
+
+    print(f"{'case':<20} {'legacy':<22} {'us':>8}   {'current':<22} {'us':>8}")
+    totals = {"legacy": 0, "current": 0}
+    for case, r in rows.items():
+        totals["legacy"] += r["legacy"].get("fallback", 0)
+        totals["current"] += r["current"].get("fallback", 0)
+        print(f"{case:<20} {fmt(r['legacy']):<22} {statistics.mean(r['t_legacy']) * 1e6:>8.1f}   "
+              f"{fmt(r['current']):<22} {statistics.mean(r['t_current']) * 1e6:>8.1f}")
+    n = sum(r["n"] for r in rows.values())
+    print(f"\nwholesale fallbacks: legacy {totals['legacy']}/{n}, current {totals['current']}/{n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""End-to-end load test: the real app (uvicorn, SQLite) against the stub model server.
+
+    python -m benchmarks.loadtest [--workers 1,2,4] [--users 16] [--flows 64]
+                                  [--answers wizard|form] [--export docx,pdf]
+                                  [--latency 0.8 --jitter 0.3 --malformed 0.1 --errors 0.02]
+                                  [--tail 0.03 --tail-latency 20]
+                                  [--env GENERATION_MODE=sections ...]
+                                  [--json out.json] [--baseline old.json --tolerance 0.25]
+
+For each worker count a fresh database is created, the app is started with
+`uvicorn --workers N` pointed at benchmarks.stub_llm, and `--users` concurrent
+clients run `--flows` wizard flows in total: create a draft, answer every
+template field (one `/agent/next` per field, or the whole form at once with
+`--answers form`), get the final draft, export it. The report has throughput
+and p50/p95/p99 per endpoint, non-2xx counts, and the number of "database is
+locked" errors in the server log. With `--baseline` the run fails (exit 1)
+when an endpoint's p95 got worse by more than `--tolerance`.
+
+Answers are unique per flow and the generation cache is off by default
+(BRIEFGEN_CACHE=off), so every final draft costs a model call.
+"""
+import os, sys, json, math, time, socket, random, asyncio, argparse, tempfile, subprocess
+from pathlib import Path
+from typing import Dict, Any, List
+
+import httpx
+
+from BriefGenBackend.registry import registry
+
+ROOT = Path(__file__).resolve().parent.parent
+ADMIN_PASS = "loadtest"
+CANDIDATES = ("{text}", "125000", "2024-01-15")  # first one that passes the field's validators wins
+
+
+# ---------- answers ----------
+def answer_for(template: str, field: str, flow: int) -> str:
+    tpl = registry[template]
+    for c in CANDIDATES:
+        value = c.format(text=f"{field.replace('_', ' ')} for flow {flow}")
+        if not tpl.invalid({field: value}):
+            return value
+    raise SystemExit(f"no synthetic answer satisfies {template}.{field}; extend CANDIDATES")
+
+
+# ---------- processes ----------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _spawn(args: List[str], env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=ROOT, env={**os.environ, **env},
+                            stdout=log, stderr=subprocess.STDOUT)
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"{url}: process exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{url}: not ready after {timeout}s")
+
+def _stop(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ---------- client ----------
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.status: Dict[str, Dict[int, int]] = {}
+        self.failures: List[str] = []
+
+    def add(self, label: str, seconds: float, status: int):
+        self.samples.setdefault(label, []).append(seconds)
+        by = self.status.setdefault(label, {})
+        by[status] = by.get(status, 0) + 1
+
+
+async def _req(client: httpx.AsyncClient, rec: Recorder, label: str, method: str, url: str, **kw) -> httpx.Response:
+    t = time.perf_counter()
+    try:
+        resp = await client.request(method, url, **kw)
+    except httpx.HTTPError as e:
+        rec.add(label, time.perf_counter() - t, 0)
+        raise RuntimeError(f"{label}: {type(e).__name__}") from e
+    rec.add(label, time.perf_counter() - t, resp.status_code)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"{label}: HTTP {resp.status_code} {resp.text[:200]}")
+    return resp
+
+async def run_flow(client: httpx.AsyncClient, rec: Recorder, args, flow: int):
+    template = args.templates[flow % len(args.templates)]
+    draft_id = (await _req(client, rec, "POST /api/drafts", "POST", "/api/drafts",
+                           json={"template": template})).json()["draft_id"]
+    if args.answers == "form":
+        schema = (await _req(client, rec, "GET /api/templates/{name}/schema", "GET",
+                             f"/api/templates/{template}/schema")).json()
+        answers = {f["field"]: answer_for(template, f["field"], flow) for f in schema["fields"]}
+        out = (await _req(client, rec, "POST /agent/next (final)", "POST", "/agent/next",
+                          json={"draft_id": draft_id, "answers": answers})).json()
+    else:
+        out = (await _req(client, rec, "POST /agent/next (question)", "POST", "/agent/next",
+                          json={"draft_id": draft_id})).json()
+        while out.get("type") == "question":
+            field = out["question"]["field"]
+            if args.think:
+                await asyncio.sleep(random.uniform(0, 2 * args.think))
+            last = len(out.get("questions") or ()) <= 1
+            out = (await _req(client, rec, f"POST /agent/next ({'final' if last else 'question'})", "POST",
+                              "/agent/next", json={"draft_id": draft_id, "last_answer": {
+                                  "field": field, "text": answer_for(template, field, flow)}})).json()
+    if out.get("type") != "final":
+        raise RuntimeError(f"flow {flow}: expected a final draft, got {out.get('type')}")
+    for fmt in args.export:
+        await _req(client, rec, f"GET /export/{{id}}.{fmt}", "GET", f"/export/{draft_id}.{fmt}")
+
+async def drive(base_url: str, args) -> Dict[str, Any]:
+    rec = Recorder()
+    flows = iter(range(args.flows))
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+
+    async def user():
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await _req(client, rec, "POST /api/auth", "POST", "/api/auth", json={"password": ADMIN_PASS})
+            for flow in flows:
+                try:
+                    await run_flow(client, rec, args, flow)
+                except RuntimeError as e:
+                    rec.failures.append(str(e))
+
+    t = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(args.users)))
+    return {"wall": time.perf_counter() - t, "rec": rec}
+
+
+# ---------- report ----------
+def pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[max(0, math.ceil(p / 100 * len(xs)) - 1)] if xs else 0.0  # nearest rank
+
+def summarize(workers: int, wall: float, rec: Recorder, locked: int, stub: Dict[str, Any], flows: int) -> Dict[str, Any]:
+    endpoints = {}
+    for label, xs in sorted(rec.samples.items()):
+        codes = rec.status[label]
+        endpoints[label] = {"n": len(xs), "p50": pct(xs, 50), "p95": pct(xs, 95), "p99": pct(xs, 99),
+                            "max": max(xs), "errors": sum(n for c, n in codes.items() if not 200 <= c < 400)}
+    requests = sum(len(xs) for xs in rec.samples.values())
+    done = flows - len(rec.failures)
+    return {"workers": workers, "wall": wall, "flows_ok": done, "flows_failed": len(rec.failures),
+            "flows_per_s": done / wall if wall else 0.0, "requests_per_s": requests / wall if wall else 0.0,
+            "db_locked": locked, "stub": stub, "endpoints": endpoints, "failures": rec.failures[:10]}
+
+def print_result(r: Dict[str, Any]):
+    print(f"\n== workers={r['workers']}  wall {r['wall']:.1f}s  flows ok {r['flows_ok']} failed {r['flows_failed']}  "
+          f"{r['flows_per_s']:.2f} flows/s  {r['requests_per_s']:.1f} req/s  db locked {r['db_locked']}")
+    print(f"   stub: {r['stub']}")
+    print(f"   {'endpoint':<36} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    for label, e in r["endpoints"].items():
+        print(f"   {label:<36} {e['n']:>6} {e['p50'] * 1e3:>9.1f} {e['p95'] * 1e3:>9.1f} "
+              f"{e['p99'] * 1e3:>9.1f} {e['max'] * 1e3:>9.1f} {e['errors']:>7}")
+    for f in r["failures"]:
+        print(f"   ! {f}")
+
+def regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    old = {r["workers"]: r for r in baseline}
+    out = []
+    for r in results:
+        b = old.get(r["workers"])
+        if b is None:
+            continue
+        for label, e in r["endpoints"].items():
+            be = b["endpoints"].get(label)
+            if be and be["p95"] > 0 and e["p95"] > be["p95"] * (1 + tolerance):
+                out.append(f"workers={r['workers']} {label}: p95 {be['p95'] * 1e3:.1f} -> {e['p95'] * 1e3:.1f} ms")
+        if r["db_locked"] > b["db_locked"]:
+            out.append(f"workers={r['workers']}: db locked {b['db_locked']} -> {r['db_locked']}")
+    return out
+
+
+# ---------- main ----------
+def run(workers: int, stub_url: str, args, tmp: Path) -> Dict[str, Any]:
+    port = _free_port()
+    db = tmp / f"bench-w{workers}.db"
+    log_path = tmp / f"server-w{workers}.log"
+    env = {"BRIEFGEN_DB": str(db), "TOGETHER_API_KEY": "stub", "TOGETHER_BASE_URL": stub_url + "/v1",
+           "ADMIN_PASS": ADMIN_PASS, "RATE_LIMIT_BACKEND": "off", "BRIEFGEN_CACHE": "off", **args.env}
+    server = _spawn(["uvicorn", "BriefGenBackend.main:app", "--host", "127.0.0.1", "--port", str(port),
+                     "--workers", str(workers), "--log-level", "warning"], env, log_path)
+    try:
+        _wait_ready(f"http://127.0.0.1:{port}/healthz", server)
+        before = httpx.get(stub_url + "/stats").json()
+        out = asyncio.run(drive(f"http://127.0.0.1:{port}", args))
+        after = httpx.get(stub_url + "/stats").json()
+    finally:
+        _stop(server)
+    locked = log_path.read_text(errors="replace").count("database is locked")
+    stub = {k: after[k] - before.get(k, 0) for k in after}
+    return summarize(workers, out["wall"], out["rec"], locked, stub, args.flows)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="1,2,4", help="comma-separated uvicorn worker counts")
+    ap.add_argument("--users", type=int, default=16, help="concurrent clients")
+    ap.add_argument("--flows", type=int, default=64, help="wizard flows per worker count")
+    ap.add_argument("--templates", default=",".join(registry.names()))
+    ap.add_argument("--answers", choices=("wizard", "form"), default="wizard")
+    ap.add_argument("--export", default="docx", help="formats to export after the final draft ('' for none)")
+    ap.add_argument("--think", type=float, default=0.0, help="mean seconds between wizard answers")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--latency", type=float, default=0.8)
+    ap.add_argument("--jitter", type=float, default=0.3)
+    ap.add_argument("--malformed", type=float, default=0.1)
+    ap.add_argument("--errors", type=float, default=0.0)
+    ap.add_argument("--tail", type=float, default=0.0, help="fraction of very slow model responses")
+    ap.add_argument("--tail-latency", type=float, default=20.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE for the app, repeatable")
+    ap.add_argument("--keep", action="store_true", help="keep the databases and server logs")
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--baseline", help="results from an earlier --json run to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 increase")
+    args = ap.parse_args()
+    args.templates = [t.strip() for t in args.templates.split(",") if t.strip()]
+    args.export = [f.strip() for f in args.export.split(",") if f.strip()]
+    args.env = dict(kv.split("=", 1) for kv in args.env)
+    for t in args.templates:
+        if t not in registry:
+            raise SystemExit(f"unknown template {t!r}")
+    random.seed(args.seed)
+
+    tmp = Path(tempfile.mkdtemp(prefix="briefgen-load-"))
+    stub_port = _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = _spawn(["benchmarks.stub_llm", "--port", str(stub_port), "--latency", str(args.latency),
+                   "--jitter", str(args.jitter), "--malformed", str(args.malformed),
+                   "--errors", str(args.errors), "--tail", str(args.tail), "--tail-latency", str(args.tail_latency),
+                   "--seed", str(args.seed)], {}, tmp / "stub.log")
+    results = []
+    try:
+        _wait_ready(stub_url + "/stats", stub)
+        for w in (int(x) for x in args.workers.split(",")):
+            r = run(w, stub_url, args, tmp)
+            print_result(r)
+            results.append(r)
+    finally:
+        _stop(stub)
+    if args.keep:
+        print(f"\nlogs and databases: {tmp}")
+    else:
+        for p in tmp.iterdir():
+            p.unlink()
+        tmp.rmdir()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        worse = regressions(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in worse:
+            print("REGRESSION", line)
+        if worse:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Stand-in for Together's OpenAI-compatible chat-completions API, for offline load tests.
+
+    python -m benchmarks.stub_llm [--port 9100] [--latency 0.8] [--jitter 0.3] [--malformed 0.1] [--errors 0.02]
+                                  [--tail 0.03 --tail-latency 20]
+
+Point the app at it with TOGETHER_BASE_URL=http://127.0.0.1:9100/v1 and any
+TOGETHER_API_KEY. Each call sleeps `latency` +/- `jitter` seconds (spread over
+the chunks when streaming), a `tail` fraction takes `tail_latency` seconds instead
+(the occasional very slow upstream response), and answers with a schema-valid draft built from the
+prompt. A `malformed` fraction of answers is damaged the ways real model output
+goes wrong (chatter, fences, truncation, a wrongly-typed section), and an
+`errors` fraction gets a 503 so client retries are exercised too.
+"""
+import re, json, random, asyncio, argparse
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+SECTIONS = ("title", "parties", "facts", "grounds", "prayer", "annexures", "citations", "notes")
+
+
+class Behaviour:
+    def __init__(self, latency=0.8, jitter=0.3, malformed=0.1, errors=0.0, chunks=24, seed=None,
+                 tail=0.0, tail_latency=20.0):
+        self.latency = latency
+        self.tail = tail
+        self.tail_latency = tail_latency
+        self.jitter = jitter
+        self.malformed = malformed
+        self.errors = errors
+        self.chunks = chunks
+        self.rng = random.Random(seed)
+        self.counts = {"calls": 0, "streams": 0, "malformed": 0, "errors": 0, "slow": 0}
+
+    def delay(self) -> float:
+        if self.rng.random() < self.tail:
+            self.counts["slow"] += 1
+            return self.tail_latency
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+
+# ---------- answers ----------
+def _keys(messages) -> tuple:
+    """Sections the prompt asks for: the "ONLY ... of the form {a: ..., b: ...}" line, else all of them."""
+    text = "\n".join(str(m.get("content") or "") for m in messages)
+    m = re.search(r"ONLY a JSON object of the form \{([^}]*)\}", text)
+    if not m:
+        return SECTIONS
+    asked = tuple(k for k in re.findall(r"(\w+):", m.group(1)) if k in SECTIONS)
+    return asked or SECTIONS
+
+def _draft(keys) -> dict:
+    out = {}
+    for k in keys:
+        if k == "title":
+            out[k] = "Notice under Section 138 of the Negotiable Instruments Act, 1881"
+        elif k == "notes":
+            out[k] = "Generated by the load-test stub."
+        else:
+            out[k] = [f"{k.capitalize()} paragraph {i + 1}: the party named above acted as set out in the "
+                      "correspondence annexed hereto, and the consequences follow as stated." for i in range(3)]
+    return out
+
+def _damage(text: str, rng: random.Random) -> str:
+    kind = rng.choice(("chatter", "fence", "truncate", "bad_type", "no_json"))
+    if kind == "chatter":
+        return f"Sure, here is the draft:\n{text}\nLet me know if you need changes."
+    if kind == "fence":
+        return f"```json\n{text}\n```"
+    if kind == "truncate":
+        return text[: int(len(text) * rng.uniform(0.4, 0.95))]
+    if kind == "bad_type":
+        obj = json.loads(text)
+        obj[rng.choice(list(obj))] = 42
+        return json.dumps(obj)
+    return "I'm unable to produce that document."
+
+def _answer(b: Behaviour, messages) -> str:
+    text = json.dumps(_draft(_keys(messages)), ensure_ascii=False)
+    if b.rng.random() < b.malformed:
+        b.counts["malformed"] += 1
+        text = _damage(text, b.rng)
+    return text
+
+
+# ---------- app ----------
+def create_app(b: Behaviour) -> Starlette:
+    async def completions(request: Request):
+        body = await request.json()
+        b.counts["calls"] += 1
+        if b.rng.random() < b.errors:
+            b.counts["errors"] += 1
+            await asyncio.sleep(b.delay() / 4)
+            return JSONResponse({"error": {"message": "stub overloaded"}}, status_code=503)
+        text = _answer(b, body.get("messages") or [])
+        model = body.get("model") or "stub"
+        if not body.get("stream"):
+            await asyncio.sleep(b.delay())
+            return JSONResponse({"id": "stub", "object": "chat.completion", "model": model,
+                                 "choices": [{"index": 0, "finish_reason": "stop",
+                                              "message": {"role": "assistant", "content": text}}]})
+
+        b.counts["streams"] += 1
+        total = b.delay()
+        step = max(1, len(text) // b.chunks)
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+
+        async def events():
+            for piece in pieces:
+                await asyncio.sleep(total / len(pieces))
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def stats(request: Request):
+        return JSONResponse(b.counts)
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"]),
+                             Route("/stats", stats)])
+
+
+def main():
+    import uvicorn
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency", type=float, default=0.8, help="mean seconds per completion")
+    ap.add_argument("--jitter", type=float, default=0.3, help="+/- seconds, uniform")
+    ap.add_argument("--malformed", type=float, default=0.1, help="fraction of damaged answers")
+    ap.add_argument("--errors", type=float, default=0.0, help="fraction of 503 responses")
+    ap.add_argument("--tail", type=float, default=0.0, help="fraction of very slow responses")
+    ap.add_argument("--tail-latency", type=float, default=20.0, help="seconds for those")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+    b = Behaviour(args.latency, args.jitter, args.malformed, args.errors, seed=args.seed,
+                  tail=args.tail, tail_latency=args.tail_latency)
+    uvicorn.run(create_app(b), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,11 @@ export async function login(password: string): Promise<void> {
   }
 }
 
+export async function logout(): Promise<void> {
+  // revokes the session server-side, not just the cookie
+  await fetch(`${API_BASE}/api/logout`, { method: 'POST', credentials: 'include' });
+}
+
 export type TemplatesResp = { templates: string[] };
 
 export async function getTemplates(): Promise<string[]> {
@@ -84,19 +89,40 @@ export type AgentQuestion = {
   id: string; field: string; text: string; hint?: string; required?: boolean
 }
 export type AgentResponse = 
-  | { type: 'question'; question: AgentQuestion }
+  | { type: 'question'; question: AgentQuestion; questions?: AgentQuestion[] }
   | { type: 'final'; draft: any };
 
-export async function agentNext(draft_id: string, last?: { field: string; text: any }): Promise<AgentResponse> {
+export async function agentNext(draft_id: string, last?: { field: string; text: any }, answers?: Record<string, any>): Promise<AgentResponse> {
   const res = await fetch(`${API_BASE}/agent/next`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     credentials: 'include',
-    body: JSON.stringify({ draft_id, last_answer: last }),
+    body: JSON.stringify({ draft_id, last_answer: last, answers }),
   });
   return json<AgentResponse>(res);
 }
 
+export type TemplateField = { field: string; text: string; hint: string; required: boolean; order: number };
+export type TemplateSchema = { template: string; fields: TemplateField[] };
+
+export async function getTemplateSchema(template: string): Promise<TemplateSchema> {
+  const res = await fetch(`${API_BASE}/api/templates/${encodeURIComponent(template)}/schema`, { credentials: 'include' });
+  return json<TemplateSchema>(res);
+}
+
 export function exportDocx(draft_id: string) {
   window.open(`${API_BASE}/export/${draft_id}.docx`, '_blank');
-}
\ No newline at end of file
+}
+export type DraftSummary = {
+  id: string; template: string; status: string; created_at: string; updated_at: string
+}
+export type DraftPage = { items: DraftSummary[]; next_cursor: string | null };
+
+export async function listDrafts(opts: { cursor?: string; template?: string; status?: string; limit?: number } = {}): Promise<DraftPage> {
+  const params = new URLSearchParams();
+  for (const [k, v] of Object.entries(opts)) {
+    if (v !== undefined && v !== '') params.set(k, String(v));
+  }
+  const res = await fetch(`${API_BASE}/api/drafts?${params.toString()}`, { credentials: 'include' });
+  return json<DraftPage>(res);
+}
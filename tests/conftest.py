@@ -0,0 +1,105 @@
+import os, sys, json, asyncio, tempfile
+from pathlib import Path
+
+# configure before the app modules are imported: they read the environment at import time
+_tmp = tempfile.mkdtemp(prefix="briefgen-tests-")
+os.environ["BRIEFGEN_DB"] = os.path.join(_tmp, "briefgen.db")
+os.environ["RATE_LIMIT_BACKEND"] = "off"
+os.environ["BRIEFGEN_CACHE"] = "off"
+os.environ["ADMIN_PASS"] = "test-pass"
+for _var in ("TOGETHER_API_KEY", "LOCAL_LLM_BASE_URL", "DATABASE_URL", "ASYNC_DATABASE_URL", "RATE_LIMIT_POLICIES"):
+    os.environ.pop(_var, None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from BriefGenBackend import main, agent, llm
+from BriefGenBackend.registry import registry
+from benchmarks import stub_llm
+
+CANDIDATES = ("{text}", "125000", "2024-01-15")
+
+
+def answers_for(template: str, **overrides) -> dict:
+    """A complete, valid set of answers (the first candidate each field's validators accept)."""
+    tpl = registry[template]
+    out = {}
+    for f in tpl.fields:
+        text = f"{f.key.replace('_', ' ')} value"
+        out[f.key] = next(v for v in (c.format(text=text) for c in CANDIDATES) if not tpl.invalid({f.key: v}))
+    out.update(overrides)
+    return out
+
+
+class FakeModel:
+    """Stands in for the provider router: returns `reply` (a callable of the messages, or a string).
+
+    The default reply is a schema-valid draft of whichever sections the prompt asks for.
+    """
+
+    def __init__(self, reply=None, delay: float = 0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+
+    def _text(self, messages):
+        if self.reply is None:
+            return json.dumps(stub_llm._draft(stub_llm._keys(messages)))
+        return self.reply(messages) if callable(self.reply) else self.reply
+
+    async def complete(self, messages, model=None, max_tokens=None):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._text(messages)
+
+    def models(self, model):
+        return f"fake:{model}"
+
+    async def stream(self, messages, model=None, max_tokens=None):
+        text = await self.complete(messages, model, max_tokens)
+        if text:
+            for i in range(0, len(text), 40):
+                yield text[i:i + 40]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from BriefGenBackend import db, search
+    db.init_db()
+    search.init_search(db.engine)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(llm, "get_client", lambda: model)
+    monkeypatch.setattr(agent, "_call_together", model.complete)
+    monkeypatch.setattr(agent, "_stream_together", model.stream)
+    return model
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as c:
+        assert c.post("/api/auth", json={"password": "test-pass"}).status_code == 200
+        yield c
+
+
+@pytest.fixture
+def new_draft(client):
+    def make(template: str = "Affidavit") -> str:
+        r = client.post("/api/drafts", json={"template": template})
+        assert r.status_code == 200, r.text
+        return r.json()["draft_id"]
+    return make
+
+
+def sse_events(text: str) -> list:
+    out = []
+    for block in text.split("\n\n"):
+        for line in block.splitlines():
+            if line.startswith("data: "):
+                out.append(json.loads(line[6:]))
+    return out
@@ -0,0 +1,90 @@
+import pytest
+from sqlmodel import Session
+
+from BriefGenBackend.db import engine
+from BriefGenBackend.models import Draft
+from conftest import answers_for, sse_events
+
+
+class Boom(Exception):
+    pass
+
+
+def _stored_answers(draft_id):
+    with Session(engine) as session:
+        return session.get(Draft, draft_id).answers_json
+
+
+def _fail(messages):
+    raise Boom("model went away")
+
+
+def test_last_answer_survives_a_failed_generation(client, new_draft, fake_model):
+    draft_id = new_draft()
+    answers = answers_for("Affidavit")
+    date = answers.pop("date")
+    client.post("/agent/next", json={"draft_id": draft_id, "answers": answers})
+
+    fake_model.reply = _fail
+    with pytest.raises(Boom):
+        client.post("/agent/next", json={"draft_id": draft_id, "last_answer": {"field": "date", "text": date}})
+    assert _stored_answers(draft_id)["date"] == date
+
+    fake_model.reply = None
+    r = client.post("/agent/next", json={"draft_id": draft_id})
+    assert r.json()["type"] == "final"  # not asked for the date again
+
+
+def test_last_answer_survives_a_dropped_stream(client, new_draft, fake_model):
+    draft_id = new_draft()
+    answers = answers_for("Affidavit")
+    date = answers.pop("date")
+    client.post("/agent/next/stream", json={"draft_id": draft_id, "answers": answers})
+
+    fake_model.reply = _fail
+    with pytest.raises(Boom):
+        client.post("/agent/next/stream", json={"draft_id": draft_id, "last_answer": {"field": "date", "text": date}})
+    assert _stored_answers(draft_id)["date"] == date
+
+    fake_model.reply = None
+    events = sse_events(client.post("/agent/next/stream", json={"draft_id": draft_id}).text)
+    assert events[-1]["type"] == "final"
+    with Session(engine) as session:
+        d = session.get(Draft, draft_id)
+        assert d.status == "drafted" and d.draft_json == events[-1]["draft"]
+
+
+def test_question_flow_then_final(client, new_draft, fake_model):
+    draft_id = new_draft()
+    r = client.post("/agent/next", json={"draft_id": draft_id}).json()
+    assert r["type"] == "question" and r["question"]["field"] == "deponent_name"
+    for field, value in answers_for("Affidavit").items():
+        r = client.post("/agent/next", json={"draft_id": draft_id, "last_answer": {"field": field, "text": value}}).json()
+    assert r["type"] == "final"
+    assert fake_model.calls == 1
+
+
+def test_stream_rejects_bad_answers_with_json(client, new_draft):
+    # the draft page reads this body and shows the message next to the field
+    draft_id = new_draft()
+    r = client.post("/agent/next/stream", json={"draft_id": draft_id, "last_answer": {"field": "date", "text": "someday"}})
+    assert r.status_code == 400
+    assert r.headers["content-type"] == "application/json"
+    assert "expected a date" in r.json()["detail"]
+
+
+def test_draft_cache_key_follows_the_configured_providers(monkeypatch):
+    from BriefGenBackend import agent, llm
+    from BriefGenBackend.llm import Provider, Router
+
+    def key(*providers):
+        monkeypatch.setattr(llm, "get_client", lambda: Router(list(providers)))
+        return agent._draft_cache_key("Affidavit", answers_for("Affidavit"))
+
+    together = Provider("together", client=None)
+    only_remote = key(together)
+    assert key(together) == only_remote
+    with_local = key(together, Provider("local", client=None, model="llama3:8b"))
+    assert with_local != only_remote
+    assert key(together, Provider("local", client=None, model="qwen2:7b")) != with_local
+    assert key(Provider("local", client=None, model="llama3:8b"), together) == with_local
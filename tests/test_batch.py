@@ -0,0 +1,102 @@
+import csv, io, time
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from BriefGenBackend import jobs
+from BriefGenBackend.db import engine
+from BriefGenBackend.models import Batch
+
+from conftest import answers_for
+
+
+def _csv(rows) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def _upload(client, data: bytes, template="Affidavit"):
+    return client.post("/api/drafts/batch", data={"template": template},
+                       files={"file": ("batch.csv", data, "text/csv")})
+
+
+def test_csv_batch_is_accepted(client, fake_model):
+    answers = answers_for("Affidavit")
+    r = _upload(client, _csv([list(answers), list(answers.values()), list(answers.values())]))
+    assert r.status_code == 202, r.text
+    assert r.json()["total"] == 2
+
+
+def test_csv_ragged_row_is_rejected(client):
+    answers = answers_for("Affidavit")
+    r = _upload(client, _csv([list(answers), list(answers.values()) + ["extra"]]))
+    assert r.status_code == 400
+    assert "more columns than the header" in r.json()["detail"]
+
+
+def test_csv_must_be_utf8(client):
+    r = _upload(client, "deponent_name\nJos\xe9\n".encode("latin-1"))
+    assert r.status_code == 400
+    assert "UTF-8" in r.json()["detail"]
+
+
+def test_batch_rejects_unknown_fields(client):
+    answers = answers_for("Affidavit", favourite_colour="blue")
+    r = client.post("/api/drafts/batch", json={"items": [{"template": "Affidavit", "answers": answers}]})
+    assert r.status_code == 400
+    assert r.json()["detail"]["errors"] == [{"index": 0, "error": "Unknown fields", "fields": ["favourite_colour"]}]
+
+    r = _upload(client, _csv([["favourite_colour", *answers_for("Affidavit")],
+                              ["blue", *answers_for("Affidavit").values()]]))
+    assert r.status_code == 400
+    assert r.json()["detail"]["errors"][0]["fields"] == ["favourite_colour"]
+
+
+def test_batch_reports_missing_and_invalid_fields(client):
+    r = client.post("/api/drafts/batch", json={"items": [
+        {"template": "Affidavit", "answers": {"place": "Pune"}},
+        {"template": "Nope", "answers": {}},
+    ]})
+    assert r.status_code == 400
+    errors = r.json()["detail"]["errors"]
+    assert errors[0]["error"] == "Missing fields" and errors[1]["index"] == 1
+
+
+def _poll(client, job_id, until, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/drafts/batch/{job_id}").json()
+        if until(status):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"batch never reached the expected state: {status}")
+
+
+def test_batch_progress_is_written_per_item(client, fake_model):
+    fake_model.delay = 0.3
+    items = [{"template": "Affidavit", "answers": answers_for("Affidavit", place=f"place {i}")} for i in range(3)]
+    job_id = client.post("/api/drafts/batch", json={"items": items, "concurrency": 1}).json()["job_id"]
+
+    # mid-run the row already holds the finished items, so any worker can answer the poll
+    status = _poll(client, job_id, lambda s: s["done"] >= 1)
+    assert status["status"] == "running"
+    row = jobs.get_batch(job_id)
+    assert row.done == len(row.draft_ids) >= 1
+
+    status = _poll(client, job_id, lambda s: s["status"] == "completed")
+    assert (status["done"], status["failed"], len(status["draft_ids"])) == (3, 0, 3)
+    for draft_id in status["draft_ids"]:
+        assert client.get(f"/api/drafts/{draft_id}/revisions").json()["items"][0]["source"] == "generate"
+
+
+def test_batch_without_heartbeat_is_reported_interrupted():
+    with Session(engine) as session:
+        b = Batch(total=5, concurrency=2, status="running", done=2,
+                  updated_at=datetime.utcnow() - timedelta(seconds=jobs.BATCH_STALE_AFTER + 1))
+        session.add(b); session.commit()
+        batch_id = b.id
+    b = jobs.get_batch(batch_id)
+    assert b.status == "failed" and b.finished_at is not None
+    assert "Interrupted" in b.errors[-1]["error"]
+    assert jobs.get_batch("no-such-batch") is None
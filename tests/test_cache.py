@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from BriefGenBackend.cache import GenerationCache, MemoryCache, NullCache, SQLiteCache, TieredCache, cache_key
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoSet(GenerationCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        NoSet()
+    with pytest.raises(TypeError):
+        GenerationCache()
+    NullCache(); MemoryCache()
+
+
+def test_cache_key_ignores_whitespace_and_order():
+    a = cache_key("Affidavit", {"place": "  Pune ", "court": "High  Court"}, "m", "s")
+    b = cache_key("Affidavit", {"court": "High Court", "place": "Pune", "date": ""}, "m", "s")
+    assert a == b
+    assert a != cache_key("Affidavit", {"court": "High Court", "place": "Mumbai"}, "m", "s")
+    assert a != cache_key("Affidavit", {"court": "High Court", "place": "Pune"}, "m", "other system prompt")
+
+
+def test_memory_cache_lru_and_ttl():
+    c = MemoryCache(max_entries=2, ttl=60)
+    c.set("a", {"v": 1}); c.set("b", {"v": 2})
+    assert c.get("a") == {"v": 1}  # a is now most recent
+    c.set("c", {"v": 3})
+    assert c.get("b") is None and c.get("c") == {"v": 3}
+    c.get("a")["v"] = 99
+    assert c.get("a") == {"v": 1}  # callers get copies
+    c.set_raw("x", "y", ttl=0.01)
+    time.sleep(0.02)
+    assert c.get_raw("x") is None
+    assert c.stats()["hits"] == 4 and c.stats()["misses"] == 1
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.db"), ttl=60)
+    disk.set("k", {"v": 1})
+    t = TieredCache(MemoryCache(), disk)
+    assert t.get("k") == {"v": 1}
+    assert t.memory.get_raw("k") is not None
+    assert t.get("k") == {"v": 1}
+    assert (t.disk.hits, t.memory.hits, t.hits) == (1, 1, 2)
+    assert t.get("missing") is None and t.misses == 1
@@ -0,0 +1,66 @@
+import pytest
+from sqlmodel import Session
+
+from BriefGenBackend import db, exporter
+from BriefGenBackend.models import Draft
+from conftest import answers_for
+
+
+@pytest.fixture
+def drafted(client, new_draft, fake_model):
+    draft_id = new_draft()
+    r = client.post("/agent/next", json={"draft_id": draft_id, "answers": answers_for("Affidavit")})
+    assert r.json()["type"] == "final"
+    return draft_id
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+    real = exporter.render
+    monkeypatch.setattr(exporter, "render", lambda fmt, *a, **kw: calls.append(fmt) or real(fmt, *a, **kw))
+    return calls
+
+
+@pytest.mark.parametrize("fmt", sorted(exporter.EXPORTERS))
+def test_export_etag_and_conditional_get(client, drafted, fmt):
+    r = client.get(f"/export/{drafted}.{fmt}")
+    assert r.status_code == 200 and r.content
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "private, no-cache"
+    assert r.headers["content-type"].startswith(exporter.EXPORTERS[fmt].media_type)
+
+    r = client.get(f"/export/{drafted}.{fmt}", headers={"If-None-Match": etag})
+    assert (r.status_code, r.content, r.headers["etag"]) == (304, b"", etag)
+    r = client.get(f"/export/{drafted}.{fmt}", headers={"If-None-Match": f'"stale", {etag}'})
+    assert r.status_code == 304
+    r = client.get(f"/export/{drafted}.{fmt}", headers={"If-None-Match": '"stale"'})
+    assert r.status_code == 200 and r.headers["etag"] == etag
+
+
+def test_etag_differs_by_format(client, drafted):
+    tags = {fmt: client.get(f"/export/{drafted}.{fmt}").headers["etag"] for fmt in exporter.EXPORTERS}
+    assert len(set(tags.values())) == len(tags)
+
+
+def test_export_renders_once_until_the_draft_changes(client, drafted, renders):
+    etag = client.get(f"/export/{drafted}.md").headers["etag"]
+    for _ in range(3):
+        assert client.get(f"/export/{drafted}.md").headers["etag"] == etag
+        assert client.get(f"/export/{drafted}.md", headers={"If-None-Match": etag}).status_code == 304
+    assert renders == ["md"]
+
+    with Session(db.engine) as s:
+        d = s.get(Draft, drafted)
+        d.draft_json = {**d.draft_json, "notes": "edited"}
+        s.add(d); s.commit()
+    r = client.get(f"/export/{drafted}.md", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    assert renders == ["md", "md"]
+
+
+def test_export_errors(client, new_draft):
+    draft_id = new_draft()
+    assert client.get(f"/export/{draft_id}.docx").status_code == 400
+    assert client.get(f"/export/{draft_id}.exe").status_code == 404
+    assert client.get("/export/missing.docx").status_code == 404
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from BriefGenBackend import jobs
+from BriefGenBackend.db import engine
+from BriefGenBackend.models import Draft, Job
+from conftest import answers_for
+
+
+def _job(draft_status="queued", **fields) -> str:
+    with Session(engine) as session:
+        d = Draft(template="Affidavit", answers_json=answers_for("Affidavit"), status=draft_status)
+        session.add(d); session.commit()
+        job = Job(kind="generate", draft_id=d.id, **fields)
+        session.add(job); session.commit()
+        return job.id
+
+
+def test_only_one_worker_claims_a_job():
+    a, b = jobs.JobQueue(), jobs.JobQueue()
+    assert a.owner != b.owner
+    job_id = _job()
+    claimed = a.claim(job_id)
+    assert claimed is not None and claimed.owner == a.owner and claimed.attempts == 1
+    assert b.claim(job_id) is None
+    assert a.claim(job_id) is None
+
+
+def test_recover_leaves_live_jobs_alone():
+    a, b = jobs.JobQueue(lease=60), jobs.JobQueue(lease=60)
+    job_id = _job()
+    a.claim(job_id)
+    assert job_id not in b._recover()  # a sibling starting up must not take it
+    assert a.get(job_id).status == "running"
+
+
+def test_recover_requeues_jobs_whose_owner_stopped():
+    q = jobs.JobQueue(lease=60)
+    stale = datetime.utcnow() - timedelta(seconds=61)
+    job_id = _job(status="running", owner="gone:1", heartbeat_at=stale, attempts=1)
+    exhausted = _job(status="running", owner="gone:1", heartbeat_at=stale, attempts=jobs.JOB_MAX_ATTEMPTS)
+    pending = q._recover()
+    assert job_id in pending and exhausted not in pending
+    assert q.get(job_id).status == "queued" and q.get(job_id).owner is None
+    assert q.get(exhausted).status == "failed"
+    assert q.claim(job_id).attempts == 2
+
+
+def _draft_status(job_id: str) -> str:
+    with Session(engine) as session:
+        return session.get(Draft, session.get(Job, job_id).draft_id).status
+
+
+def test_recover_keeps_draft_status_in_step():
+    q = jobs.JobQueue(lease=60)
+    a, b = jobs.JobQueue(lease=60), jobs.JobQueue(lease=60)
+    retry, exhausted, live = _job(), _job(), _job()
+    a.claim(retry); a.claim(exhausted); b.claim(live)
+    assert {_draft_status(j) for j in (retry, exhausted, live)} == {"generating"}
+    with Session(engine) as session:  # a's worker dies: its leases run out
+        for job_id in (retry, exhausted):
+            job = session.get(Job, job_id)
+            job.heartbeat_at = datetime.utcnow() - timedelta(seconds=61)
+            job.attempts = 1 if job_id == retry else jobs.JOB_MAX_ATTEMPTS
+            session.add(job)
+        session.commit()
+    q._recover()
+    assert (q.get(retry).status, _draft_status(retry)) == ("queued", "queued")
+    assert (q.get(exhausted).status, _draft_status(exhausted)) == ("failed", "failed")
+    assert (q.get(live).status, _draft_status(live)) == ("running", "generating")
+
+
+def test_generate_job_runs_to_completion(client, new_draft, fake_model):
+    draft_id = new_draft("Affidavit")
+    r = client.post("/agent/next", json={"draft_id": draft_id, "answers": answers_for("Affidavit"), "background": True})
+    assert r.json()["type"] == "queued"
+    job_id = r.json()["job_id"]
+    deadline = time.monotonic() + 10
+    while client.get(f"/api/jobs/{job_id}").json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert client.get(f"/api/jobs/{job_id}/result").json()["type"] == "final"
+    assert jobs.queue.get(job_id).owner == jobs.queue.owner
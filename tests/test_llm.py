@@ -0,0 +1,130 @@
+import asyncio, time
+
+import pytest
+
+from BriefGenBackend.llm import CircuitBreaker, Provider, Router
+
+
+class FakeClient:
+    def __init__(self, answer="ok", pieces=("a", "b", "c"), fail=False, delay=0.0):
+        self.answer, self.pieces, self.fail, self.delay = answer, pieces, fail, delay
+        self.calls = 0
+
+    async def complete(self, messages, model, **extra):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return self.answer
+
+    async def stream(self, messages, model, **extra):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("upstream down")
+        for p in self.pieces:
+            await asyncio.sleep(self.delay)
+            yield p
+
+    async def aclose(self):
+        pass
+
+
+def _half_open(breaker: CircuitBreaker):
+    for _ in range(breaker.failures):
+        breaker.failure()
+    breaker.opened_at = time.monotonic() - breaker.cooldown - 1
+    assert breaker.state == "half_open"
+
+
+def test_breaker_state_changes():
+    b = CircuitBreaker(failures=2, cooldown=0.05)
+    assert b.state == "closed" and b.allow()
+    assert b.failure() is False
+    assert b.failure() is True and b.state == "open"
+    assert not b.allow() and not b.available()
+    time.sleep(0.06)
+    assert b.state == "half_open" and b.available()
+    assert b.allow()  # claims the one trial call
+    assert not b.allow() and not b.available()
+    b.release()
+    assert b.allow()
+    b.failure()  # the trial failed: open again, cooldown restarts
+    assert b.state == "open"
+    time.sleep(0.06)
+    assert b.allow()
+    b.success()
+    assert b.state == "closed" and b.consecutive == 0
+
+
+def test_pick_claims_nothing():
+    p = Provider("a", FakeClient(), breaker=CircuitBreaker(failures=1, cooldown=30))
+    _half_open(p.breaker)
+    router = Router([p], hedge=False)
+    for _ in range(3):
+        assert router._pick(router.ranked(), ()) is p
+    assert p.breaker.trial is False
+
+
+def test_abandoned_stream_releases_the_trial_slot():
+    p = Provider("a", FakeClient(), breaker=CircuitBreaker(failures=1, cooldown=30))
+    _half_open(p.breaker)
+    router = Router([p], hedge=False)
+
+    async def take_one():
+        stream = router.stream([], "m")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(take_one()) == "a"
+    assert p.breaker.state == "half_open" and p.breaker.available()
+
+
+def test_cancelled_call_releases_the_trial_slot():
+    p = Provider("a", FakeClient(delay=1.0), breaker=CircuitBreaker(failures=1, cooldown=30))
+    _half_open(p.breaker)
+
+    async def cancel():
+        task = asyncio.ensure_future(p.complete([], "m"))
+        await asyncio.sleep(0.01)
+        assert p.breaker.trial is True
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert p.breaker.available()
+
+
+def test_failover_skips_open_provider_and_closes_after_trial():
+    bad = Provider("bad", FakeClient(fail=True), breaker=CircuitBreaker(failures=1, cooldown=30))
+    good = Provider("good", FakeClient(answer="fine"), breaker=CircuitBreaker(failures=1, cooldown=30))
+    router = Router([bad, good], hedge=False, explore=0)
+    assert asyncio.run(router.complete([], "m")) == "fine"
+    assert bad.breaker.state == "open" and router.counts["failovers"] == 1
+    assert asyncio.run(router.complete([], "m")) == "fine"
+    assert bad.client.calls == 1  # open: not tried again
+
+    bad.client.fail = False
+    _half_open(bad.breaker)
+    router.providers = [bad]
+    assert asyncio.run(router.complete([], "m")) == "ok"
+    assert bad.breaker.state == "closed"
+
+
+def test_hedge_wins_when_primary_is_slow():
+    slow = Provider("slow", FakeClient(answer="slow", delay=1.0))
+    fast = Provider("fast", FakeClient(answer="fast", delay=0.01))
+    router = Router([slow, fast], hedge=True, hedge_delay=0.05, hedge_min=0.05, explore=0)
+    t = time.monotonic()
+    assert asyncio.run(router.complete([], "m")) == "fast"
+    assert time.monotonic() - t < 0.5
+    assert router.counts["hedged"] == 1 and router.counts["hedge_wins"] == 1
+
+
+def test_models_names_every_provider_that_may_answer():
+    together = Provider("together", FakeClient())
+    router = Router([together, Provider("local", FakeClient(), model="llama3:8b")])
+    assert router.models("big-model") == "local:llama3:8b,together:big-model"
+    assert Router([Provider("local", FakeClient()), together]).models("m") == "local:m,together:m"
+    assert Router([together]).models("m") == "together:m"
@@ -0,0 +1,41 @@
+import pytest
+
+from BriefGenBackend import metrics
+
+
+@pytest.fixture
+def registered():
+    before = list(metrics._metrics)
+    yield
+    metrics._metrics[:] = before
+
+
+def test_metric_without_samples_fails_at_construction(registered):
+    class Broken(metrics._Metric):
+        kind = "gauge"
+
+    with pytest.raises(TypeError):
+        Broken("briefgen_test_broken", "never rendered")
+
+
+def test_counter_and_histogram_exposition(registered):
+    c = metrics.Counter("briefgen_test_total", "Things.", ("kind",))
+    c.inc(kind="a"); c.inc(2, kind='b"q')
+    h = metrics.Histogram("briefgen_test_seconds", "Durations.", buckets=(0.1, 1.0))
+    h.observe(0.05); h.observe(0.5); h.observe(5)
+    text = metrics.render()
+    assert "# TYPE briefgen_test_total counter" in text
+    assert 'briefgen_test_total{kind="a"} 1' in text
+    assert 'briefgen_test_total{kind="b\\"q"} 2' in text
+    assert 'briefgen_test_seconds_bucket{le="0.1"} 1' in text
+    assert 'briefgen_test_seconds_bucket{le="1"} 2' in text
+    assert 'briefgen_test_seconds_bucket{le="+Inf"} 3' in text
+    assert "briefgen_test_seconds_count 3" in text
+
+
+def test_metrics_endpoint_labels_templated_routes(client, new_draft):
+    draft_id = new_draft()
+    client.get(f"/api/drafts/{draft_id}/revisions")
+    text = client.get("/metrics").text
+    assert 'route="/api/drafts/{draft_id}/revisions"' in text
+    assert draft_id not in text
@@ -0,0 +1,60 @@
+import os, sqlite3, subprocess, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STARTUP = """
+import sys
+from BriefGenBackend import db, search
+db.init_db()
+search.init_search(db.engine)
+"""
+
+
+def _start_workers(db_path: Path, n: int):
+    env = {**os.environ, "BRIEFGEN_DB": str(db_path), "PYTHONPATH": str(ROOT)}
+    procs = [subprocess.Popen([sys.executable, "-c", STARTUP], env=env, cwd=ROOT,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT) for _ in range(n)]
+    return [(p.wait(timeout=60), p.stdout.read().decode()) for p in procs]
+
+
+def test_workers_starting_together_migrate_once(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    for code, out in _start_workers(db_path, 6):
+        assert code == 0, out
+    conn = sqlite3.connect(db_path)
+    versions = [r[0] for r in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert versions == [1, 2]
+
+
+def test_existing_database_gets_new_columns(tmp_path):
+    db_path = tmp_path / "old.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE job (id VARCHAR PRIMARY KEY, kind VARCHAR NOT NULL, draft_id VARCHAR NOT NULL, "
+                 "status VARCHAR NOT NULL, attempts INTEGER NOT NULL, error VARCHAR, "
+                 "created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)")
+    conn.execute("CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, "
+                 "applied_at VARCHAR(40) NOT NULL)")
+    conn.execute("INSERT INTO schema_migrations VALUES (1, 'draft listing indexes', '2024-01-01')")
+    conn.commit(); conn.close()
+
+    for code, out in _start_workers(db_path, 3):
+        assert code == 0, out
+    conn = sqlite3.connect(db_path)
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(job)")}
+    assert {"owner", "heartbeat_at"} <= columns
+    assert [r[0] for r in conn.execute("SELECT version FROM schema_migrations ORDER BY version")] == [1, 2]
+
+
+def test_added_columns_use_the_dialects_types(monkeypatch):
+    from types import SimpleNamespace
+    from sqlalchemy.dialects import postgresql
+    from BriefGenBackend import migrations
+
+    executed = []
+    conn = SimpleNamespace(dialect=postgresql.dialect(), execute=lambda stmt: executed.append(str(stmt)))
+    monkeypatch.setattr(migrations, "inspect", lambda c: SimpleNamespace(get_columns=lambda t: [{"name": "id"}]))
+    step = dict((v, fn) for v, _, fn in migrations.MIGRATIONS)[2]
+    step(conn)
+    assert executed == ["ALTER TABLE job ADD COLUMN owner VARCHAR",
+                        "ALTER TABLE job ADD COLUMN heartbeat_at TIMESTAMP WITHOUT TIME ZONE"]
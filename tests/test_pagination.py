@@ -0,0 +1,44 @@
+def _walk(client, limit, **params):
+    items, cursor, pages = [], None, 0
+    while True:
+        r = client.get("/api/drafts", params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, r.text
+        body = r.json()
+        assert len(body["items"]) <= limit
+        items += body["items"]; pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items, pages
+
+
+def test_keyset_pages_cover_every_draft_once_newest_first(client, new_draft):
+    for _ in range(5):
+        new_draft()
+    everything = client.get("/api/drafts", params={"limit": 200}).json()["items"]
+    items, pages = _walk(client, 2)
+    assert items == everything
+    assert pages == (len(everything) + 1) // 2
+    keys = [(d["created_at"], d["id"]) for d in items]
+    assert keys == sorted(keys, reverse=True) and len(set(keys)) == len(keys)
+    assert set(items[0]) == {"id", "template", "status", "created_at", "updated_at"}
+
+
+def test_cursor_is_stable_when_new_drafts_arrive(client, new_draft):
+    for _ in range(3):
+        new_draft()
+    first = client.get("/api/drafts", params={"limit": 2}).json()
+    new_draft()
+    second = client.get("/api/drafts", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    seen = {d["id"] for d in first["items"]}
+    assert not seen & {d["id"] for d in second["items"]}
+
+
+def test_invalid_cursor_is_a_400(client):
+    for cursor in ("not-a-cursor", "bm9waXBl", "!!"):
+        r = client.get("/api/drafts", params={"cursor": cursor})
+        assert r.status_code == 400 and r.json()["detail"] == "Invalid cursor"
+
+
+def test_limit_is_clamped(client, new_draft):
+    new_draft(); new_draft()
+    assert len(client.get("/api/drafts", params={"limit": 0}).json()["items"]) == 1
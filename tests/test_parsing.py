@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from BriefGenBackend import parsing
+from BriefGenBackend.parsing import SECTIONS, merge_sections, parse_draft, repair
+from benchmarks import stub_llm
+
+DRAFT = stub_llm._draft(SECTIONS)
+TEXT = json.dumps(DRAFT)
+
+
+def test_scan_finds_top_level_objects_and_ignores_braces_in_strings():
+    text = 'a {"x": "}{"} b {"y": {"z": 1}} c {"open": ['
+    spans, tail = parsing._scan(text)
+    assert [text[a:b] for a, b in spans] == ['{"x": "}{"}', '{"y": {"z": 1}}']
+    assert text[tail:] == '{"open": ['
+    assert parsing._scan('{"a": "\\"}"} x')[0] == [(0, 12)]  # escaped quote inside a string
+
+
+def test_direct():
+    assert parse_draft(TEXT) == (DRAFT, "direct")
+    assert parse_draft(f"\n  {TEXT}\n") == (DRAFT, "direct")
+
+
+@pytest.mark.parametrize("text", [
+    f"```json\n{TEXT}\n```",
+    f"Sure, here is the draft:\n{TEXT}\nLet me know if you need changes.",
+    f'For example {{"title": "x"}} would be too short. Here it is: {TEXT}',
+    f"[{TEXT}]",
+])
+def test_extracted_from_fences_and_prose(text):
+    assert parse_draft(text) == (DRAFT, "extracted")
+
+
+def test_truncated_mid_array_drops_the_partial_element():
+    cut = TEXT[:TEXT.index('"annexures"')] + '"annexures": ["Annexure A", "Annex'
+    obj, how = parse_draft(cut)
+    assert how == "repaired"
+    assert obj["annexures"] == ["Annexure A"]
+    assert {k: obj[k] for k in SECTIONS[:5]} == {k: DRAFT[k] for k in SECTIONS[:5]}
+    assert "citations" not in obj
+
+
+def test_truncated_mid_string_and_trailing_commas():
+    assert repair('{"title": "A", "notes": "half writ') == {"title": "A"}
+    assert repair('{"facts": ["a", "b",], "title": "T",}') == {"facts": ["a", "b"], "title": "T"}
+    assert repair('{"facts": ["a", ["b", "c"') == {"facts": ["a", ["b", "c"]]}
+    assert repair('{"title": "Done"} trailing') == {"title": "Done"}
+
+
+def test_repair_gives_up_on_hopeless_fragments():
+    assert repair('{"title": ') is None
+    assert repair("{") == {}
+
+
+@pytest.mark.parametrize("text", [None, "", "no json here", '"a string"', "[1, 2, 3]", '["title", "facts"]',
+                                  'x {"unrelated": true} y', "{{{{"])
+def test_wrong_top_level_type_or_nothing_usable_fails(text):
+    assert parse_draft(text) == (None, "failed")
+
+
+def test_prefers_the_candidate_with_most_sections():
+    partial = json.dumps({"title": "Example"})
+    assert parse_draft(f"{partial}\n{TEXT}")[0] == DRAFT
+    truncated = TEXT[:-40]
+    obj, how = parse_draft(f"{partial}\n{truncated}")
+    assert how == "repaired" and obj["title"] == DRAFT["title"] and len(obj) > 1
+
+
+def test_merge_keeps_valid_sections_and_replaces_the_rest():
+    fallback = {k: (f"fallback {k}" if isinstance(v, str) else [f"fallback {k}"]) for k, v in DRAFT.items()}
+    draft = {**DRAFT, "facts": "should be a list", "prayer": [1, 2], "title": None}
+    del draft["notes"]
+    merged, replaced = merge_sections(draft, fallback)
+    assert replaced == ["title", "facts", "prayer", "notes"]
+    assert list(merged) == list(SECTIONS)
+    for k in SECTIONS:
+        assert merged[k] == (fallback[k] if k in replaced else DRAFT[k])
+    assert parsing.first_error(merged) is None
+    assert merge_sections(DRAFT, fallback) == (DRAFT, [])
+
+
+def test_first_error_and_section_ok():
+    assert parsing.first_error(DRAFT) is None
+    assert "notes" in parsing.first_error({k: v for k, v in DRAFT.items() if k != "notes"})
+    assert parsing.section_ok("facts", ["a"]) and not parsing.section_ok("facts", "a")
+    assert not parsing.section_ok("unknown", "a")
@@ -0,0 +1,93 @@
+from dataclasses import replace
+
+import pytest
+
+from BriefGenBackend import agent, prompts
+from BriefGenBackend.parsing import SECTIONS
+from conftest import answers_for
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Swap in a prefix with other budgets for one template."""
+    def set_budget(template="Affidavit", **kw):
+        p = replace(prompts.prefix(template), **kw)
+        monkeypatch.setitem(prompts._prefixes, template, p)
+        return p
+    return set_budget
+
+
+def _sent_tokens(prompt) -> int:
+    return sum(prompts.estimate_tokens(m["content"]) + prompts.MESSAGE_OVERHEAD for m in prompt.messages)
+
+
+def _answer(prompt, field):
+    line = next(l for l in prompt.messages[1]["content"].splitlines() if l.startswith(f"{field}: "))
+    return line[len(field) + 2:]
+
+
+def test_answers_within_budget_are_sent_whole():
+    answers = answers_for("Affidavit", statements="I was present; I saw it")
+    p = prompts.compile_prompt("Affidavit", answers)
+    assert p.truncated == ()
+    assert p.input_tokens <= prompts.prefix("Affidavit").max_input
+    assert _answer(p, "statements") == "I was present; I saw it"
+
+
+def test_over_budget_answers_are_shortened_to_fit(budget):
+    long_text = " ".join(f"statement{i}" for i in range(600))
+    answers = answers_for("Affidavit", statements=long_text, deponent_address="Flat 2, " + long_text)
+    full = prompts.compile_prompt("Affidavit", answers)
+    pre = budget(max_input=full.input_tokens // 2)
+
+    p = prompts.compile_prompt("Affidavit", answers)
+    assert p.truncated == ("deponent_address", "statements")
+    assert p.input_tokens <= pre.max_input and _sent_tokens(p) <= p.input_tokens
+    for field in p.truncated:
+        sent = _answer(p, field)
+        assert sent.endswith("…") and answers[field].startswith(sent[:-1])
+        assert len(sent) > prompts.MIN_ANSWER_CHARS
+    assert _answer(p, "place") == answers["place"]  # short answers stay whole
+    assert p.messages[0] == full.messages[0]
+
+
+def test_fit_never_cuts_below_the_minimum():
+    lines = [("a", "x" * 1000), ("b", "short")]
+    fitted, truncated = prompts._fit(lines, budget=1)
+    assert truncated == ("a",)
+    assert fitted == [("a", "x" * prompts.MIN_ANSWER_CHARS + "…"), ("b", "short")]
+    assert prompts._fit(lines, budget=10_000) == (lines, ())
+
+
+def test_system_message_is_identical_across_requests():
+    first = prompts.compile_prompt("Affidavit", answers_for("Affidavit"))
+    other = prompts.compile_prompt("Affidavit", answers_for("Affidavit", place="Chennai", statements="Other facts"))
+    sections = [prompts.compile_prompt("Affidavit", answers_for("Affidavit"), keys=g) for g in agent.SECTION_GROUPS]
+    systems = {p.messages[0]["content"].encode("utf-8") for p in [first, other, *sections]}
+    assert len(systems) == 1 and systems == {prompts.prefix("Affidavit").system.encode("utf-8")}
+    assert first.messages[1] != other.messages[1]
+    assert prompts.compile_prompt("Petition", answers_for("Petition")).messages[0] != first.messages[0]
+
+
+def test_section_output_budgets_split_by_weight(budget):
+    assert sorted(k for g in agent.SECTION_GROUPS for k in g) == sorted(SECTIONS)
+    pre = budget(max_output=10_000)
+    answers = answers_for("Affidavit")
+    got = {g: prompts.compile_prompt("Affidavit", answers, keys=g).max_tokens for g in agent.SECTION_GROUPS}
+    weight = lambda g: sum(prompts._SECTION_WEIGHT.get(k, 0.5) for k in g)
+    for g, max_tokens in got.items():
+        assert max_tokens == int(pre.max_output * weight(g) / prompts._TOTAL_WEIGHT)
+    assert pre.max_output - len(got) < sum(got.values()) <= pre.max_output
+    assert prompts.compile_prompt("Affidavit", answers).max_tokens == pre.max_output
+
+    budget(max_output=300)  # small budgets still leave each call room to answer
+    assert all(prompts.compile_prompt("Affidavit", answers, keys=g).max_tokens >= prompts.MIN_SECTION_OUTPUT_TOKENS
+               for g in agent.SECTION_GROUPS)
+
+
+def test_prefix_digest_covers_both_budgets():
+    tpl = prompts.registry["Affidavit"]
+    base = prompts._build_prefix(tpl)
+    assert prompts._build_prefix(tpl).digest == base.digest
+    for budget in ({"input": base.max_input + 1}, {"output": base.max_output + 1}):
+        assert prompts._build_prefix(replace(tpl, budget={**tpl.budget, **budget})).digest != base.digest
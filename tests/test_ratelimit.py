@@ -0,0 +1,55 @@
+import logging
+
+from BriefGenBackend import ratelimit
+from BriefGenBackend.ratelimit import MemoryBackend, Policy, RateLimiter, SQLiteBackend
+
+
+def _policies(raw):
+    default = Policy("default", 1.0, 5)
+    rules, default = ratelimit._apply_overrides(ratelimit._default_rules(), default, raw)
+    return {p.name: (p.rate, p.burst) for _, _, p in rules if p is not None} | {"default": (default.rate, default.burst)}
+
+
+def test_overrides_apply_by_policy_name():
+    got = _policies('{"agent": [0.5, 3], "default": {"rps": "2", "burst": 10}}')
+    assert got["agent"] == (0.5, 3) and got["default"] == (2.0, 10)
+    assert got["auth"] == (0.2, 5)
+
+
+def test_bad_override_entries_are_skipped(caplog):
+    caplog.set_level(logging.WARNING, "briefgen.ratelimit")
+    got = _policies('{"agent": ["fast", 2], "export": {"rps": 1}, "auth": [1, 0], "nope": [1, 1], "default": [3, 4]}')
+    assert got["agent"] == (1.0, 10) and got["export"] == (2.0, 20) and got["auth"] == (0.2, 5)
+    assert got["default"] == (3.0, 4)
+    for name in ("agent", "export", "auth", "nope"):
+        assert f"entry '{name}'" in caplog.text
+
+
+def test_malformed_overrides_leave_defaults(monkeypatch):
+    for raw in ("not json", "[1, 2]", '"agent"', "null"):
+        assert _policies(raw)["agent"] == (1.0, 10)
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setenv("RATE_LIMIT_POLICIES", '{"agent": {"rps": 1}}')
+    assert ratelimit.build_from_env() is not None
+
+
+def test_token_bucket_refills(tmp_path):
+    p = Policy("t", rate=10.0, burst=2)
+    for backend in (MemoryBackend(), SQLiteBackend(str(tmp_path / "rl.db"))):
+        assert backend.take("k", p, 100.0)[0] and backend.take("k", p, 100.0)[0]
+        allowed, _, retry = backend.take("k", p, 100.0)
+        assert not allowed and 0 < retry <= 0.1
+        assert backend.take("k", p, 100.2)[0]
+
+
+async def _hit(limiter, path, user=None):
+    return await limiter.hit("POST", path, "1.2.3.4", user)
+
+
+def test_limiter_keys_on_user_and_exempts_routes():
+    import asyncio
+    limiter = RateLimiter(MemoryBackend(), ratelimit._default_rules(), Policy("default", 0.0, 1))
+    assert asyncio.run(_hit(limiter, "/healthz")) is None
+    assert asyncio.run(_hit(limiter, "/api/x", "alice")).allowed
+    assert not asyncio.run(_hit(limiter, "/api/x", "alice")).allowed
+    assert asyncio.run(_hit(limiter, "/api/x", "bob")).allowed
@@ -0,0 +1,122 @@
+import json, asyncio
+
+import httpx
+
+from BriefGenBackend import main, revisions
+from BriefGenBackend.models import Draft
+from benchmarks import stub_llm
+from conftest import answers_for, sse_events
+
+
+def _revision_sources(client, draft_id):
+    items = client.get(f"/api/drafts/{draft_id}/revisions").json()["items"]
+    return [(r["number"], r["source"]) for r in reversed(items)]
+
+
+def _generate(client, draft_id, template="Affidavit"):
+    r = client.post("/agent/next", json={"draft_id": draft_id, "answers": answers_for(template)})
+    assert r.json()["type"] == "final"
+    return r.json()["draft"]
+
+
+def test_reloading_a_drafted_page_replays_the_saved_draft(client, new_draft, fake_model):
+    draft_id = new_draft()
+    _generate(client, draft_id)
+    fake_model.reply = lambda m: json.dumps({**stub_llm._draft(stub_llm._keys(m)), "title": "Revised"})
+    revised = client.post(f"/api/drafts/{draft_id}/revise",
+                          json={"answers": {"statements": "a new statement"}}).json()["draft"]
+    calls = fake_model.calls
+
+    for _ in range(3):  # what the draft page does on load
+        events = sse_events(client.post("/agent/next/stream", json={"draft_id": draft_id}).text)
+        assert events[-1] == {"type": "final", "draft": revised}
+    r = client.post("/agent/next", json={"draft_id": draft_id}).json()
+    assert (r["type"], r["draft"]) == ("final", revised)
+
+    assert fake_model.calls == calls
+    assert _revision_sources(client, draft_id) == [(1, "generate"), (2, "revise")]
+
+
+def test_resubmitting_the_same_answers_does_not_regenerate(client, new_draft, fake_model):
+    draft_id = new_draft()
+    draft = _generate(client, draft_id)
+    calls = fake_model.calls
+    r = client.post("/agent/next", json={"draft_id": draft_id, "answers": answers_for("Affidavit")})
+    assert (r.json()["type"], r.json()["draft"]) == ("final", draft)
+    assert fake_model.calls == calls
+    assert _revision_sources(client, draft_id) == [(1, "generate")]
+
+
+def test_next_snapshot_skips_unchanged_drafts():
+    d = Draft(template="Affidavit", answers_json={"place": "Pune"}, draft_json={"title": "A"})
+    first = revisions.next_snapshot(None, d, "generate")
+    assert first.number == 1
+    assert revisions.next_snapshot(first, d, "generate") is None
+    d.draft_json = {"title": "B"}
+    assert revisions.next_snapshot(first, d, "generate").number == 2
+
+
+def _tagged(tag):
+    """Model reply that marks every section it was asked for, so untouched sections are recognisable."""
+    def reply(messages):
+        out = stub_llm._draft(stub_llm._keys(messages))
+        return json.dumps({k: f"{tag} {v}" if isinstance(v, str) else [f"{tag} {p}" for p in v] for k, v in out.items()})
+    return reply
+
+
+def test_revise_regenerates_only_the_sections_an_edit_feeds(client, new_draft, fake_model):
+    draft_id = new_draft()
+    fake_model.reply = _tagged("v1")
+    before = _generate(client, draft_id)
+    fake_model.reply = _tagged("v2")
+    calls = fake_model.calls
+
+    r = client.post(f"/api/drafts/{draft_id}/revise", json={"answers": {"place": "Mumbai"}}).json()
+    assert (r["changed"], r["regenerated"], r["fallback"]) == (["place"], ["notes"], [])
+    assert fake_model.calls == calls + 1
+    assert r["draft"]["notes"].startswith("v2 ")
+    assert {k: v for k, v in r["draft"].items() if k != "notes"} == {k: v for k, v in before.items() if k != "notes"}
+
+    r = client.post(f"/api/drafts/{draft_id}/revise", json={"answers": {"place": " Mumbai "}}).json()
+    assert (r["changed"], r["regenerated"], r["revision"]) == ([], [], 2)  # whitespace-only edit
+    assert fake_model.calls == calls + 1
+
+
+def test_revision_history_get_and_restore(client, new_draft, fake_model):
+    draft_id = new_draft()
+    fake_model.reply = _tagged("v1")
+    original = _generate(client, draft_id)
+    fake_model.reply = _tagged("v2")
+    revised = client.post(f"/api/drafts/{draft_id}/revise", json={"answers": {"statements": "new facts"}}).json()
+    assert revised["revision"] == 2 and revised["draft"]["facts"] != original["facts"]
+
+    first = client.get(f"/api/drafts/{draft_id}/revisions/1").json()
+    assert (first["number"], first["source"], first["draft"]) == (1, "generate", original)
+    assert first["answers"]["statements"] != "new facts"
+    second = client.get(f"/api/drafts/{draft_id}/revisions/2").json()
+    assert (second["changed_fields"], second["regenerated"]) == (["statements"], ["facts"])
+
+    r = client.post(f"/api/drafts/{draft_id}/revisions/1/restore").json()
+    assert (r["revision"], r["restored_from"], r["draft"]) == (3, 1, original)
+    assert client.post("/agent/next", json={"draft_id": draft_id}).json()["draft"] == original
+    assert _revision_sources(client, draft_id) == [(1, "generate"), (2, "revise"), (3, "restore")]
+    assert client.get(f"/api/drafts/{draft_id}/revisions/9").status_code == 404
+    assert client.post(f"/api/drafts/{draft_id}/revisions/9/restore").status_code == 404
+
+
+def test_concurrent_revises_conflict_instead_of_failing(client, new_draft, fake_model):
+    draft_id = new_draft()
+    _generate(client, draft_id)
+    fake_model.delay = 0.3  # both requests read the draft before either writes it
+
+    async def race():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as ac:
+            await ac.post("/api/auth", json={"password": "test-pass"})
+            return await asyncio.gather(*(ac.post(f"/api/drafts/{draft_id}/revise", json={"answers": {"place": place}})
+                                          for place in ("Mumbai", "Delhi")))
+    results = dict(zip(("Mumbai", "Delhi"), asyncio.run(race())))
+    assert sorted(r.status_code for r in results.values()) == [200, 409]
+    place, winner = next((p, r.json()) for p, r in results.items() if r.status_code == 200)
+    assert _revision_sources(client, draft_id) == [(1, "generate"), (2, "revise")]
+    latest = client.get(f"/api/drafts/{draft_id}/revisions/2").json()
+    assert (latest["answers"]["place"], latest["draft"]) == (place, winner["draft"])
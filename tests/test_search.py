@@ -0,0 +1,27 @@
+from BriefGenBackend import search
+
+
+def test_highlight_escapes_stored_text():
+    raw = "x \x02<img src=x onerror=alert(1)>\x03 & y"
+    assert search.highlight(raw) == "x <mark>&lt;img src=x onerror=alert(1)&gt;</mark> &amp; y"
+    assert search.highlight(None) is None
+
+
+def test_search_results_carry_no_raw_html(client, new_draft):
+    draft_id = new_draft("Affidavit")
+    payload = "<img src=x onerror=alert(1)> zebracorn"
+    client.post("/agent/next", json={"draft_id": draft_id, "answers": {"statements": payload}})
+
+    hits = client.get("/api/drafts/search", params={"q": "zebracorn"}).json()["hits"]
+    assert [h["id"] for h in hits] == [draft_id]
+    hl = hits[0]["answers_hl"]
+    assert "<img" not in hl
+    assert "&lt;img src=x onerror=alert(1)&gt;" in hl
+    assert "<mark>zebracorn</mark>" in hl
+
+
+def test_stored_markers_cannot_fake_a_highlight(client, new_draft):
+    draft_id = new_draft("Affidavit")
+    client.post("/agent/next", json={"draft_id": draft_id, "answers": {"statements": "\x02quokkaberry\x03"}})
+    hl = client.get("/api/drafts/search", params={"q": "quokkaberry"}).json()["hits"][0]["answers_hl"]
+    assert hl.count("<mark>") == hl.count("</mark>") == 1
@@ -0,0 +1,109 @@
+import asyncio, time
+
+import pytest
+from itsdangerous import TimestampSigner
+
+from BriefGenBackend import sessions
+from BriefGenBackend.sessions import SessionStore
+
+
+def test_token_expires_after_ttl(monkeypatch):
+    store = SessionStore("secret", ttl=60)
+    real = TimestampSigner.get_timestamp
+    monkeypatch.setattr(TimestampSigner, "get_timestamp", lambda self: real(self) - 120)
+    old = store.issue("alice")
+    monkeypatch.setattr(TimestampSigner, "get_timestamp", real)
+    assert store.verify(old) is None and store.counts["expired"] == 1
+    assert store.verify(store.issue("alice")).user == "alice"
+
+
+def test_cached_token_still_expires(monkeypatch):
+    store = SessionStore("secret", ttl=60)
+    token = store.issue("alice")
+    info = store.verify(token)
+    assert store.verify(token) == info and store.counts["cache_hits"] == 1
+    now = time.time()
+    monkeypatch.setattr(sessions.time, "time", lambda: now + 61)
+    assert store.verify(token) is None
+
+
+def test_tampered_or_foreign_tokens_are_rejected():
+    store = SessionStore("secret")
+    token = store.issue("alice")
+    assert store.verify(token[:-2] + "xx") is None
+    assert store.verify(SessionStore("other").issue("alice")) is None
+    assert store.verify(None) is None and store.verify("") is None
+    assert store.counts["invalid"] == 2
+
+
+def test_revocation_reaches_other_workers():
+    a, b = SessionStore("shared"), SessionStore("shared")
+    b._load()
+    token = a.issue("alice")
+    assert b.verify(token) is not None  # cached on b
+    asyncio.run(a.revoke(a.verify(token)))
+    assert a.verify(token) is None
+    assert b.verify(token) is not None
+    b._load()
+    assert b.verify(token) is None
+
+
+def test_logout_revokes_the_cookie(client):
+    token = client.cookies.get(sessions.COOKIE)
+    assert client.get("/api/me").json() == {"email": "admin"}
+    assert client.post("/api/logout").json() == {"ok": True}
+    assert client.get("/api/me").status_code == 401
+    client.cookies.set(sessions.COOKIE, token)  # replaying the old cookie does not help
+    assert client.get("/api/me").status_code == 401
+    assert client.get("/api/drafts").status_code == 401
+
+
+@pytest.fixture
+def plain_hashes(monkeypatch):
+    """bcrypt is slow (and its passlib backend is broken in some environments); the pool is what's under test."""
+    monkeypatch.setattr(sessions.pwd_ctx, "hash", lambda p: "h:" + p)
+    monkeypatch.setattr(sessions.pwd_ctx, "verify", lambda p, h: h == "h:" + p)
+
+
+def test_password_hashing_is_bounded(monkeypatch, plain_hashes):
+    monkeypatch.setattr(sessions, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(sessions, "PASSWORD_HASH_QUEUE", 0)
+    monkeypatch.setattr(sessions, "PASSWORD_HASH_WAIT", 0.05)
+    monkeypatch.setattr(sessions.pwd_ctx, "hash", lambda p: time.sleep(0.3) or "h:" + p)
+    sessions.shutdown_pool()
+
+    async def burst():
+        return await asyncio.gather(*(sessions.hash_password("pw") for _ in range(3)), return_exceptions=True)
+    try:
+        results = asyncio.run(burst())
+    finally:
+        sessions.shutdown_pool()
+    assert results.count("h:pw") == 1
+    assert sum(isinstance(r, sessions.HashBusy) for r in results) == 2
+
+
+@pytest.fixture
+def user(plain_hashes):
+    from sqlmodel import Session, select
+    from BriefGenBackend import db
+    from BriefGenBackend.models import User
+    with Session(db.engine) as s:
+        if s.exec(select(User).where(User.email == "owner@example.com")).first() is None:
+            s.add(User(email="owner@example.com", password_hash="h:hunter2")); s.commit()
+    return "owner@example.com"
+
+
+def test_login_issues_a_session(client, user):
+    client.cookies.clear()
+    assert client.post("/api/login", json={"email": user, "password": "nope"}).status_code == 401
+    r = client.post("/api/login", json={"email": " Owner@Example.com ", "password": "hunter2"})
+    assert r.status_code == 200 and r.json() == {"email": user}
+    assert client.get("/api/me").json() == {"email": user}
+
+
+def test_busy_hash_pool_is_a_503(client, user, monkeypatch):
+    async def busy(*a):
+        raise sessions.HashBusy()
+    monkeypatch.setattr(sessions, "verify_password", busy)
+    r = client.post("/api/login", json={"email": user, "password": "hunter2"})
+    assert r.status_code == 503 and r.headers["retry-after"] == "2"
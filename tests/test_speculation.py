@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from BriefGenBackend import main
+from BriefGenBackend.speculative import Speculator
+from conftest import answers_for, sse_events
+
+
+@pytest.fixture
+def spec(monkeypatch):
+    s = Speculator(enabled=True)
+    monkeypatch.setattr(main, "speculator", s)
+    return s
+
+
+def test_stream_question_step_does_not_wait_for_speculation(client, new_draft, fake_model, spec):
+    fake_model.delay = 1.0
+    draft_id = new_draft("Affidavit")
+    answers = answers_for("Affidavit")
+    date = answers.pop("date")
+
+    t = time.monotonic()
+    r = client.post("/agent/next/stream", json={"draft_id": draft_id, "answers": answers})
+    assert time.monotonic() - t < 0.5
+    assert [e["type"] for e in sse_events(r.text)] == ["question"]
+    assert spec.stats()["inflight"] == 1
+    assert spec.stats()["hits"] == 0 and spec.stats()["misses"] == 0
+
+    r = client.post("/agent/next/stream", json={"draft_id": draft_id, "last_answer": {"field": "date", "text": date}})
+    events = sse_events(r.text)
+    assert events[-1]["type"] == "final"
+    assert spec.stats()["hits"] == 1 and spec.stats()["inflight"] == 0
+    # three speculated groups plus the one the last answer could still affect
+    assert fake_model.calls == 4
+
+
+def test_stream_question_step_does_not_count_a_hit(client, new_draft, fake_model, spec):
+    draft_id = new_draft("Affidavit")
+    answers = answers_for("Affidavit")
+    answers.pop("date")
+    for _ in range(3):
+        client.post("/agent/next/stream", json={"draft_id": draft_id, "answers": answers})
+    assert spec.stats()["hits"] == 0
+    assert spec.stats()["started"] == 1
+
+
+def test_take_counts_empty_speculation_as_miss(client, new_draft, fake_model, spec):
+    fake_model.reply = "not json"
+    draft_id = new_draft("Affidavit")
+    answers = answers_for("Affidavit")
+    date = answers.pop("date")
+    client.post("/agent/next", json={"draft_id": draft_id, "answers": answers})
+    r = client.post("/agent/next", json={"draft_id": draft_id, "last_answer": {"field": "date", "text": date}})
+    assert r.json()["type"] == "final"
+    assert spec.stats()["hits"] == 0 and spec.stats()["misses"] == 1
@@ -0,0 +1,101 @@
+import io, os, signal, zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session
+
+from BriefGenBackend import db, zipexport
+from BriefGenBackend.models import Draft
+from benchmarks import stub_llm
+from conftest import answers_for
+
+
+@pytest.fixture
+def drafts():
+    """Drafted drafts of two templates, created after `since` so tests can filter to just these."""
+    since = datetime.utcnow()
+    ids = {}
+    with Session(db.engine) as s:
+        for template in ("Petition", "Petition", "Legal Notice"):
+            d = Draft(template=template, answers_json=answers_for(template), status="drafted",
+                      draft_json=stub_llm._draft(["title", "facts", "prayer"]))
+            s.add(d); s.commit()
+            ids.setdefault(template, []).append(d.id)
+    return since, ids
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    zipexport.shutdown_pool()
+    yield
+    zipexport.shutdown_pool()
+
+
+def _zip(client, **body):
+    r = client.post("/api/exports/zip", json=body)
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"] == "application/zip"
+    return zipfile.ZipFile(io.BytesIO(r.content))
+
+
+def test_zip_of_selected_drafts(client, drafts):
+    _, ids = drafts
+    selected = ids["Petition"] + ids["Legal Notice"]
+    zf = _zip(client, draft_ids=selected, fmt="md")
+    assert sorted(zf.namelist()) == sorted(zipexport._entry_name(i, t, "md") for t in ids for i in ids[t])
+    assert zf.testzip() is None
+    assert all(zf.read(n).strip() for n in zf.namelist())
+
+
+def test_zip_template_filter(client, drafts):
+    since, ids = drafts
+    zf = _zip(client, template="Legal Notice", date_from=since.isoformat(), fmt="html")
+    assert zf.namelist() == [zipexport._entry_name(ids["Legal Notice"][0], "Legal Notice", "html")]
+
+
+def test_zip_request_errors(client, drafts):
+    assert client.post("/api/exports/zip", json={"fmt": "docx"}).status_code == 400
+    assert client.post("/api/exports/zip", json={"draft_ids": ["x"], "fmt": "exe"}).status_code == 400
+    assert client.post("/api/exports/zip", json={"draft_ids": ["missing"]}).status_code == 404
+
+
+def test_zip_survives_a_dead_render_process(client, drafts):
+    _, ids = drafts
+    selected = ids["Petition"]
+    assert len(_zip(client, draft_ids=selected, fmt="md").namelist()) == 2
+    broken = zipexport.get_pool()
+    for pid in list(broken._processes):
+        os.kill(pid, signal.SIGKILL)
+    zf = _zip(client, draft_ids=selected, fmt="md")
+    assert sorted(zf.namelist()) == sorted(zipexport._entry_name(i, "Petition", "md") for i in selected)
+    assert zipexport.get_pool() is not broken
+
+
+class _FlakyPool:
+    """Executor whose first `failures` submissions die as if their worker process was killed."""
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def submit(self, fn, *args):
+        fut = Future()
+        if self.failures:
+            self.failures -= 1
+            fut.set_exception(BrokenProcessPool("worker died"))
+        else:
+            fut.set_result(fn(*args))
+        return fut
+
+
+def test_render_interrupted_by_a_dying_worker_is_retried_once(client, drafts, monkeypatch):
+    _, ids = drafts
+    selected = ids["Petition"]
+    monkeypatch.setattr(zipexport, "get_pool", lambda pool=_FlakyPool(2): pool)
+    names = sorted(_zip(client, draft_ids=selected, fmt="md").namelist())
+    assert names == sorted(zipexport._entry_name(i, "Petition", "md") for i in selected)
+
+    monkeypatch.setattr(zipexport, "get_pool", lambda pool=_FlakyPool(99): pool)
+    names = _zip(client, draft_ids=selected, fmt="md").namelist()
+    assert sorted(names) == sorted(f"errors/{i}.txt" for i in selected)